@@ -0,0 +1,161 @@
+"""Project team membership.
+
+A project's team is its owner plus its accepted collaborators. Team-scoped
+endpoints check membership on every call, so teams are loaded with one
+query and cached twice: on ``g`` for the rest of the request, and across
+requests for ``TEAM_CACHE_TTL`` seconds. Changing a collaboration's status
+must call ``invalidate_team``; other workers see the change once their
+entry expires.
+
+``team_required`` wraps a view taking ``project_id``: it answers 401, 404
+or 403 itself and passes the resolved ``Team`` to the view as ``team``.
+
+``team_roster`` is the other direction: everyone a user works with, across
+all of their projects, one page of members per query.
+"""
+import functools
+import os
+from collections import namedtuple
+
+from flask import g, jsonify, session
+from sqlalchemy import and_, literal, select, tuple_, union_all
+
+from app import app, db
+from cache import TTLCache
+from models import User, Project, Collaboration
+from pagination import decode_cursor, encode_cursor
+
+app.config.setdefault('TEAM_CACHE_TTL', int(os.environ.get('TEAM_CACHE_TTL', 30)))
+
+
+class Team(namedtuple('Team', 'project_id owner_id created_at collaborators')):
+    """``collaborators`` maps each accepted collaborator's id to when they joined"""
+    __slots__ = ()
+
+    @property
+    def member_ids(self):
+        return {self.owner_id, *self.collaborators}
+
+    def __contains__(self, user_id):
+        return user_id == self.owner_id or user_id in self.collaborators
+
+
+_teams = TTLCache(maxsize=10000, ttl=app.config['TEAM_CACHE_TTL'])
+
+
+def load_team(project_id):
+    """Read a project's team from the database, or None if the project does not exist"""
+    rows = db.session.query(Project.user_id, Project.created_at, Collaboration.user_id, Collaboration.created_at)\
+        .outerjoin(Collaboration, and_(Collaboration.project_id == Project.id, Collaboration.status == 'accepted'))\
+        .filter(Project.id == project_id)\
+        .order_by(Collaboration.created_at).all()
+    if not rows:
+        return None
+    owner_id, created_at = rows[0][:2]
+    collaborators = {user_id: joined_at for _, _, user_id, joined_at in rows if user_id is not None}
+    return Team(project_id, owner_id, created_at, collaborators)
+
+
+def get_team(project_id):
+    teams = g.setdefault('teams', {})
+    team = teams.get(project_id)
+    if team is None:
+        team = _teams.get(project_id)
+        if team is None:
+            team = load_team(project_id)
+            # Missing projects are not cached; the id may be created later
+            if team is not None:
+                _teams.set(project_id, team)
+        teams[project_id] = team
+    return team
+
+
+def invalidate_team(project_id):
+    _teams.delete(project_id)
+    g.get('teams', {}).pop(project_id, None)
+
+
+def team_required(view):
+    """Only let the project's owner and accepted collaborators call ``view``"""
+    @functools.wraps(view)
+    def wrapper(project_id, **kwargs):
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
+        team = get_team(project_id)
+        if team is None:
+            return jsonify({'error': 'Project not found'}), 404
+        if user_id not in team:
+            return jsonify({'error': 'Access denied'}), 403
+        return view(project_id, team=team, **kwargs)
+    return wrapper
+
+
+def _team_links(user_id):
+    """(member, project) pairs for every project ``user_id`` shares with someone.
+
+    Collaborators on the user's own projects, plus the owners of projects
+    the user collaborates on. ``is_owner`` is the member's role.
+    """
+    collaborators = select(
+        Collaboration.user_id.label('member_id'), Project.id.label('project_id'), Project.title.label('project_title'),
+        literal(False).label('is_owner'), Collaboration.created_at.label('since'),
+    ).join(Project, Collaboration.project_id == Project.id)\
+        .where(Project.user_id == user_id, Collaboration.status == 'accepted')
+    owners = select(
+        Project.user_id, Project.id, Project.title, literal(True), Collaboration.created_at,
+    ).join(Project, Collaboration.project_id == Project.id)\
+        .where(Collaboration.user_id == user_id, Collaboration.status == 'accepted')
+    return union_all(collaborators, owners).subquery()
+
+
+def team_roster(user_id, cursor=None, limit=50):
+    """One page of the user's teammates, deduplicated across projects.
+
+    Returns (members, next_cursor); each member is a slim user record with
+    the projects shared with them. Members are ordered by name and the
+    page is chosen inside the same statement that fetches their projects.
+    """
+    links = _team_links(user_id)
+    page = select(User.id).join(links, links.c.member_id == User.id)\
+        .group_by(User.id, User.full_name)\
+        .order_by(User.full_name, User.id)\
+        .limit(limit + 1)
+    if cursor:
+        full_name, member_id = decode_cursor(cursor, 2)
+        page = page.where(tuple_(User.full_name, User.id) > tuple_(literal(full_name), literal(member_id)))
+
+    rows = db.session.execute(
+        select(User.id, User.username, User.full_name, User.profile_image, User.college,
+               links.c.project_id, links.c.project_title, links.c.is_owner, links.c.since)
+        .join(links, links.c.member_id == User.id)
+        .where(User.id.in_(page.scalar_subquery()))
+        .order_by(User.full_name, User.id, links.c.project_id)
+    ).all()
+
+    members = []
+    for row in rows:
+        if not members or members[-1]['user']['id'] != row.id:
+            members.append({
+                'user': {
+                    'id': row.id,
+                    'username': row.username,
+                    'full_name': row.full_name,
+                    'profile_image': row.profile_image,
+                    'college': row.college
+                },
+                'projects': []
+            })
+        members[-1]['projects'].append({
+            'id': row.project_id,
+            'title': row.project_title,
+            'is_owner': bool(row.is_owner),
+            'since': row.since.isoformat() if row.since else None
+        })
+
+    next_cursor = None
+    if len(members) > limit:
+        members = members[:limit]
+        last = members[-1]['user']
+        next_cursor = encode_cursor([last['full_name'], last['id']])
+    return members, next_cursor
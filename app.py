@@ -10,8 +10,8 @@ from dotenv import load_dotenv  # <-- Added
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging; LOG_LEVEL=DEBUG for everything, QUERY_PROFILER=1 for per-request SQL stats
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 
 class Base(DeclarativeBase):
     pass
@@ -32,6 +32,10 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
 }
+# Per-process connection pool; gunicorn.conf.py sizes it for the worker class
+for option in ("pool_size", "max_overflow", "pool_timeout"):
+    if os.environ.get(f"DB_{option.upper()}"):
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"][option] = int(os.environ[f"DB_{option.upper()}"])
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 # Initialize the app with the extension
@@ -42,3 +46,10 @@ with app.app_context():
     import models  # noqa: F401
     db.create_all()
     logging.info("Database tables created successfully")
+
+    # Bring existing tables up to date (added columns, indexes)
+    import migrations
+    if app.config["AUTO_MIGRATE"]:
+        applied = migrations.upgrade()
+        if applied:
+            logging.info("Applied schema migrations %s", applied)
@@ -0,0 +1,250 @@
+"""Static asset pipeline.
+
+Every file under ``static/`` (except user uploads) is content-hashed into
+a build directory as ``<name>.<hash><ext>``, with gzip and, when the
+``brotli`` package is installed, brotli variants next to it. HTML pages
+have their ``href``/``src`` references rewritten to the fingerprinted
+names, so the CSS and JS they load can be cached forever while the pages
+themselves are revalidated on every load with a cheap ETag check.
+
+Files are served with HTTP Range and conditional GET support. Behind a
+front proxy, set ``SENDFILE_BACKEND`` to hand the transfer off instead of
+streaming it from a worker:
+
+- ``x-sendfile`` (Apache mod_xsendfile, lighttpd) sends the file's path.
+- ``x-accel`` (nginx) redirects to ``<X_ACCEL_PREFIX>/<location>/<path>``,
+  which needs an internal location per entry in ``SENDFILE_LOCATIONS``::
+
+      location /_internal/assets/ { internal; alias /tmp/asset-build/; }
+
+The build runs on first use in each process and is cheap to repeat: built
+files are named by content, so they are only written once. ``flask
+build-assets`` runs it ahead of time.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+from collections import namedtuple
+
+from flask import Response, abort, request, send_file
+
+from app import app
+
+try:
+    import brotli
+except ImportError:  # brotli variants are optional
+    brotli = None
+
+app.config.setdefault('ASSETS_ROOT', os.environ.get('ASSETS_ROOT', os.path.join(app.root_path, 'static')))
+app.config.setdefault('ASSETS_BUILD_PATH', os.environ.get(
+    'ASSETS_BUILD_PATH', os.path.join(tempfile.gettempdir(), 'asset-build')))
+app.config.setdefault('ASSETS_MAX_AGE', int(os.environ.get('ASSETS_MAX_AGE', 365 * 24 * 3600)))
+app.config.setdefault('ASSETS_AUTO_RELOAD', os.environ.get('ASSETS_AUTO_RELOAD', '0') not in ('0', 'false', 'no'))
+app.config.setdefault('SENDFILE_BACKEND', os.environ.get('SENDFILE_BACKEND', ''))
+app.config.setdefault('X_ACCEL_PREFIX', os.environ.get('X_ACCEL_PREFIX', '/_internal'))
+app.config['USE_X_SENDFILE'] = app.config['SENDFILE_BACKEND'] == 'x-sendfile'
+
+# Directories under ASSETS_ROOT that hold user content rather than assets
+SKIP_DIRS = {'uploads'}
+
+# Roots that files may be sent from, by X-Accel-Redirect location name
+SENDFILE_LOCATIONS = {
+    'assets': lambda: app.config['ASSETS_BUILD_PATH'],
+    'uploads': lambda: os.path.join(app.root_path, 'static', 'uploads'),
+    'blobs': lambda: app.config['BLOB_STORE_PATH'],
+}
+
+HASH_LENGTH = 10
+MIN_COMPRESS_SIZE = 512
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+# Preferred first
+ENCODINGS = ([('br', '.br', lambda data: brotli.compress(data, quality=11))] if brotli else []) + [
+    ('gzip', '.gz', lambda data: gzip.compress(data, 9, mtime=0)),
+]
+
+FINGERPRINT_RE = re.compile(r'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{%d})(?P<ext>\.\w+)$' % HASH_LENGTH)
+REFERENCE_RE = re.compile(rb'(?P<attr>\b(?:href|src)=")/?(?P<name>[\w./-]+)"')
+
+Asset = namedtuple('Asset', 'name url digest mimetype path variants')
+
+_manifest = None
+_signature = None
+_manifest_lock = threading.Lock()
+
+
+def _fingerprint(name, digest):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{digest[:HASH_LENGTH]}{ext}'
+
+
+def _write_once(path, data):
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written under a temp name so concurrent builds never serve a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _sources():
+    root = app.config['ASSETS_ROOT']
+    sources = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        if dirpath == root:
+            dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS]
+        dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+        for filename in filenames:
+            if not filename.startswith('.'):
+                path = os.path.join(dirpath, filename)
+                sources[os.path.relpath(path, root).replace(os.sep, '/')] = path
+    return sources
+
+
+def _emit(name, data):
+    build = app.config['ASSETS_BUILD_PATH']
+    digest = hashlib.sha256(data).hexdigest()
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    url = _fingerprint(name, digest)
+    path = os.path.join(build, *url.split('/'))
+    _write_once(path, data)
+    variants = {}
+    if mimetype.startswith(COMPRESSIBLE_TYPES) and len(data) >= MIN_COMPRESS_SIZE:
+        for encoding, suffix, compress in ENCODINGS:
+            if not os.path.exists(path + suffix):
+                _write_once(path + suffix, compress(data))
+            variants[encoding] = path + suffix
+    return Asset(name, '/' + url, digest, mimetype, path, variants)
+
+
+def _rewrite_references(data, manifest):
+    def replace(match):
+        asset = manifest.get(match.group('name').decode())
+        # Links between pages keep their plain names
+        if asset is None or asset.name.endswith('.html'):
+            return match.group(0)
+        return match.group('attr') + asset.url.encode() + b'"'
+    return REFERENCE_RE.sub(replace, data)
+
+
+def build_manifest():
+    """Build every asset and return {logical name: Asset}"""
+    sources = _sources()
+    manifest = {}
+    # Pages last, so their references can point at the fingerprinted names
+    for name in sorted(sources, key=lambda name: name.endswith('.html')):
+        with open(sources[name], 'rb') as source:
+            data = source.read()
+        if name.endswith('.html'):
+            data = _rewrite_references(data, manifest)
+        manifest[name] = _emit(name, data)
+    return manifest
+
+
+def _source_signature():
+    return tuple(sorted((name, os.stat(path).st_mtime_ns) for name, path in _sources().items()))
+
+
+def get_manifest():
+    global _manifest, _signature
+    with _manifest_lock:
+        if app.config['ASSETS_AUTO_RELOAD'] or app.debug:
+            signature = _source_signature()
+            if signature != _signature:
+                _manifest, _signature = None, signature
+        if _manifest is None:
+            _manifest = build_manifest()
+        return _manifest
+
+
+def asset_url(name):
+    """Fingerprinted URL for the asset at ``name`` (relative to ``static/``)"""
+    asset = get_manifest().get(name)
+    return asset.url if asset else '/' + name
+
+
+def find_asset(name):
+    """Look up a logical or fingerprinted name. Returns (asset, fingerprint matches)."""
+    manifest = get_manifest()
+    if name in manifest:
+        return manifest[name], False
+    match = FINGERPRINT_RE.match(name)
+    if match:
+        asset = manifest.get(match.group('stem') + match.group('ext'))
+        if asset:
+            return asset, asset.digest.startswith(match.group('digest'))
+    return None, False
+
+
+def send_path(path, location, mimetype=None, etag=True, max_age=None):
+    """``send_file`` with Range and conditional GET, or an X-Accel-Redirect for nginx.
+
+    ``location`` names the SENDFILE_LOCATIONS root that ``path`` lives under.
+    """
+    if app.config['SENDFILE_BACKEND'] != 'x-accel':
+        return send_file(path, mimetype=mimetype, etag=etag, max_age=max_age, conditional=True)
+
+    root = os.path.abspath(SENDFILE_LOCATIONS[location]())
+    relative = os.path.relpath(os.path.abspath(path), root).replace(os.sep, '/')
+    stat = os.stat(path)
+    response = Response(mimetype=mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream')
+    response.headers['X-Accel-Redirect'] = f"{app.config['X_ACCEL_PREFIX']}/{location}/{relative}"
+    response.last_modified = stat.st_mtime
+    response.set_etag(etag if isinstance(etag, str) else f'{stat.st_mtime}-{stat.st_size}')
+    if max_age:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    # nginx serves the body (and any Range); only answer revalidations here
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        del response.headers['X-Accel-Redirect']
+    return response
+
+
+def serve_asset(name):
+    """Serve a static asset by logical or fingerprinted name"""
+    asset, fingerprinted = find_asset(name)
+    if asset is None:
+        abort(404)
+
+    path, encoding = asset.path, None
+    # Byte ranges are only offered on the identity encoding
+    if 'Range' not in request.headers:
+        for candidate, variant in asset.variants.items():
+            if request.accept_encodings[candidate]:
+                path, encoding = variant, candidate
+                break
+
+    etag = asset.digest[:2 * HASH_LENGTH] + (f'-{encoding}' if encoding else '')
+    # Only URLs carrying the current hash can be cached forever; old hashes
+    # still get the current file, but it must be revalidated
+    max_age = app.config['ASSETS_MAX_AGE'] if fingerprinted else None
+    response = send_path(path, 'assets', mimetype=asset.mimetype, etag=etag, max_age=max_age)
+    if fingerprinted:
+        response.cache_control.immutable = True
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if asset.variants:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress the files in static/."""
+    manifest = build_manifest()
+    for name, asset in sorted(manifest.items()):
+        print(f"{name} -> {asset.url}" + (f" ({', '.join(asset.variants)})" if asset.variants else ''))
@@ -0,0 +1,86 @@
+"""Dashboard query-count check.
+
+Creates users owning growing numbers of projects (each with votes,
+comments and donations) and counts the SQL statements issued by
+``/api/dashboard/summary`` for each. The count must not grow with the
+number of projects; the script exits non-zero if it does.
+
+    DATABASE_URL=postgresql://... python benchmarks/dashboard_queries.py --sizes 1 10 100 1000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from main import app  # noqa: E402
+from app import db  # noqa: E402
+from models import User, Project, Vote, Comment  # noqa: E402
+from ledger import record_donation  # noqa: E402
+
+
+def setup(projects):
+    """A user owning ``projects`` projects, plus a second user who engages with each"""
+    run = uuid.uuid4().hex[:8]
+    with app.app_context():
+        owner = User(username=f'dash-{run}', email=f'dash-{run}@example.com', full_name='Dashboard Owner',
+                     college='Bench', password_hash='!')
+        fan = User(username=f'fan-{run}', email=f'fan-{run}@example.com', full_name='Dashboard Fan',
+                   college='Bench', password_hash='!')
+        db.session.add_all([owner, fan])
+        db.session.flush()
+        for i in range(projects):
+            project = Project(title=f'Bench project {i}', description='Dashboard benchmark', category='test',
+                              funding_goal=100, user_id=owner.id, vote_count=1, comment_count=1)
+            db.session.add(project)
+            db.session.flush()
+            db.session.add(Vote(user_id=fan.id, project_id=project.id, is_upvote=True))
+            db.session.add(Comment(user_id=owner.id, project_id=project.id, content='Update'))
+            record_donation(project.id, fan.id, 5, '')
+        db.session.commit()
+        return owner.id
+
+
+def measure(user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    statements = []
+    with app.app_context():
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            started = time.perf_counter()
+            response = client.get('/api/dashboard/summary')
+            elapsed = time.perf_counter() - started
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+    if response.status_code != 200:
+        raise SystemExit(f'summary failed: {response.status_code} {response.get_data(as_text=True)}')
+    return len(statements), elapsed, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+    app.config['DASHBOARD_CACHE_TTL'] = 0
+
+    counts = set()
+    for size in args.sizes:
+        queries, elapsed, summary = measure(setup(size))
+        counts.add(queries)
+        print(f'{size:6d} projects: {queries} queries, {elapsed * 1000:.1f} ms, '
+              f"{summary['total_projects']} projects / {summary['total_votes']} votes / "
+              f"{len(summary['activity'])} activity items")
+    if len(counts) > 1:
+        raise SystemExit('Query count grows with the number of projects')
+    print('Query count is constant')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Synthetic data generator for benchmarks.
+
+Fills the database with users, projects, votes, comments, collaborations,
+discussions (with nested replies), notifications and team chat, at a named
+scale or explicit sizes. The same ``--seed`` always produces the same data.
+Rows go in through bulk INSERTs in batches, bypassing the ORM events, so
+the denormalized counters and hot scores are rebuilt once at the end.
+
+Every generated user can sign in as ``<prefix>-<seed>-<n>`` with the
+password ``benchmark``; ``runner.py`` relies on that.
+
+    DATABASE_URL=postgresql://... python benchmarks/datagen.py --scale large --seed 7
+
+Scales (override any size with its flag):
+
+* ``tiny``   - 200 users, 1k projects, ~10k votes; seconds on SQLite
+* ``small``  - 1k users, 10k projects, ~150k votes
+* ``large``  - 10k users, 100k projects, ~3M votes
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from main import app  # noqa: E402
+from app import db  # noqa: E402
+from models import (User, Project, Vote, Comment, Collaboration, Discussion, DiscussionReply,  # noqa: E402
+                    Notification, TeamChat)
+from counters import rebuild_counters  # noqa: E402
+from ranking import ENGAGEMENT, refresh_scores  # noqa: E402
+
+PASSWORD = 'benchmark'
+BATCH_SIZE = 5000
+
+SCALES = {
+    'tiny': dict(users=200, projects=1000, votes=10, comments=3, collaborators=1,
+                 discussions=200, replies=5, notifications=5, chat=5),
+    'small': dict(users=1000, projects=10000, votes=15, comments=4, collaborators=2,
+                  discussions=2000, replies=8, notifications=10, chat=10),
+    'large': dict(users=10000, projects=100000, votes=30, comments=5, collaborators=2,
+                  discussions=20000, replies=10, notifications=20, chat=10),
+}
+
+CATEGORIES = ['tech', 'health', 'education', 'environment', 'social', 'arts', 'business']
+DISCUSSION_CATEGORIES = ['general', 'ideas', 'help', 'showcase', 'feedback']
+COLLEGES = ['North Campus', 'South Campus', 'Institute of Technology', 'School of Design', 'Business School']
+WORDS = ('solar water mesh sensor campus app tutor market garden clinic robot data open map learn share '
+         'build team fund local health energy waste food code art music lab network mobile green').split()
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def count_around(rng, mean):
+    """A skewed non-negative count with the given mean: most rows get a few, some get many"""
+    return int(rng.expovariate(1 / mean)) if mean else 0
+
+
+class Generator:
+    def __init__(self, seed, prefix, sizes, days=365):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.prefix = prefix
+        self.sizes = sizes
+        self.now = datetime.utcnow()
+        self.start = self.now - timedelta(days=days)
+        self.inserted = {}
+
+    def timestamp(self, after=None):
+        start = after or self.start
+        return start + (self.now - start) * self.rng.random()
+
+    def insert(self, model, rows, returning=False):
+        """Insert ``rows`` (any iterable) in batches; returns the new ids if asked"""
+        ids, batch = [], []
+        statement = insert(model)
+        if returning:
+            statement = statement.returning(model.id, sort_by_parameter_order=True)
+
+        def flush():
+            if returning:
+                ids.extend(db.session.scalars(statement, batch))
+            else:
+                db.session.execute(statement, batch)
+            self.inserted[model.__tablename__] = self.inserted.get(model.__tablename__, 0) + len(batch)
+            batch.clear()
+
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+        db.session.commit()
+        return ids
+
+    def users(self):
+        password_hash = generate_password_hash(PASSWORD)
+        rows = [{
+            'username': f'{self.prefix}-{self.seed}-{i}',
+            'email': f'{self.prefix}-{self.seed}-{i}@example.com',
+            'full_name': f'{sentence(self.rng, 2)[:-1]} {i}',
+            'college': self.rng.choice(COLLEGES),
+            'password_hash': password_hash,
+            'bio': sentence(self.rng, 12),
+            'created_at': self.timestamp(),
+        } for i in range(self.sizes['users'])]
+        self.user_ids = self.insert(User, rows, returning=True)
+
+    def projects(self):
+        rows, self.project_meta = [], []
+        for _ in range(self.sizes['projects']):
+            owner = self.rng.choice(self.user_ids)
+            created_at = self.timestamp()
+            self.project_meta.append((owner, created_at))
+            rows.append({
+                'title': sentence(self.rng, 4)[:-1],
+                'description': ' '.join(sentence(self.rng, 10) for _ in range(4)),
+                'category': self.rng.choice(CATEGORIES),
+                'funding_goal': self.rng.choice([500, 1000, 5000, 20000]),
+                'current_funding': 0,
+                'user_id': owner,
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+        self.project_ids = self.insert(Project, rows, returning=True)
+
+    def engagement(self):
+        users, sizes = self.user_ids, self.sizes
+        self.teams = {}
+
+        def votes():
+            for project_id, (_, created_at) in zip(self.project_ids, self.project_meta):
+                for user_id in self.rng.sample(users, min(count_around(self.rng, sizes['votes']), len(users))):
+                    yield {'user_id': user_id, 'project_id': project_id, 'is_upvote': self.rng.random() < 0.9,
+                           'created_at': self.timestamp(created_at)}
+
+        def comments():
+            for project_id, (_, created_at) in zip(self.project_ids, self.project_meta):
+                for _ in range(count_around(self.rng, sizes['comments'])):
+                    yield {'user_id': self.rng.choice(users), 'project_id': project_id,
+                           'content': sentence(self.rng, 15), 'created_at': self.timestamp(created_at)}
+
+        def collaborations():
+            for project_id, (owner, created_at) in zip(self.project_ids, self.project_meta):
+                members = [user_id for user_id in self.rng.sample(users, min(sizes['collaborators'] + 1, len(users)))
+                           if user_id != owner][:sizes['collaborators']]
+                self.teams[project_id] = [owner] + members
+                for user_id in members:
+                    yield {'user_id': user_id, 'project_id': project_id, 'message': sentence(self.rng, 8),
+                           'status': 'accepted', 'created_at': self.timestamp(created_at)}
+
+        self.insert(Vote, votes())
+        self.insert(Comment, comments())
+        self.insert(Collaboration, collaborations())
+
+    def team_chat(self):
+        def messages():
+            for project_id, (_, created_at) in zip(self.project_ids, self.project_meta):
+                team = self.teams[project_id]
+                if len(team) < 2:
+                    continue
+                times = sorted(self.timestamp(created_at) for _ in range(count_around(self.rng, self.sizes['chat'])))
+                for sent_at in times:
+                    yield {'project_id': project_id, 'user_id': self.rng.choice(team),
+                           'message': sentence(self.rng, 8), 'created_at': sent_at}
+
+        self.insert(TeamChat, messages())
+
+    def discussions(self):
+        rows, created = [], []
+        for _ in range(self.sizes['discussions']):
+            created_at = self.timestamp()
+            created.append(created_at)
+            rows.append({
+                'title': sentence(self.rng, 6)[:-1],
+                'content': ' '.join(sentence(self.rng, 12) for _ in range(3)),
+                'category': self.rng.choice(DISCUSSION_CATEGORIES),
+                'tags': ','.join(self.rng.sample(WORDS, 3)),
+                'user_id': self.rng.choice(self.user_ids),
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+        self.discussion_ids = self.insert(Discussion, rows, returning=True)
+
+        # Top-level replies first, then one level of answers to a third of them
+        top, top_rows = [], []
+        for discussion_id, created_at in zip(self.discussion_ids, created):
+            for _ in range(count_around(self.rng, self.sizes['replies'])):
+                replied_at = self.timestamp(created_at)
+                top.append((discussion_id, replied_at))
+                top_rows.append({'discussion_id': discussion_id, 'user_id': self.rng.choice(self.user_ids),
+                                 'content': sentence(self.rng, 12), 'created_at': replied_at})
+        top_ids = self.insert(DiscussionReply, top_rows, returning=True)
+        self.insert(DiscussionReply, (
+            {'discussion_id': discussion_id, 'parent_reply_id': reply_id, 'user_id': self.rng.choice(self.user_ids),
+             'content': sentence(self.rng, 10), 'created_at': self.timestamp(replied_at)}
+            for reply_id, (discussion_id, replied_at) in zip(top_ids, top) if self.rng.random() < 0.33
+        ))
+
+    def notifications(self):
+        def rows():
+            for user_id in self.user_ids:
+                for _ in range(count_around(self.rng, self.sizes['notifications'])):
+                    kind = self.rng.choice(['vote', 'comment', 'collaboration'])
+                    yield {'user_id': user_id, 'related_user_id': self.rng.choice(self.user_ids),
+                           'project_id': self.rng.choice(self.project_ids), 'type': kind,
+                           'title': f'New {kind}', 'message': sentence(self.rng, 8),
+                           'is_read': self.rng.random() < 0.6, 'created_at': self.timestamp()}
+
+        self.insert(Notification, rows())
+
+    def run(self):
+        for step in (self.users, self.projects, self.engagement, self.team_chat, self.discussions,
+                     self.notifications):
+            started = time.perf_counter()
+            step()
+            print(f'{step.__name__}: {time.perf_counter() - started:.1f}s', flush=True)
+        started = time.perf_counter()
+        rebuild_counters()
+        for model in ENGAGEMENT:
+            refresh_scores(model)
+        db.session.commit()
+        print(f'counters and scores: {time.perf_counter() - started:.1f}s')
+        return self.inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', choices=SCALES, default='tiny')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--prefix', default='bench', help='username prefix for generated users')
+    for name in SCALES['tiny']:
+        parser.add_argument(f'--{name}', type=int, help=f'override the scale\'s {name} size')
+    args = parser.parse_args()
+    sizes = {name: getattr(args, name) if getattr(args, name) is not None else value
+             for name, value in SCALES[args.scale].items()}
+
+    with app.app_context():
+        inserted = Generator(args.seed, args.prefix, sizes).run()
+    for table, rows in inserted.items():
+        print(f'{table:20s} {rows:10d}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,451 @@
+"""Replay a realistic traffic mix against the API and record a baseline.
+
+``run`` samples ids from a database filled by ``datagen.py``, builds a
+seeded schedule of requests over the weighted route mix in ``ROUTES``, and
+fires it from ``--concurrency`` threads, either in-process through the
+Flask test client or over HTTP against a local gunicorn (started for you
+with ``--gunicorn``, or already running at ``--url``). Each route gets its
+p50/p95/p99 latency, throughput, error count and SQL statement count (from
+the query profiler's ``X-Query-Count`` header) in a JSON baseline.
+
+``diff`` compares two baselines and exits non-zero when a route's p95 got
+more than ``--threshold`` percent slower or it issues more queries.
+
+    python benchmarks/datagen.py --scale small
+    python benchmarks/runner.py run --requests 5000 --out before.json
+    git checkout my-branch
+    python benchmarks/runner.py run --requests 5000 --out after.json
+    python benchmarks/runner.py diff before.json after.json
+
+    python benchmarks/runner.py run --gunicorn --workers 4 --concurrency 32 --out http.json
+    python benchmarks/runner.py run --gunicorn --worker-class sync --workers 4 --out http-sync.json
+
+Uploads, deletes and the event stream are left out: they either destroy
+the fixture or hold a connection open for the whole run.
+"""
+import argparse
+import json
+import os
+import platform
+import queue
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+from http.cookiejar import CookieJar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import select  # noqa: E402
+
+from main import app  # noqa: E402
+from app import db  # noqa: E402
+from models import User, Project, Collaboration, Discussion  # noqa: E402
+from benchmarks.datagen import PASSWORD, WORDS  # noqa: E402
+
+app.config['QUERY_PROFILER'] = True
+
+# Status recorded for requests that timed out or lost their connection
+NETWORK_ERROR = 599
+
+
+def _project(ctx, rng):
+    return rng.choice(ctx['projects'])
+
+
+def _discussion(ctx, rng):
+    return rng.choice(ctx['discussions'])
+
+
+def _team(ctx, rng):
+    return rng.choice(ctx['teams'])
+
+
+# (name, weight, method, build) - build(ctx, rng) returns (path, json body, user id or None)
+ROUTES = [
+    ('GET /api/projects', 10, 'GET', lambda c, r: ('/api/projects', None, None)),
+    ('GET /api/projects?sort=hot', 5, 'GET', lambda c, r: ('/api/projects?sort=hot', None, None)),
+    ('GET /api/projects?sort=votes&category', 3, 'GET',
+     lambda c, r: (f'/api/projects?sort=votes&category={r.choice(c["categories"])}', None, None)),
+    ('GET /api/projects?search', 3, 'GET', lambda c, r: (f'/api/projects?search={r.choice(WORDS)}', None, None)),
+    ('GET /api/projects/<id>', 10, 'GET', lambda c, r: (f'/api/projects/{_project(c, r)}', None, None)),
+    ('GET /api/projects/<id>/comments', 6, 'GET',
+     lambda c, r: (f'/api/projects/{_project(c, r)}/comments', None, None)),
+    ('GET /api/discussions', 5, 'GET', lambda c, r: ('/api/discussions', None, None)),
+    ('GET /api/discussions?sort=hot', 2, 'GET', lambda c, r: ('/api/discussions?sort=hot', None, None)),
+    ('GET /api/discussions?search', 1, 'GET',
+     lambda c, r: (f'/api/discussions?search={r.choice(WORDS)}', None, None)),
+    ('GET /api/discussions/<id>', 4, 'GET', lambda c, r: (f'/api/discussions/{_discussion(c, r)}', None, None)),
+    ('GET /api/discussions/<id>/replies', 4, 'GET',
+     lambda c, r: (f'/api/discussions/{_discussion(c, r)}/replies', None, None)),
+    ('GET /api/discussions/stats', 1, 'GET', lambda c, r: ('/api/discussions/stats', None, None)),
+    ('GET /api/stats', 2, 'GET', lambda c, r: ('/api/stats', None, None)),
+    ('GET /api/homepage/stats', 2, 'GET', lambda c, r: ('/api/homepage/stats', None, None)),
+    ('GET /api/users?search', 1, 'GET', lambda c, r: (f'/api/users?search={r.choice(WORDS)}', None, None)),
+    ('GET /api/users/<id>/profile', 2, 'GET',
+     lambda c, r: (f'/api/users/{r.choice(c["users"])}/profile', None, None)),
+    ('GET /api/user', 5, 'GET', lambda c, r: ('/api/user', None, r.choice(c['users']))),
+    ('GET /api/dashboard/summary', 4, 'GET', lambda c, r: ('/api/dashboard/summary', None, r.choice(c['users']))),
+    ('GET /api/dashboard/stats', 1, 'GET', lambda c, r: ('/api/dashboard/stats', None, r.choice(c['users']))),
+    ('GET /api/dashboard/user-collaborations', 1, 'GET',
+     lambda c, r: ('/api/dashboard/user-collaborations', None, r.choice(c['users']))),
+    ('GET /api/dashboard/user-donations', 1, 'GET',
+     lambda c, r: ('/api/dashboard/user-donations', None, r.choice(c['users']))),
+    ('GET /api/dashboard/user-activity', 1, 'GET',
+     lambda c, r: ('/api/dashboard/user-activity', None, r.choice(c['users']))),
+    ('GET /api/collaborations', 1, 'GET', lambda c, r: ('/api/collaborations', None, r.choice(c['users']))),
+    ('GET /api/notifications', 3, 'GET', lambda c, r: ('/api/notifications', None, r.choice(c['users']))),
+    ('GET /api/notifications/count', 5, 'GET',
+     lambda c, r: ('/api/notifications/count', None, r.choice(c['users']))),
+    ('GET /api/user/team', 2, 'GET', lambda c, r: ('/api/user/team', None, r.choice(c['users']))),
+    ('GET /api/projects/<id>/chat', 3, 'GET',
+     lambda c, r: (lambda t: (f'/api/projects/{t[0]}/chat', None, t[1]))(_team(c, r))),
+    ('GET /api/projects/<id>/participants', 1, 'GET',
+     lambda c, r: (lambda t: (f'/api/projects/{t[0]}/participants', None, t[1]))(_team(c, r))),
+    ('POST /api/projects/<id>/vote', 2, 'POST',
+     lambda c, r: (f'/api/projects/{_project(c, r)}/vote', {'is_upvote': True}, r.choice(c['users']))),
+    ('POST /api/projects/<id>/comments', 1, 'POST',
+     lambda c, r: (f'/api/projects/{_project(c, r)}/comments', {'content': 'Benchmark comment'},
+                   r.choice(c['users']))),
+    ('POST /api/discussions/<id>/like', 1, 'POST',
+     lambda c, r: (f'/api/discussions/{_discussion(c, r)}/like', {}, r.choice(c['users']))),
+    ('POST /api/discussions/<id>/replies', 1, 'POST',
+     lambda c, r: (f'/api/discussions/{_discussion(c, r)}/replies', {'content': 'Benchmark reply'},
+                   r.choice(c['users']))),
+    ('POST /api/projects/<id>/chat', 1, 'POST',
+     lambda c, r: (lambda t: (f'/api/projects/{t[0]}/chat', {'message': 'Benchmark message'}, t[1]))(_team(c, r))),
+    ('POST /api/notifications/mark-all-read', 1, 'POST',
+     lambda c, r: ('/api/notifications/mark-all-read', {}, r.choice(c['users']))),
+]
+
+
+def sample_context(seed, prefix, users):
+    """Ids the schedule draws from: a pool of signed-in users and the rows they touch"""
+    with app.app_context():
+        pool = db.session.execute(
+            select(User.id, User.username).where(User.username.like(f'{prefix}-%'))
+            .order_by(User.id).limit(users)
+        ).all()
+        if not pool:
+            raise SystemExit(f'No generated users found; run benchmarks/datagen.py --prefix {prefix} first')
+        user_ids = [row.id for row in pool]
+        # Sampled here rather than with ORDER BY random() so the same seed replays the same rows
+        rng = random.Random(seed)
+        projects = db.session.scalars(select(Project.id).order_by(Project.id)).all()
+        discussions = db.session.scalars(select(Discussion.id).order_by(Discussion.id)).all()
+        categories = db.session.scalars(select(Project.category).distinct().order_by(Project.category)).all()
+        # Team chat needs a member; owners and collaborators from the user pool
+        teams = db.session.execute(
+            select(Collaboration.project_id, Collaboration.user_id)
+            .where(Collaboration.user_id.in_(user_ids), Collaboration.status == 'accepted')
+            .union_all(select(Project.id, Project.user_id).where(Project.user_id.in_(user_ids)))
+        ).all()
+        database = db.engine.dialect.name
+    teams = sorted(tuple(team) for team in teams)
+    rng.shuffle(teams)
+    return {
+        'users': user_ids,
+        'usernames': {row.id: row.username for row in pool},
+        'projects': rng.sample(projects, min(len(projects), 2000)),
+        'discussions': rng.sample(discussions, min(len(discussions), 2000)),
+        'categories': categories,
+        'teams': teams[:2000],
+        'database': database,
+    }
+
+
+def schedule(ctx, requests, seed):
+    rng = random.Random(seed)
+    routes = [route for route in ROUTES if ctx['teams'] or '/chat' not in route[0] and 'participants' not in route[0]]
+    weights = [route[1] for route in routes]
+    plan = []
+    for name, _, method, build in rng.choices(routes, weights, k=requests):
+        path, body, user_id = build(ctx, rng)
+        plan.append((name, method, path, body, user_id))
+    return plan
+
+
+class TestClientTarget:
+    """In-process requests through the Flask test client, one client per user per thread"""
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.local = threading.local()
+
+    def client(self, user_id):
+        clients = self.local.__dict__.setdefault('clients', {})
+        if user_id not in clients:
+            client = app.test_client()
+            if user_id is not None:
+                with client.session_transaction() as sess:
+                    sess['user_id'] = user_id
+            clients[user_id] = client
+        return clients[user_id]
+
+    def request(self, method, path, body, user_id):
+        client = self.client(user_id)
+        started = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        elapsed = time.perf_counter() - started
+        response.close()
+        return response.status_code, elapsed, response.headers.get('X-Query-Count')
+
+
+class HttpTarget:
+    """Requests over HTTP; each thread signs every pool user in once and keeps the cookie"""
+
+    def __init__(self, ctx, url):
+        self.ctx = ctx
+        self.url = url.rstrip('/')
+        self.local = threading.local()
+
+    def opener(self, user_id):
+        openers = self.local.__dict__.setdefault('openers', {})
+        if user_id not in openers:
+            opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+            if user_id is not None:
+                credentials = {'username': self.ctx['usernames'][user_id], 'password': PASSWORD}
+                status, _, _ = self._send(opener, 'POST', '/api/login', credentials)
+                if status != 200:
+                    raise SystemExit(f'Login failed for user {user_id}: {status}')
+            openers[user_id] = opener
+        return openers[user_id]
+
+    def _send(self, opener, method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'} if data else {})
+        started = time.perf_counter()
+        try:
+            with opener.open(request, timeout=60) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as e:
+            e.read()
+            status, headers = e.code, e.headers
+        except (urllib.error.URLError, OSError):
+            # Timed out or dropped: count it as an error instead of killing the thread
+            return NETWORK_ERROR, time.perf_counter() - started, None
+        return status, time.perf_counter() - started, headers.get('X-Query-Count')
+
+    def request(self, method, path, body, user_id):
+        return self._send(self.opener(user_id), method, path, body)
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(samples, wall):
+    latencies = sorted(seconds * 1000 for _, seconds, _ in samples)
+    queries = [int(count) for _, _, count in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for status, _, _ in samples if status >= 500),
+        'statuses': {str(status): n for status, n in sorted(
+            ((status, sum(1 for s, _, _ in samples if s == status)) for status in {s for s, _, _ in samples}))},
+        'throughput_rps': round(len(samples) / wall, 2) if wall else None,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_queries': round(sum(queries) / len(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+def replay(target, plan, concurrency):
+    work = queue.Queue()
+    for item in plan:
+        work.put(item)
+    results = defaultdict(list)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                name, method, path, body, user_id = work.get_nowait()
+            except queue.Empty:
+                return
+            sample = target.request(method, path, body, user_id)
+            with lock:
+                results[name].append(sample)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workers, worker_class=None):
+    """Start gunicorn with the project's gunicorn.conf.py; ``worker_class`` overrides its serving mode"""
+    port = _free_port()
+    env = dict(os.environ, QUERY_PROFILER='1')
+    if worker_class:
+        env['WEB_WORKER_CLASS'] = worker_class
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'main:app', '--bind', f'127.0.0.1:{port}', '--workers', str(workers)],
+        cwd=ROOT, env=env,
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'gunicorn exited with status {process.returncode}')
+        try:
+            urllib.request.urlopen(f'{url}/api/stats', timeout=2).read()
+            return process, url
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise SystemExit('gunicorn did not start within 60s')
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    ctx = sample_context(args.seed, args.prefix, args.users)
+    plan = schedule(ctx, args.requests, args.seed)
+
+    server = None
+    if args.gunicorn:
+        server, url = start_gunicorn(args.workers, args.worker_class)
+        target, label = HttpTarget(ctx, url), f'gunicorn {args.worker_class or "default"} x{args.workers}'
+    elif args.url:
+        target, label = HttpTarget(ctx, args.url), args.url
+    else:
+        target, label = TestClientTarget(ctx), 'test client'
+
+    try:
+        if args.warmup:
+            replay(target, schedule(ctx, args.warmup, args.seed + 1), args.concurrency)
+        results, wall = replay(target, plan, args.concurrency)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    baseline = {
+        'meta': {
+            'commit': _git_commit(),
+            'created_at': datetime.utcnow().isoformat(),
+            'target': label,
+            'database': ctx['database'],
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'python': platform.python_version(),
+        },
+        'overall': summarize([sample for samples in results.values() for sample in samples], wall),
+        'routes': {name: summarize(samples, wall) for name, samples in sorted(results.items())},
+    }
+    print_table(baseline)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f'Baseline written to {args.out}')
+
+
+def print_table(baseline):
+    print(f"{'route':45s} {'n':>6s} {'err':>4s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'rps':>8s} {'queries':>8s}")
+    rows = list(baseline['routes'].items()) + [('overall', baseline['overall'])]
+    for name, stats in rows:
+        queries = '-' if stats['mean_queries'] is None else f"{stats['mean_queries']:g}"
+        print(f"{name:45s} {stats['requests']:6d} {stats['errors']:4d} {stats['p50_ms']:8.1f} "
+              f"{stats['p95_ms']:8.1f} {stats['p99_ms']:8.1f} {stats['throughput_rps']:8.1f} {queries:>8s}")
+
+
+def _change(before, after):
+    if before is None or after is None:
+        return None
+    return (after - before) / before * 100 if before else 0.0
+
+
+def diff(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    print(f"{'route':45s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'queries':>12s}")
+
+    regressions = []
+    for name in sorted(set(before['routes']) | set(after['routes'])):
+        old, new = before['routes'].get(name), after['routes'].get(name)
+        if old is None or new is None:
+            print(f"{name:45s} {'only in ' + ('after' if old is None else 'before'):>9s}")
+            continue
+        changes = [_change(old[key], new[key]) for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+        queries = f"{old['max_queries']} -> {new['max_queries']}" if old['max_queries'] != new['max_queries'] else \
+            f"{new['max_queries']}"
+        print(f'{name:45s} ' + ' '.join(f'{change:+8.1f}%' for change in changes) + f' {queries:>12s}')
+        if changes[1] > args.threshold:
+            regressions.append(f"{name}: p95 {old['p95_ms']} -> {new['p95_ms']} ms")
+        if old['max_queries'] is not None and new['max_queries'] is not None and new['max_queries'] > old['max_queries']:
+            regressions.append(f"{name}: queries {old['max_queries']} -> {new['max_queries']}")
+        if new['errors'] > old['errors']:
+            regressions.append(f"{name}: errors {old['errors']} -> {new['errors']}")
+
+    if regressions:
+        print('\nRegressions:')
+        for regression in regressions:
+            print(f'  {regression}')
+        raise SystemExit(1)
+    print('\nNo regressions')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='replay traffic and record a baseline')
+    run_parser.add_argument('--requests', type=int, default=2000)
+    run_parser.add_argument('--warmup', type=int, default=200, help='requests replayed before measuring')
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--seed', type=int, default=1)
+    run_parser.add_argument('--prefix', default='bench', help='username prefix used by datagen.py')
+    run_parser.add_argument('--users', type=int, default=50, help='signed-in users the traffic is spread over')
+    run_parser.add_argument('--url', help='an already running server to send requests to')
+    run_parser.add_argument('--gunicorn', action='store_true', help='start a local gunicorn for the run')
+    run_parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    run_parser.add_argument('--worker-class', help='gunicorn worker class (default: gunicorn.conf.py\'s choice)')
+    run_parser.add_argument('--out', help='write the baseline JSON here')
+    run_parser.set_defaults(func=run)
+
+    diff_parser = commands.add_parser('diff', help='compare two baselines')
+    diff_parser.add_argument('before')
+    diff_parser.add_argument('after')
+    diff_parser.add_argument('--threshold', type=float, default=15, help='allowed p95 slowdown, in percent')
+    diff_parser.set_defaults(func=diff)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
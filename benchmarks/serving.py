@@ -0,0 +1,99 @@
+"""Compare gunicorn serving modes under the same traffic.
+
+For each of ``--modes`` (sync and gevent by default) this starts gunicorn
+with the project's gunicorn.conf.py and the same ``--workers``, parks
+``--streams`` signed-in clients on the event stream (``/api/events``) the
+way open dashboards do, and replays the runner's traffic mix from
+``--concurrency`` threads. It prints throughput, latency and errors per
+mode side by side, and writes them as JSON with ``--out``.
+
+    python benchmarks/datagen.py --scale small
+    DATABASE_URL=postgresql://... python benchmarks/serving.py --workers 2 --streams 4 --concurrency 32
+
+A sync worker serves one connection at a time, so once ``--streams``
+reaches ``--workers`` the sync run stalls until gunicorn kills the
+stream-holding workers at their timeout; the gevent run keeps serving.
+Requests that time out or lose their connection count as errors
+(status 599). gevent and, for PostgreSQL, psycogreen must be installed.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.runner import (HttpTarget, replay, sample_context, schedule, start_gunicorn,  # noqa: E402
+                               summarize)
+
+
+def hold_streams(target, user_ids, stop):
+    """Open one event stream per user and keep reading until ``stop`` is set or the server goes away"""
+    def listen(user_id):
+        opener = target.opener(user_id)
+        try:
+            with opener.open(target.url + '/api/events', timeout=60) as response:
+                while not stop.is_set() and response.readline():
+                    pass
+        except OSError:
+            pass
+
+    threads = [threading.Thread(target=listen, args=(user_id,), daemon=True) for user_id in user_ids]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_mode(ctx, mode, args):
+    server, url = start_gunicorn(args.workers, mode)
+    stop = threading.Event()
+    try:
+        target = HttpTarget(ctx, url)
+        hold_streams(target, ctx['users'][:args.streams], stop)
+        if args.warmup:
+            replay(target, schedule(ctx, args.warmup, args.seed + 1), args.concurrency)
+        results, wall = replay(target, schedule(ctx, args.requests, args.seed), args.concurrency)
+    finally:
+        stop.set()
+        server.terminate()
+        server.wait()
+    return summarize([sample for samples in results.values() for sample in samples], wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--modes', nargs='+', default=['sync', 'gevent'], help='gunicorn worker classes to compare')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--streams', type=int, default=0, help='event streams held open during the run')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--prefix', default='bench', help='username prefix used by datagen.py')
+    parser.add_argument('--users', type=int, default=50, help='signed-in users the traffic is spread over')
+    parser.add_argument('--out', help='write the results as JSON here')
+    args = parser.parse_args()
+
+    ctx = sample_context(args.seed, args.prefix, args.users)
+    if args.streams > len(ctx['users']):
+        raise SystemExit(f'--streams needs at most --users ({len(ctx["users"])}) signed-in users')
+
+    results = {}
+    for mode in args.modes:
+        print(f'{mode}: {args.workers} workers, {args.streams} open streams, {args.requests} requests', flush=True)
+        results[mode] = run_mode(ctx, mode, args)
+
+    print(f"\n{'mode':10s} {'n':>6s} {'err':>5s} {'rps':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s}")
+    for mode, stats in results.items():
+        print(f"{mode:10s} {stats['requests']:6d} {stats['errors']:5d} {stats['throughput_rps']:8.1f} "
+              f"{stats['p50_ms']:8.1f} {stats['p95_ms']:8.1f} {stats['p99_ms']:8.1f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'workers': args.workers, 'streams': args.streams, 'concurrency': args.concurrency,
+                       'database': ctx['database'], 'modes': results}, f, indent=2)
+        print(f'Results written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
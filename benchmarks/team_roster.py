@@ -0,0 +1,122 @@
+"""Team roster query-count check.
+
+Builds an owner with hundreds of projects, each staffed from a shared pool
+of collaborators (so most members appear on many projects), and a few
+projects owned by others that the owner collaborates on. Then it pages
+through ``/api/user/team``, counting SQL statements per page. Every page
+must cost the same number of statements however many projects the owner
+has, and each member must appear once; the script exits non-zero otherwise.
+
+    DATABASE_URL=postgresql://... python benchmarks/team_roster.py --projects 100 500 --pool 60
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from main import app  # noqa: E402
+from app import db  # noqa: E402
+from models import User, Project, Collaboration  # noqa: E402
+
+
+def make_user(run, name, i):
+    return User(username=f'{name}-{run}-{i}', email=f'{name}-{run}-{i}@example.com',
+                full_name=f'{name.title()} {i:04d}', college='Bench', password_hash='!')
+
+
+def setup(projects, pool, per_project, led=5):
+    """An owner with ``projects`` projects staffed from ``pool`` collaborators.
+
+    The owner also collaborates on ``led`` projects owned by members of the
+    pool. Returns (owner id, number of distinct teammates).
+    """
+    run = uuid.uuid4().hex[:8]
+    rng = random.Random(projects)
+    with app.app_context():
+        owner = make_user(run, 'owner', 0)
+        members = [make_user(run, 'member', i) for i in range(pool)]
+        db.session.add(owner)
+        db.session.add_all(members)
+        db.session.flush()
+
+        collaborations, teammates = [], set()
+        for i in range(projects):
+            project = Project(title=f'Roster project {i}', description='Roster benchmark', category='test',
+                              funding_goal=100, user_id=owner.id)
+            db.session.add(project)
+            db.session.flush()
+            for member in rng.sample(members, per_project):
+                collaborations.append(Collaboration(project_id=project.id, user_id=member.id,
+                                                    message='', status='accepted'))
+                teammates.add(member.id)
+        for member in members[:led]:
+            project = Project(title=f'Led by {member.full_name}', description='Roster benchmark',
+                              category='test', funding_goal=100, user_id=member.id)
+            db.session.add(project)
+            db.session.flush()
+            collaborations.append(Collaboration(project_id=project.id, user_id=owner.id,
+                                                message='', status='accepted'))
+            teammates.add(member.id)
+        db.session.add_all(collaborations)
+        db.session.commit()
+        return owner.id, len(teammates)
+
+
+def measure(user_id, per_page):
+    """Page through the roster; returns (statements per page, seconds, member ids)"""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    counts, member_ids, cursor = [], [], None
+    started = time.perf_counter()
+    with app.app_context():
+        while True:
+            statements = []
+            listener = lambda *args: statements.append(args[2])  # noqa: E731
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                url = f'/api/user/team?per_page={per_page}' + (f'&cursor={cursor}' if cursor else '')
+                response = client.get(url)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            if response.status_code != 200:
+                raise SystemExit(f'roster failed: {response.status_code} {response.get_data(as_text=True)}')
+            data = response.get_json()
+            counts.append(len(statements))
+            member_ids.extend(member['user']['id'] for member in data['members'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+    return counts, time.perf_counter() - started, member_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--projects', type=int, nargs='+', default=[10, 100, 300])
+    parser.add_argument('--pool', type=int, default=40, help='distinct collaborators per owner')
+    parser.add_argument('--per-project', type=int, default=4, help='collaborators on each project')
+    parser.add_argument('--per-page', type=int, default=25)
+    args = parser.parse_args()
+
+    counts = set()
+    for size in args.projects:
+        owner_id, teammates = setup(size, args.pool, args.per_project)
+        pages, elapsed, member_ids = measure(owner_id, args.per_page)
+        counts.update(pages)
+        print(f'{size:6d} projects: {len(member_ids)} members in {len(pages)} pages, '
+              f'{max(pages)} queries/page, {elapsed * 1000:.1f} ms total')
+        if len(member_ids) != len(set(member_ids)) or len(member_ids) != teammates:
+            raise SystemExit(f'Expected {teammates} distinct members, got {len(member_ids)}')
+    if len(counts) > 1:
+        raise SystemExit('Query count grows with the number of projects')
+    print('Query count is constant')
+
+
+if __name__ == '__main__':
+    main()
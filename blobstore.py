@@ -0,0 +1,260 @@
+"""Content-addressed storage for user-uploaded media.
+
+Blobs are keyed by the SHA-256 of their content plus a file extension,
+so identical uploads are stored once and a key never changes meaning.
+That lets ``/blobs/<key>`` be served with an immutable Cache-Control.
+
+Everything under ``/blobs`` shares the site's origin, so only the image
+and video types in ``MEDIA_TYPES`` are served inline; data URLs of any
+other type are rejected, and other attachments are served as downloads.
+"""
+import abc
+import base64
+import binascii
+import hashlib
+import importlib
+import io
+import os
+import re
+import shutil
+import tempfile
+
+from app import app, db
+
+app.config.setdefault('BLOB_STORE_BACKEND', os.environ.get('BLOB_STORE_BACKEND', 'local'))
+app.config.setdefault('BLOB_STORE_PATH', os.environ.get('BLOB_STORE_PATH', os.path.join('static', 'uploads', 'blobs')))
+app.config.setdefault('BLOB_MAX_SIZE', int(os.environ.get('BLOB_MAX_SIZE', 10 * 1024 * 1024)))
+
+BLOB_KEY_RE = re.compile(r'^[0-9a-f]{64}(\.[a-z0-9]{1,8})?$')
+
+# Types rendered inline (<img>, <video>); the only ones a data URL may carry
+MEDIA_TYPES = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'video/mp4': '.mp4',
+    'video/webm': '.webm',
+}
+# Attachment types that keep an extension in their key; served as downloads
+DOWNLOAD_TYPES = {
+    'application/pdf': '.pdf',
+    'application/zip': '.zip',
+    'text/plain': '.txt',
+    'text/csv': '.csv',
+}
+MEDIA_EXTENSIONS = {extension: mime for mime, extension in MEDIA_TYPES.items()}
+DOWNLOAD_EXTENSIONS = {extension: mime for mime, extension in DOWNLOAD_TYPES.items()}
+
+# Bytes read per step when hashing or copying files
+COPY_BUFFER = 64 * 1024
+DATA_URL_RE = re.compile(r'^data:(?P<mime>[\w.+-]+/[\w.+-]+)?(?P<params>(;[^;,]*)*?);base64,(?P<data>.*)$', re.DOTALL)
+
+
+class BlobError(ValueError):
+    pass
+
+
+class BlobStore(abc.ABC):
+    """Interface for blob backends"""
+
+    @abc.abstractmethod
+    def exists(self, key):
+        pass
+
+    @abc.abstractmethod
+    def write(self, key, source):
+        """Store the binary file object ``source`` as ``key``, atomically"""
+
+    @abc.abstractmethod
+    def open(self, key):
+        """A readable binary file object with the content of ``key``"""
+
+    def put(self, data, content_type=None):
+        key = blob_key(data, content_type)
+        if not self.exists(key):
+            self.write(key, io.BytesIO(data))
+        return key
+
+    def put_file(self, path, key):
+        """Move the finished file at ``path`` into the store as ``key``"""
+        try:
+            hasher = hashlib.sha256()
+            with open(path, 'rb') as source:
+                for piece in iter(lambda: source.read(COPY_BUFFER), b''):
+                    hasher.update(piece)
+                if hasher.hexdigest() != key.split('.')[0]:
+                    raise BlobError('Content does not match key')
+                if not self.exists(key):
+                    source.seek(0)
+                    self.write(key, source)
+        finally:
+            os.remove(path)
+        return key
+
+    def path(self, key):
+        """Local filesystem path for ``key``, or None if the backend has none"""
+        return None
+
+    def url(self, key):
+        return f'/blobs/{key}'
+
+
+class LocalBlobStore(BlobStore):
+    """Stores blobs on local disk as <root>/<first two hex chars>/<key>"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def write(self, key, source):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Write to a temp file and rename so readers never see partial blobs
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                shutil.copyfileobj(source, tmp, COPY_BUFFER)
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_file(self, path, key):
+        target = self.path(key)
+        if os.path.exists(target):
+            # Identical content is already stored
+            os.remove(path)
+            return key
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+        os.close(fd)
+        try:
+            # move() copies across filesystems; the rename into place stays atomic
+            shutil.move(path, tmp_path)
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key
+
+
+BACKENDS = {
+    'local': lambda: LocalBlobStore(app.config['BLOB_STORE_PATH']),
+}
+
+_store = None
+
+
+def get_blob_store():
+    """Return the configured backend ('local' or a dotted path to a BlobStore factory)"""
+    global _store
+    if _store is None:
+        backend = app.config['BLOB_STORE_BACKEND']
+        if backend in BACKENDS:
+            _store = BACKENDS[backend]()
+        else:
+            module_name, _, attr = backend.rpartition('.')
+            _store = getattr(importlib.import_module(module_name), attr)()
+    return _store
+
+
+def blob_key(data, content_type=None):
+    return key_for_digest(hashlib.sha256(data).hexdigest(), content_type)
+
+
+def key_for_digest(hexdigest, content_type=None):
+    """Key for content with this digest; only allowlisted types get an extension"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    return hexdigest + (MEDIA_TYPES.get(content_type) or DOWNLOAD_TYPES.get(content_type) or '')
+
+
+def serving_type(key):
+    """(MIME type, inline) to serve ``key`` with; only ``MEDIA_TYPES`` render inline"""
+    extension = os.path.splitext(key)[1]
+    if extension in MEDIA_EXTENSIONS:
+        return MEDIA_EXTENSIONS[extension], True
+    return DOWNLOAD_EXTENSIONS.get(extension, 'application/octet-stream'), False
+
+
+def is_data_url(value):
+    return isinstance(value, str) and value.startswith('data:')
+
+
+def decode_data_url(value):
+    """Return (MIME type, bytes) of a base64 data URL of any type"""
+    match = DATA_URL_RE.match(value)
+    if not match:
+        raise BlobError('Unsupported data URL')
+    try:
+        data = base64.b64decode(match.group('data'), validate=False)
+    except (binascii.Error, ValueError):
+        raise BlobError('Invalid base64 payload')
+    if len(data) > app.config['BLOB_MAX_SIZE']:
+        raise BlobError('Uploaded file is too large')
+    return (match.group('mime') or '').lower(), data
+
+
+def store_data_url(value):
+    """Decode a base64 data URL into the blob store and return its public URL"""
+    mime, data = decode_data_url(value)
+    if mime not in MEDIA_TYPES:
+        raise BlobError(f"Unsupported media type; use one of {', '.join(MEDIA_TYPES)}")
+    store = get_blob_store()
+    return store.url(store.put(data, mime))
+
+
+def externalize(value):
+    """Move ``value`` into the blob store if it is a data URL; pass URLs and None through"""
+    return store_data_url(value) if is_data_url(value) else value
+
+
+MIGRATE_BATCH_SIZE = 100
+
+
+@app.cli.command('migrate-blobs')
+def migrate_blobs_command():
+    """Move base64 images stored in the database into the blob store."""
+    from models import User, Discussion
+
+    store = get_blob_store()
+    moved, downloads, skipped = 0, 0, []
+    for model, column in ((User, 'profile_image'), (Discussion, 'media_url')):
+        attr = getattr(model, column)
+        last_id = 0
+        while True:
+            # Batches by id, each committed, so a rerun picks up where this one stopped
+            rows = db.session.query(model.id, attr).filter(attr.like('data:%'), model.id > last_id)\
+                .order_by(model.id).limit(MIGRATE_BATCH_SIZE).all()
+            if not rows:
+                break
+            for row_id, value in rows:
+                try:
+                    mime, data = decode_data_url(value)
+                except BlobError as e:
+                    skipped.append(f'{model.__tablename__} {row_id}: {e}')
+                    continue
+                # Types the old UI accepted but /blobs no longer renders (image/bmp, image/svg+xml...)
+                # are kept as downloads rather than left inline
+                if mime not in MEDIA_TYPES:
+                    downloads += 1
+                values = {attr: store.url(store.put(data, mime))}
+                if hasattr(model, 'updated_at'):
+                    values[model.updated_at] = model.updated_at
+                db.session.query(model).filter(model.id == row_id).update(values, synchronize_session=False)
+                moved += 1
+            db.session.commit()
+            last_id = rows[-1][0]
+    print(f'{moved} inline images moved to the blob store ({downloads} as downloads)')
+    for line in skipped:
+        print(f'skipped {line}')
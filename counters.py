@@ -0,0 +1,82 @@
+from sqlalchemy import func, select
+
+from app import app, db
+from ranking import ENGAGEMENT, refresh_scores
+from models import Project, Comment, Vote, Collaboration, Discussion, DiscussionReply, DiscussionLike, ReplyReaction, CommentReaction
+
+
+def adjust_counter(model, row_id, **deltas):
+    """Atomically add deltas to counter columns of a single row.
+
+    Runs as an UPDATE ... SET col = col + delta inside the caller's
+    transaction, so the counter commits (or rolls back) with the write
+    that caused it. The row's ``updated_at`` is left alone: a vote is not
+    an edit.
+    """
+    values = {getattr(model, name): getattr(model, name) + delta for name, delta in deltas.items() if delta}
+    if values:
+        values[model.updated_at] = model.updated_at
+        model.query.filter(model.id == row_id).update(values, synchronize_session=False)
+        # Hot scores are derived from the counters
+        if model in ENGAGEMENT:
+            refresh_scores(model, [row_id])
+
+
+def _count(column, *criteria):
+    return select(func.count(column)).where(*criteria).scalar_subquery()
+
+
+# Counter column -> correlated COUNT over its source table
+COUNTER_SOURCES = {
+    Project: {
+        'vote_count': lambda: _count(Vote.id, Vote.project_id == Project.id, Vote.is_upvote == True),
+        'comment_count': lambda: _count(Comment.id, Comment.project_id == Project.id),
+        'collaboration_count': lambda: _count(Collaboration.id, Collaboration.project_id == Project.id),
+    },
+    Comment: {
+        'like_count': lambda: _count(CommentReaction.id, CommentReaction.comment_id == Comment.id,
+                                     CommentReaction.reaction_type == 'like'),
+        'heart_count': lambda: _count(CommentReaction.id, CommentReaction.comment_id == Comment.id,
+                                      CommentReaction.reaction_type == 'heart'),
+    },
+    Discussion: {
+        'like_count': lambda: _count(DiscussionLike.id, DiscussionLike.discussion_id == Discussion.id),
+        'reply_count': lambda: _count(DiscussionReply.id, DiscussionReply.discussion_id == Discussion.id),
+    },
+    DiscussionReply: {
+        'like_count': lambda: _count(ReplyReaction.id, ReplyReaction.reply_id == DiscussionReply.id,
+                                     ReplyReaction.reaction_type == 'like'),
+        'heart_count': lambda: _count(ReplyReaction.id, ReplyReaction.reply_id == DiscussionReply.id,
+                                      ReplyReaction.reaction_type == 'heart'),
+    },
+}
+
+
+def recount(model, ids=None):
+    """Recompute the counter columns of ``model`` from the source tables.
+
+    Pass ``ids`` to limit the rebuild to specific rows. Returns the number
+    of rows updated; the caller is responsible for committing.
+    """
+    values = {getattr(model, name): build() for name, build in COUNTER_SOURCES[model].items()}
+    values[model.updated_at] = model.updated_at
+    query = model.query
+    if ids is not None:
+        query = query.filter(model.id.in_(list(ids)))
+    return query.update(values, synchronize_session=False)
+
+
+def rebuild_counters():
+    """Rebuild every denormalized counter. Returns {table: rows updated}"""
+    results = {}
+    for model in COUNTER_SOURCES:
+        results[model.__tablename__] = recount(model)
+    db.session.commit()
+    return results
+
+
+@app.cli.command('rebuild-counters')
+def rebuild_counters_command():
+    """Reconcile denormalized engagement counters with their source tables."""
+    for table, rows in rebuild_counters().items():
+        print(f'{table}: {rows} rows reconciled')
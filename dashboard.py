@@ -0,0 +1,148 @@
+"""Dashboard summary for the signed-in user.
+
+Everything the dashboard overview shows comes from a fixed number of
+queries, however many projects the user has: one grouped aggregate row
+for the totals, one page of recent projects, and one UNION ALL over the
+user's projects, collaboration requests, donations, votes and comments for
+the activity feed. Each branch of the union is limited on its own
+``(user_id, created_at)`` index before the branches are merged.
+
+Summaries are cached per user for ``DASHBOARD_CACHE_TTL`` seconds (0
+disables the cache). The cache is per process; project writes by the user
+invalidate it, other changes show up when it expires.
+"""
+import os
+
+from sqlalchemy import Numeric, String, bindparam, cast, func, literal, null, select, true, union_all
+
+from app import app, db
+from cache import TTLCache
+from ledger import to_json_amount
+from models import Project, Collaboration, Donation, Vote, Comment
+
+app.config.setdefault('DASHBOARD_CACHE_TTL', int(os.environ.get('DASHBOARD_CACHE_TTL', 10)))
+
+RECENT_PROJECTS = 5
+ACTIVITY_LIMIT = 10
+
+ACTIVITY_TEXT = {
+    'project_created': 'Created new project "{title}"',
+    'collaboration': 'Requested collaboration on "{title}"',
+    'donation': 'Donated ${amount:.2f} to "{title}"',
+    'vote': 'Voted for "{title}"',
+    'comment': 'Commented on "{title}"',
+}
+
+_summaries = TTLCache(maxsize=10000, ttl=app.config['DASHBOARD_CACHE_TTL'])
+
+# Shared by every branch of the activity union
+_user_id = bindparam('user_id')
+
+
+def totals(user_id):
+    """Aggregate counts for the user's projects and contributions, in one row"""
+    owned = select(
+        func.count(Project.id).label('total_projects'),
+        func.coalesce(func.sum(Project.current_funding), 0).label('total_funding'),
+        func.coalesce(func.sum(Project.vote_count), 0).label('total_votes'),
+        func.coalesce(func.sum(Project.comment_count), 0).label('total_comments'),
+        func.coalesce(func.sum(Project.collaboration_count), 0).label('collaboration_requests'),
+    ).where(Project.user_id == user_id).subquery()
+    requested = select(
+        func.count(Collaboration.id).label('total_collaborations'),
+    ).where(Collaboration.user_id == user_id).subquery()
+    donated = select(
+        func.count(Donation.id).label('donations_made'),
+        func.coalesce(func.sum(Donation.amount), 0).label('total_donated'),
+    ).where(Donation.user_id == user_id).subquery()
+
+    # Each side is a single aggregate row, so the cross join is one row too
+    row = db.session.execute(
+        select(owned, requested, donated).select_from(owned.join(requested, true()).join(donated, true()))
+    ).one()._asdict()
+    row['total_funding'] = to_json_amount(row['total_funding'])
+    row['total_donated'] = to_json_amount(row['total_donated'])
+    return row
+
+
+def recent_projects(user_id, limit=RECENT_PROJECTS):
+    rows = db.session.execute(
+        select(Project.id, Project.title, Project.category, Project.status, Project.created_at,
+               Project.vote_count, Project.comment_count, Project.current_funding, Project.funding_goal)
+        .where(Project.user_id == user_id)
+        .order_by(Project.created_at.desc())
+        .limit(limit)
+    ).all()
+    return [{
+        'id': row.id,
+        'title': row.title,
+        'category': row.category,
+        'status': row.status,
+        'created_at': row.created_at.isoformat(),
+        'vote_count': row.vote_count,
+        'comment_count': row.comment_count,
+        'current_funding': to_json_amount(row.current_funding),
+        'funding_goal': to_json_amount(row.funding_goal),
+    } for row in rows]
+
+
+def _activity_branch(kind, model, *criteria, status=None, amount=None, limit):
+    query = select(
+        literal(kind).label('type'),
+        Project.id.label('project_id'),
+        Project.title.label('project_title'),
+        model.created_at.label('time'),
+        (status if status is not None else cast(null(), String(50))).label('status'),
+        (amount if amount is not None else cast(null(), Numeric(12, 2))).label('amount'),
+    )
+    if model is not Project:
+        query = query.join_from(model, Project, model.project_id == Project.id)
+    query = query.where(model.user_id == _user_id, *criteria).order_by(model.created_at.desc()).limit(limit)
+    # Wrapped so each branch keeps its own ORDER BY/LIMIT inside the UNION
+    return select(query.subquery())
+
+
+def recent_activity(user_id, limit=ACTIVITY_LIMIT):
+    """The user's latest actions across every activity type, newest first"""
+    feed = union_all(
+        _activity_branch('project_created', Project, limit=limit),
+        _activity_branch('collaboration', Collaboration, status=Collaboration.status, limit=limit),
+        _activity_branch('donation', Donation, amount=Donation.amount, limit=limit),
+        _activity_branch('vote', Vote, Vote.is_upvote == True, limit=limit),
+        _activity_branch('comment', Comment, limit=limit),
+    ).subquery()
+    rows = db.session.execute(
+        select(feed).order_by(feed.c.time.desc()).limit(limit), {'user_id': user_id}
+    ).all()
+
+    activities = []
+    for row in rows:
+        activity = {
+            'type': row.type,
+            'text': ACTIVITY_TEXT[row.type].format(title=row.project_title, amount=row.amount or 0),
+            'time': row.time.isoformat(),
+            'project_id': row.project_id,
+        }
+        if row.status is not None:
+            activity['status'] = row.status
+        if row.amount is not None:
+            activity['amount'] = to_json_amount(row.amount)
+        activities.append(activity)
+    return activities
+
+
+def dashboard_summary(user_id):
+    summary = _summaries.get(user_id) if app.config['DASHBOARD_CACHE_TTL'] else None
+    if summary is None:
+        summary = {
+            **totals(user_id),
+            'recent_projects': recent_projects(user_id),
+            'activity': recent_activity(user_id),
+        }
+        if app.config['DASHBOARD_CACHE_TTL']:
+            _summaries.set(user_id, summary)
+    return summary
+
+
+def invalidate_dashboard(user_id):
+    _summaries.delete(user_id)
@@ -0,0 +1,170 @@
+"""Push channel for notifications and team chat.
+
+Events are published to user ids and delivered to that user's open
+Server-Sent Events streams (``/api/events``). Two brokers are available:
+
+* ``memory``   - fans out inside the current process only. Fine for the
+                 development server or a single gunicorn worker.
+* ``postgres`` - publishes with NOTIFY; every worker LISTENs on one
+                 dedicated connection and fans out to its own subscribers,
+                 so events reach users connected to any worker.
+
+``EVENT_BROKER`` selects one; by default PostgreSQL databases use the
+postgres broker and everything else the in-process one.
+"""
+import json
+import logging
+import os
+import queue
+import select
+import threading
+from collections import defaultdict
+
+from sqlalchemy import func
+from sqlalchemy import select as sql_select
+
+from app import app, db
+
+app.config.setdefault('EVENT_BROKER', os.environ.get('EVENT_BROKER', 'auto'))
+app.config.setdefault('EVENT_CHANNEL', 'app_events')
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must stay under 8000 bytes
+MAX_NOTIFY_PAYLOAD = 7900
+
+
+class Subscription:
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=256)
+
+    def get(self, timeout=None):
+        """Next (event, data) pair, or None if nothing arrived within ``timeout``"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def deliver(self, event, data):
+        try:
+            self.queue.put_nowait((event, data))
+        except queue.Full:
+            # A stalled client should not block publishers; it will resync on reconnect
+            pass
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_ids, event, data):
+        self._fan_out(user_ids, event, data)
+
+    def _fan_out(self, user_ids, event, data):
+        with self._lock:
+            targets = [sub for user_id in user_ids for sub in self._subscribers.get(user_id, ())]
+        for subscription in targets:
+            subscription.deliver(event, data)
+
+
+class PostgresBroker(InProcessBroker):
+    """Fans out across worker processes with PostgreSQL LISTEN/NOTIFY"""
+
+    def __init__(self, channel):
+        super().__init__()
+        self.channel = channel
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        self._ensure_listener()
+        return super().subscribe(user_id)
+
+    def publish(self, user_ids, event, data):
+        payload = json.dumps({'users': list(user_ids), 'event': event, 'data': data}, default=str)
+        if len(payload.encode('utf-8')) > MAX_NOTIFY_PAYLOAD:
+            # Too large for NOTIFY: send just enough for the client to refetch
+            payload = json.dumps({'users': list(user_ids), 'event': event, 'data': {'id': data.get('id'), 'truncated': True}})
+        with db.engine.begin() as connection:
+            connection.execute(sql_select(func.pg_notify(self.channel, payload)))
+
+    def _ensure_listener(self):
+        # Started lazily so each gunicorn worker gets its own thread after fork
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        raw = db.engine.raw_connection()
+        raw.detach()  # keep this long-lived connection out of the pool
+        connection = raw.driver_connection
+        connection.autocommit = True
+        cursor = connection.cursor()
+        cursor.execute(f'LISTEN "{self.channel}"')
+        try:
+            while True:
+                if select.select([connection], [], [], 30) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    try:
+                        message = json.loads(notify.payload)
+                        self._fan_out(message['users'], message['event'], message['data'])
+                    except (ValueError, KeyError):
+                        logger.warning('Ignoring malformed event payload')
+        except Exception:
+            logger.exception('Event listener stopped; it restarts on the next subscription')
+        finally:
+            raw.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            kind = app.config['EVENT_BROKER']
+            if kind == 'auto':
+                kind = 'postgres' if db.engine.dialect.name == 'postgresql' else 'memory'
+            _broker = PostgresBroker(app.config['EVENT_CHANNEL']) if kind == 'postgres' else InProcessBroker()
+        return _broker
+
+
+def publish_event(user_ids, event, data):
+    """Push an event to the given users' open streams. Never raises."""
+    user_ids = [user_id for user_id in user_ids if user_id]
+    if not user_ids:
+        return
+    try:
+        get_broker().publish(user_ids, event, data)
+    except Exception:
+        logger.exception('Failed to publish %s event', event)
+
+
+def format_sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, default=str)}\n\n'
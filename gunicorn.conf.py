@@ -0,0 +1,68 @@
+"""gunicorn settings, picked up automatically when gunicorn runs from the project root.
+
+``WEB_WORKER_CLASS`` selects the serving mode:
+
+* ``gevent``  - cooperative workers, the default when gevent is installed.
+                A request waiting on the database, a slow upload or an open
+                event stream yields to the others instead of pinning a
+                process. One worker per CPU, each serving up to
+                ``WEB_WORKER_CONNECTIONS`` connections at once.
+* ``gthread`` - the default without gevent: CPUs + 1 workers with
+                ``WEB_THREADS`` threads each (2 x CPUs by default).
+* ``sync``    - one request at a time per process, 2 x CPUs + 1 workers.
+                Every open ``/api/events`` stream holds a whole worker.
+
+``WEB_CONCURRENCY`` overrides the worker count. The database pool of each
+worker is sized to match (``DB_POOL_SIZE``, ``DB_MAX_OVERFLOW``,
+``DB_POOL_TIMEOUT``, read by app.py) unless those are set already; keep
+workers x (pool size + overflow) below the database's connection limit.
+
+The app is not preloaded: gevent has to patch the standard library before
+the app (and its background threads) are imported in each worker.
+"""
+import importlib.util
+import logging
+import multiprocessing
+import os
+
+logger = logging.getLogger('gunicorn.error')
+
+cpus = multiprocessing.cpu_count()
+
+worker_class = os.environ.get('WEB_WORKER_CLASS') or (
+    'gevent' if importlib.util.find_spec('gevent') else 'gthread')
+
+if worker_class == 'gevent':
+    workers = cpus
+    worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', 1000))
+    # Greenlets beyond the pool queue for a connection instead of opening more
+    pool = {'DB_POOL_SIZE': 10, 'DB_MAX_OVERFLOW': 10, 'DB_POOL_TIMEOUT': 10}
+elif worker_class == 'gthread':
+    workers = cpus + 1
+    threads = int(os.environ.get('WEB_THREADS', 2 * cpus))
+    pool = {'DB_POOL_SIZE': threads, 'DB_MAX_OVERFLOW': 2, 'DB_POOL_TIMEOUT': 30}
+else:
+    workers = 2 * cpus + 1
+    pool = {'DB_POOL_SIZE': 2, 'DB_MAX_OVERFLOW': 2, 'DB_POOL_TIMEOUT': 30}
+
+workers = int(os.environ.get('WEB_CONCURRENCY', workers))
+
+# Workers fork from this process, so they inherit the pool settings
+for name, value in pool.items():
+    os.environ.setdefault(name, str(value))
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+keepalive = 5 if worker_class in ('gevent', 'gthread') else 2
+
+
+def post_fork(server, worker):
+    if worker_class != 'gevent':
+        return
+    # psycopg2 is a C extension gevent cannot patch; without this every
+    # query blocks the whole worker
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        logger.warning('psycogreen is not installed; PostgreSQL queries will block gevent workers')
+        return
+    patch_psycopg()
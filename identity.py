@@ -0,0 +1,56 @@
+"""The signed-in user, resolved once per request.
+
+``current_user()`` turns the session's ``user_id`` into a slim ``Identity``
+record (no bio, skills or social links) and keeps it on ``g`` for the rest
+of the request, so handlers that need the actor's name for a notification
+don't each fetch the user row again. Records are also cached across
+requests for ``IDENTITY_CACHE_TTL`` seconds; profile edits must call
+``invalidate_identity``, other workers pick the change up on expiry.
+
+Resolution is lazy: requests that never ask for the user cost nothing.
+"""
+import os
+from collections import namedtuple
+
+from flask import g, session
+
+from app import app, db
+from cache import TTLCache
+from models import User
+
+app.config.setdefault('IDENTITY_CACHE_TTL', int(os.environ.get('IDENTITY_CACHE_TTL', 30)))
+
+Identity = namedtuple('Identity', 'id username email full_name college profile_image')
+
+_identities = TTLCache(maxsize=10000, ttl=app.config['IDENTITY_CACHE_TTL'])
+
+
+def load_identity(user_id):
+    """Read a user's identity from the database, or None if there is no such user"""
+    row = db.session.query(User.id, User.username, User.email, User.full_name, User.college, User.profile_image)\
+        .filter(User.id == user_id).first()
+    return Identity(*row) if row else None
+
+
+def get_identity(user_id):
+    identity = _identities.get(user_id)
+    if identity is None:
+        identity = load_identity(user_id)
+        # Unknown ids are not cached; a stale session should keep failing, not linger
+        if identity is not None:
+            _identities.set(user_id, identity)
+    return identity
+
+
+def current_user():
+    """The signed-in user's ``Identity``, or None when signed out or the user is gone"""
+    if 'current_user' not in g:
+        user_id = session.get('user_id')
+        g.current_user = get_identity(user_id) if user_id else None
+    return g.current_user
+
+
+def invalidate_identity(user_id):
+    _identities.delete(user_id)
+    if g.get('current_user') is not None and g.current_user.id == user_id:
+        g.pop('current_user')
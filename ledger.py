@@ -0,0 +1,114 @@
+"""Donation ledger.
+
+Amounts are exact ``Numeric(12, 2)`` values. Recording a donation inserts
+the ledger row and applies the increment in SQL
+(``current_funding = current_funding + :amount``), so concurrent donors
+never overwrite each other's updates.
+
+The platform-wide total lives in ``funding_totals``, split over
+``TOTAL_SHARDS`` rows; each donation bumps one shard at random so
+concurrent donations rarely wait on the same row lock, and reads sum the
+shards.
+"""
+import random
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import func, update
+
+from app import app, db
+from models import Project, Donation, FundingTotal
+from ranking import refresh_scores
+
+TOTAL_SHARDS = 16
+CENTS = Decimal('0.01')
+MAX_AMOUNT = Decimal('1000000')
+
+
+class InvalidAmount(ValueError):
+    pass
+
+
+def parse_amount(value, allow_zero=False):
+    """Parse a money amount from JSON input into a Decimal rounded to cents"""
+    try:
+        amount = Decimal(str(value)).quantize(CENTS)
+    except (InvalidOperation, ValueError, TypeError):
+        raise InvalidAmount('Invalid amount')
+    if not amount.is_finite() or amount > MAX_AMOUNT or amount < 0 or (amount == 0 and not allow_zero):
+        raise InvalidAmount('Invalid amount')
+    return amount
+
+
+def to_json_amount(value):
+    """Money for JSON responses; the frontend works with numbers"""
+    return float(value or 0)
+
+
+def _bump_total(amount, donations):
+    shard = random.randrange(TOTAL_SHARDS)
+    result = db.session.execute(
+        update(FundingTotal).where(FundingTotal.shard == shard)
+        .values(amount=FundingTotal.amount + amount, donation_count=FundingTotal.donation_count + donations)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise RuntimeError('Funding totals are not initialised; run "flask db-upgrade"')
+
+
+def record_donation(project_id, user_id, amount, message=''):
+    """Add a donation inside the caller's transaction.
+
+    Returns (donation, new project total). The caller commits.
+    """
+    donation = Donation()
+    donation.user_id = user_id
+    donation.project_id = project_id
+    donation.amount = amount
+    donation.message = message
+    db.session.add(donation)
+
+    new_total = db.session.execute(
+        update(Project).where(Project.id == project_id)
+        .values(current_funding=func.coalesce(Project.current_funding, 0) + amount)
+        .returning(Project.current_funding)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+    _bump_total(amount, 1)
+    refresh_scores(Project, [project_id])
+    return donation, new_total
+
+
+def remove_project_funding(project_id):
+    """Take a project's donations out of the global total before it is deleted"""
+    amount, count = db.session.query(func.coalesce(func.sum(Donation.amount), 0), func.count(Donation.id))\
+        .filter(Donation.project_id == project_id).one()
+    if count:
+        _bump_total(-Decimal(amount), -count)
+
+
+def platform_total():
+    return db.session.query(func.coalesce(func.sum(FundingTotal.amount), 0)).scalar()
+
+
+def reconcile(connection=None):
+    """Recompute every project's funding and the global total from the ledger"""
+    execute = connection.execute if connection is not None else db.session.execute
+    donated = db.select(func.coalesce(func.sum(Donation.amount), 0))\
+        .where(Donation.project_id == Project.id).scalar_subquery()
+    execute(update(Project).values(current_funding=donated, updated_at=Project.updated_at)
+            .execution_options(synchronize_session=False))
+
+    amount, count = execute(db.select(func.coalesce(func.sum(Donation.amount), 0), func.count(Donation.id))).one()
+    execute(FundingTotal.__table__.delete())
+    execute(FundingTotal.__table__.insert(), [
+        {'shard': shard, 'amount': amount if shard == 0 else 0, 'donation_count': count if shard == 0 else 0}
+        for shard in range(TOTAL_SHARDS)
+    ])
+
+
+@app.cli.command('reconcile-funding')
+def reconcile_funding_command():
+    """Recompute project funding and the platform total from donations."""
+    reconcile()
+    db.session.commit()
+    print(f"Total funding: {platform_total()}")
@@ -0,0 +1,361 @@
+"""Versioned schema migrations.
+
+``db.create_all()`` only creates missing tables, so anything added to an
+existing table (columns, indexes) ships as a numbered migration here.
+Applied versions are recorded in ``schema_migrations`` and pending ones
+run in order on startup (``AUTO_MIGRATE``, on by default) or with
+``flask db-upgrade``.
+
+Fresh databases get the current schema from ``create_all()`` first, so
+every migration must be idempotent: check before adding, create indexes
+with ``checkfirst``.
+"""
+import logging
+import os
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text, update
+
+from app import app, db
+
+app.config.setdefault('AUTO_MIGRATE', os.environ.get('AUTO_MIGRATE', '1') not in ('0', 'false', 'no'))
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent workers migrate one at a time
+MIGRATION_LOCK_ID = 72750418
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    def register(func):
+        MIGRATIONS.append((version, name, func))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return func
+    return register
+
+
+def add_column(connection, table, column, ddl):
+    """Add ``column`` to ``table`` unless it already exists. Returns True if added."""
+    existing = {col['name'] for col in inspect(connection).get_columns(table)}
+    if column in existing:
+        return False
+    connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+    return True
+
+
+# Indexes a later migration dropped from the models, as the earlier
+# migrations that create them originally declared them
+RETIRED_INDEXES = {
+    'ix_team_chats_project_id_created_at': 'CREATE INDEX IF NOT EXISTS ix_team_chats_project_id_created_at '
+                                           'ON team_chats (project_id, created_at)',
+}
+
+
+def create_indexes(connection, *names):
+    """Create the named indexes declared on the models if they are missing"""
+    declared = {index.name: index for table in db.metadata.tables.values() for index in table.indexes}
+    for name in names:
+        if name in RETIRED_INDEXES:
+            connection.execute(text(RETIRED_INDEXES[name]))
+        else:
+            declared[name].create(connection, checkfirst=True)
+
+
+@migration(1, 'denormalized engagement counters')
+def add_counter_columns(connection):
+    from counters import COUNTER_SOURCES
+
+    for model, sources in COUNTER_SOURCES.items():
+        added = [name for name in sources
+                 if add_column(connection, model.__tablename__, name, "INTEGER NOT NULL DEFAULT 0")]
+        if added:
+            # Keep updated_at: backfilling counters is not an edit
+            values = {name: sources[name]() for name in added}
+            connection.execute(update(model).values({**values, 'updated_at': model.updated_at}))
+
+
+@migration(2, 'indexes for hot filters and sort orders')
+def add_hot_path_indexes(connection):
+    create_indexes(
+        connection,
+        'ix_projects_created_at',
+        'ix_projects_category_created_at',
+        'ix_projects_user_id_created_at',
+        'ix_projects_vote_count',
+        'ix_projects_current_funding',
+        'ix_comments_project_id_created_at',
+        'ix_comment_reactions_comment_id',
+        'ix_comment_replies_comment_id',
+        'ix_votes_project_id',
+        'ix_collaborations_project_id_status',
+        'ix_collaborations_user_id_status',
+        'ix_donations_project_id',
+        'ix_donations_user_id_created_at',
+        'ix_discussions_created_at',
+        'ix_discussions_category_created_at',
+        'ix_discussions_like_count',
+        'ix_discussion_replies_thread',
+        'ix_discussion_replies_parent_reply_id',
+        'ix_discussion_likes_discussion_id',
+        'ix_reply_reactions_reply_id',
+        'ix_notifications_user_id_is_read_created_at',
+        'ix_notifications_user_id_created_at',
+        'ix_project_attachments_project_id',
+        'ix_team_chats_project_id_created_at',
+    )
+
+
+@migration(3, 'full-text search vectors')
+def add_search_vectors(connection):
+    import search
+
+    search.install(connection)
+
+
+@migration(4, 'notification coalescing count')
+def add_notification_count(connection):
+    add_column(connection, 'notifications', 'count', 'INTEGER NOT NULL DEFAULT 1')
+
+
+@migration(5, 'exact money amounts and funding totals')
+def add_donation_ledger(connection):
+    import ledger
+
+    if connection.dialect.name == 'postgresql':
+        for table, column in (('donations', 'amount'), ('projects', 'current_funding'), ('projects', 'funding_goal')):
+            connection.execute(text(
+                f'ALTER TABLE {table} ALTER COLUMN {column} TYPE NUMERIC(12, 2) USING round({column}::numeric, 2)'
+            ))
+    # SQLite has no ALTER COLUMN TYPE; its REAL values are read back as Decimal
+    ledger.reconcile(connection)
+
+
+@migration(6, 'attachment content hashes')
+def add_attachment_hash(connection):
+    add_column(connection, 'project_attachments', 'content_hash', 'VARCHAR(64)')
+
+
+@migration(7, 'team chat index by message id')
+def add_team_chat_id_index(connection):
+    create_indexes(connection, 'ix_team_chats_project_id_id')
+    # Replaces the (project_id, created_at) index from migration 2
+    connection.execute(text('DROP INDEX IF EXISTS ix_team_chats_project_id_created_at'))
+
+
+@migration(8, 'hot scores')
+def add_hot_scores(connection):
+    import ranking
+
+    for model in ranking.ENGAGEMENT:
+        add_column(connection, model.__tablename__, 'hot_score', 'FLOAT NOT NULL DEFAULT 0')
+        ranking.refresh_scores(model, connection=connection)
+    create_indexes(connection, 'ix_projects_hot_score', 'ix_discussions_hot_score')
+
+
+@migration(9, 'per-user activity indexes')
+def add_activity_indexes(connection):
+    create_indexes(connection, 'ix_votes_user_id_created_at', 'ix_comments_user_id_created_at')
+
+
+@migration(10, 'category listing indexes for every sort order')
+def add_category_sort_indexes(connection):
+    create_indexes(
+        connection,
+        'ix_projects_category_vote_count',
+        'ix_projects_category_current_funding',
+        'ix_projects_category_hot_score',
+        'ix_discussions_category_like_count',
+        'ix_discussions_category_hot_score',
+    )
+
+
+@migration(11, 'upload session content hashes')
+def add_upload_hash(connection):
+    add_column(connection, 'upload_sessions', 'content_hash', 'VARCHAR(64)')
+
+
+def applied_versions(connection):
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade():
+    """Apply pending migrations in one transaction. Returns the versions applied."""
+    applied = []
+    with db.engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text('SELECT pg_advisory_xact_lock(:id)'), {'id': MIGRATION_LOCK_ID})
+        done = applied_versions(connection)
+        for version, name, func in MIGRATIONS:
+            if version in done:
+                continue
+            logger.info('Applying migration %s: %s', version, name)
+            func(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+            applied.append(version)
+    return applied
+
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Apply pending schema migrations."""
+    applied = upgrade()
+    print(f'Applied migrations: {applied}' if applied else 'Database is up to date')
+
+
+@app.cli.command('db-status')
+def db_status_command():
+    """List schema migrations and whether they have been applied."""
+    with db.engine.begin() as connection:
+        done = applied_versions(connection)
+    for version, name, _ in MIGRATIONS:
+        print(f"{'x' if version in done else ' '} {version:4d}  {name}")
+
+
+def _sample_cursor(keys):
+    """A cursor past the first page for ``keys``, so the keyset predicate is in the plan"""
+    from pagination import encode_cursor
+    # A plain number fits the id, count, score and relevance keys
+    samples = {datetime: datetime(2000, 1, 1), Decimal: Decimal(1)}
+    return encode_cursor([samples.get(_python_type(key), 1) for key in keys])
+
+
+def _python_type(key):
+    """The Python type of a sort key's values, or None for untyped expressions"""
+    try:
+        return key.type.python_type
+    except NotImplementedError:
+        return None
+
+
+def _pages(label, query, keys, descending=True):
+    """The first and a later page of ``query``, built the way paginate_request() builds them"""
+    from pagination import keyset_query
+    return {
+        label: keyset_query(query, keys, descending=descending)[0].statement,
+        f'{label} (next page)': keyset_query(query, keys, _sample_cursor(keys), descending=descending)[0].statement,
+    }
+
+
+def _hot_queries():
+    """Statements for the hot routes, keyed by a short label.
+
+    Listings are built with the same pagination, search and reply tree
+    helpers the routes use, so the plans cover their keyset predicates,
+    ranked search and the recursive reply query.
+    """
+    from models import (Project, Comment, Vote, Collaboration, Donation, Discussion, User,
+                        DiscussionLike, ReplyReaction, Notification, CommentReaction, ProjectAttachment, TeamChat)
+    from routes import DISCUSSION_SORT_KEYS, PROJECT_SORT_KEYS
+    from search import apply_search
+    from serializers import reply_tree_query
+
+    queries = {}
+    for sort in ('recent', 'votes', 'funding', 'hot'):
+        keys = PROJECT_SORT_KEYS[sort]
+        queries.update(_pages(f'projects: by {sort}', Project.query, keys))
+        queries.update(_pages(f'projects: by category, {sort}', Project.query.filter(Project.category == 'tech'), keys))
+    for sort in ('recent', 'likes', 'hot'):
+        keys = DISCUSSION_SORT_KEYS[sort]
+        queries.update(_pages(f'discussions: by {sort}', Discussion.query, keys))
+        queries.update(_pages(f'discussions: by category, {sort}',
+                              Discussion.query.filter(Discussion.category == 'general'), keys))
+    for label, model, keys in (('projects', Project, PROJECT_SORT_KEYS['recent']),
+                               ('discussions', Discussion, DISCUSSION_SORT_KEYS['recent']),
+                               ('users', User, None)):
+        query, relevance = apply_search(model.query, model, 'open source')
+        if relevance is not None:
+            queries.update(_pages(f'search: {label} by relevance', query, (relevance, model.id)))
+        if keys:
+            queries.update(_pages(f'search: {label} by recent', query, keys))
+    queries.update(_pages('users: by signup', User.query, (User.id,), descending=False))
+    queries.update(_pages('notifications', Notification.query.filter_by(user_id=1),
+                          (Notification.created_at, Notification.id)))
+
+    queries.update({
+        'reply tree': reply_tree_query(1).statement,
+        'reply tree: newest first, next page': reply_tree_query(1, cursor=100, newest_first=True).statement,
+        'reply tree: expand': reply_tree_query(1, parent_id=1, cursor=100).statement,
+        'projects: by owner': select(Project).where(Project.user_id == 1).order_by(Project.created_at.desc()),
+        'project comments': select(Comment).where(Comment.project_id == 1).order_by(Comment.created_at.desc()),
+        'user votes': select(Vote).where(Vote.user_id == 1).order_by(Vote.created_at.desc()).limit(10),
+        'user comments': select(Comment).where(Comment.user_id == 1).order_by(Comment.created_at.desc()).limit(10),
+        'project votes': select(Vote).where(Vote.project_id == 1, Vote.is_upvote == True),
+        'project team': select(Collaboration).where(Collaboration.project_id == 1, Collaboration.status == 'accepted'),
+        'user collaborations': select(Collaboration).where(Collaboration.user_id == 1, Collaboration.status == 'accepted'),
+        'project donations': select(Donation).where(Donation.project_id == 1),
+        'user donations': select(Donation).where(Donation.user_id == 1).order_by(Donation.created_at.desc()),
+        'project attachments': select(ProjectAttachment).where(ProjectAttachment.project_id == 1),
+        'team chat: tail': select(TeamChat).where(TeamChat.project_id == 1).order_by(TeamChat.id.desc()).limit(50),
+        'team chat: since': select(TeamChat).where(TeamChat.project_id == 1, TeamChat.id > 100)
+            .order_by(TeamChat.id).limit(50),
+        'discussion likes': select(DiscussionLike).where(DiscussionLike.discussion_id == 1),
+        'reply reactions': select(ReplyReaction).where(ReplyReaction.reply_id == 1),
+        'comment reactions': select(CommentReaction).where(CommentReaction.comment_id == 1),
+        'unread notifications': select(Notification).where(Notification.user_id == 1, Notification.is_read == False)
+            .order_by(Notification.created_at.desc()),
+    })
+    return queries
+
+
+# Plan steps a query cannot avoid, by label prefix: search matches come out
+# of the search index and are sorted afterwards, the reply tree is ordered
+# by the depth it computes, and SQLite walks users in id order as a rowid SCAN
+EXPECTED_PLAN_STEPS = {
+    'search: ': ('Sort', 'USE TEMP B-TREE'),
+    'reply tree': ('Sort', 'USE TEMP B-TREE'),
+    'users: by signup': ('SCAN users',),
+}
+
+
+def _plan_problems(connection, statement):
+    """Full table scans or explicit sorts in the plan for ``statement``"""
+    sql = str(statement.compile(connection, compile_kwargs={'literal_binds': True}))
+    if connection.dialect.name == 'postgresql':
+        plan = connection.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()[0]['Plan']
+        problems, nodes = [], [plan]
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] == 'Seq Scan':
+                problems.append(f"Seq Scan on {node['Relation Name']}")
+            elif node['Node Type'] == 'Sort':
+                problems.append(f"Sort on {', '.join(node.get('Sort Key', []))}")
+            nodes.extend(node.get('Plans', []))
+        return problems
+    rows = connection.execute(text(f'EXPLAIN QUERY PLAN {sql}')).all()
+    # Scans of FTS tables and CTEs are not table scans
+    return [row[-1] for row in rows
+            if (row[-1].startswith('SCAN ') and 'USING' not in row[-1] and row[-1].split()[1] in db.metadata.tables)
+            or 'TEMP B-TREE' in row[-1]]
+
+
+@app.cli.command('check-indexes')
+def check_indexes_command():
+    """EXPLAIN the hot queries and report any that scan a table or sort in memory."""
+    failures = 0
+    with db.engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            # Small development tables would otherwise always be seq scanned
+            connection.execute(text('SET enable_seqscan = off'))
+        for label, statement in _hot_queries().items():
+            expected = [step for prefix, steps in EXPECTED_PLAN_STEPS.items() if label.startswith(prefix)
+                        for step in steps]
+            problems = [problem for problem in _plan_problems(connection, statement)
+                        if not problem.startswith(tuple(expected))]
+            failures += bool(problems)
+            print(f"{'FAIL' if problems else 'ok  '} {label}" + (f": {'; '.join(problems)}" if problems else ''))
+        connection.rollback()
+    if failures:
+        raise SystemExit(f'{failures} queries are not index-backed')
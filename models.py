@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from cache import TTLCache
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(db.Model):
@@ -57,6 +58,44 @@ class User(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+# Slim user projection embedded as owner/author/donor/collaborator/actor.
+# Cached across requests; update_profile invalidates the edited user.
+_author_summaries = TTLCache(maxsize=10000, ttl=60)
+
+def load_author_summaries(user_ids):
+    """Return {user_id: summary}, fetching cache misses with one column-restricted query"""
+    summaries = {}
+    missing = set()
+    for user_id in user_ids:
+        if user_id is None:
+            continue
+        summary = _author_summaries.get(user_id)
+        if summary is None:
+            missing.add(user_id)
+        else:
+            summaries[user_id] = summary
+    if missing:
+        rows = db.session.query(User.id, User.username, User.full_name, User.profile_image)\
+                         .filter(User.id.in_(missing)).all()
+        for user_id, username, full_name, profile_image in rows:
+            summary = {
+                'id': user_id,
+                'username': username,
+                'full_name': full_name,
+                'profile_image': profile_image
+            }
+            _author_summaries.set(user_id, summary)
+            summaries[user_id] = summary
+    return summaries
+
+def author_summary(user_id):
+    if user_id is None:
+        return None
+    return load_author_summaries([user_id]).get(user_id)
+
+def invalidate_author_summary(user_id):
+    _author_summaries.delete(user_id)
+
 class Project(db.Model):
     __tablename__ = 'projects'
     
@@ -64,15 +103,34 @@ class Project(db.Model):
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     category = db.Column(db.String(100), nullable=False)
-    funding_goal = db.Column(db.Float, default=0.0)
-    current_funding = db.Column(db.Float, default=0.0)
+    funding_goal = db.Column(db.Numeric(12, 2), default=0)
+    current_funding = db.Column(db.Numeric(12, 2), default=0)  # running total, maintained by ledger.py
     status = db.Column(db.String(50), default='active')  # active, completed, paused
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalized counters, maintained by the write endpoints (see counters.py)
+    vote_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    collaboration_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    hot_score = db.Column(db.Float, nullable=False, default=0, server_default='0')  # see ranking.py
+    
     # Foreign Keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
+    # Listing filters and keyset sort orders (see pagination.py)
+    __table_args__ = (
+        db.Index('ix_projects_created_at', 'created_at', 'id'),
+        db.Index('ix_projects_category_created_at', 'category', 'created_at', 'id'),
+        db.Index('ix_projects_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_projects_vote_count', 'vote_count', 'id'),
+        db.Index('ix_projects_current_funding', 'current_funding', 'id'),
+        db.Index('ix_projects_hot_score', 'hot_score', 'id'),
+        db.Index('ix_projects_category_vote_count', 'category', 'vote_count', 'id'),
+        db.Index('ix_projects_category_current_funding', 'category', 'current_funding', 'id'),
+        db.Index('ix_projects_category_hot_score', 'category', 'hot_score', 'id'),
+    )
+    
     # Relationships
     comments = db.relationship('Comment', backref='project', lazy=True, cascade='all, delete-orphan')
     votes = db.relationship('Vote', backref='project', lazy=True, cascade='all, delete-orphan')
@@ -90,24 +148,20 @@ class Project(db.Model):
         return Comment.query.filter_by(project_id=self.id).count()
     
     def to_dict(self, current_user_id=None):
-        owner_data = None
-        if hasattr(self, 'owner') and self.owner:
-            owner_data = self.owner.to_dict()
-        
         return {
             'id': self.id,
             'title': self.title,
             'description': self.description,
             'category': self.category,
-            'funding_goal': self.funding_goal,
-            'current_funding': self.current_funding,
+            'funding_goal': float(self.funding_goal or 0),
+            'current_funding': float(self.current_funding or 0),
             'status': self.status,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'owner': owner_data,
-            'vote_count': self.get_vote_count(),
-            'collaboration_count': self.get_collaboration_count(),
-            'comment_count': self.get_comment_count(),
+            'owner': author_summary(self.user_id),
+            'vote_count': self.vote_count or 0,
+            'collaboration_count': self.collaboration_count or 0,
+            'comment_count': self.comment_count or 0,
             'attachments': [attachment.to_dict() for attachment in self.attachments] if hasattr(self, 'attachments') else [],
             'can_edit': current_user_id == self.user_id if current_user_id else False
         }
@@ -120,13 +174,22 @@ class Comment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalized reaction counters
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    heart_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Foreign Keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_comments_project_id_created_at', 'project_id', 'created_at'),
+        db.Index('ix_comments_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
     def get_reaction_count(self, reaction_type):
         """Get count of reactions of specific type for this comment"""
-        return len([r for r in self.reactions if r.reaction_type == reaction_type])
+        return (self.like_count if reaction_type == 'like' else self.heart_count) or 0
     
     def get_user_reaction(self, user_id):
         """Get user's reaction type on this comment (if any)"""
@@ -135,10 +198,8 @@ class Comment(db.Model):
                 return reaction.reaction_type
         return None
     
-    def to_dict(self, user_id=None):
-        author_data = None
-        if hasattr(self, 'author') and self.author:
-            author_data = self.author.to_dict()
+    def to_dict(self, user_id=None, user_reactions=None):
+        author_data = author_summary(self.user_id)
             
         result = {
             'id': self.id,
@@ -146,14 +207,18 @@ class Comment(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat() if hasattr(self, 'updated_at') and self.updated_at else self.created_at.isoformat(),
             'author': author_data,
-            'like_count': self.get_reaction_count('like'),
-            'heart_count': self.get_reaction_count('heart'),
+            'like_count': self.like_count or 0,
+            'heart_count': self.heart_count or 0,
             'can_edit': user_id == self.user_id if user_id else False
         }
         
         # Include user's current reaction if user_id provided
+        # (user_reactions is a prefetched {comment_id: reaction_type} map)
         if user_id:
-            result['user_reaction'] = self.get_user_reaction(user_id)
+            if user_reactions is not None:
+                result['user_reaction'] = user_reactions.get(self.id)
+            else:
+                result['user_reaction'] = self.get_user_reaction(user_id)
             
         return result
 
@@ -169,7 +234,11 @@ class Vote(db.Model):
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
     
     # Ensure one vote per user per project
-    __table_args__ = (db.UniqueConstraint('user_id', 'project_id', name='unique_user_project_vote'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'project_id', name='unique_user_project_vote'),
+        db.Index('ix_votes_project_id', 'project_id'),
+        db.Index('ix_votes_user_id_created_at', 'user_id', 'created_at'),
+    )
 
 class Collaboration(db.Model):
     __tablename__ = 'collaborations'
@@ -184,26 +253,26 @@ class Collaboration(db.Model):
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
     
     # Ensure one collaboration request per user per project
-    __table_args__ = (db.UniqueConstraint('user_id', 'project_id', name='unique_user_project_collab'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'project_id', name='unique_user_project_collab'),
+        db.Index('ix_collaborations_project_id_status', 'project_id', 'status'),
+        db.Index('ix_collaborations_user_id_status', 'user_id', 'status'),
+    )
     
     def to_dict(self):
-        collaborator_data = None
-        if hasattr(self, 'collaborator') and self.collaborator:
-            collaborator_data = self.collaborator.to_dict()
-            
         return {
             'id': self.id,
             'message': self.message,
             'status': self.status,
             'created_at': self.created_at.isoformat(),
-            'collaborator': collaborator_data
+            'collaborator': author_summary(self.user_id)
         }
 
 class Donation(db.Model):
     __tablename__ = 'donations'
     
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.Numeric(12, 2), nullable=False)
     message = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -211,19 +280,28 @@ class Donation(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_donations_project_id', 'project_id'),
+        db.Index('ix_donations_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
     def to_dict(self):
-        donor_data = None
-        if hasattr(self, 'donor') and self.donor:
-            donor_data = self.donor.to_dict()
-            
         return {
             'id': self.id,
-            'amount': self.amount,
+            'amount': float(self.amount),
             'message': self.message,
             'created_at': self.created_at.isoformat(),
-            'donor': donor_data
+            'donor': author_summary(self.user_id)
         }
 
+class FundingTotal(db.Model):
+    __tablename__ = 'funding_totals'
+
+    # Platform-wide donation total split across a few rows to spread write contention (see ledger.py)
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    amount = db.Column(db.Numeric(14, 2), nullable=False, default=0, server_default='0')
+    donation_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
 class Discussion(db.Model):
     __tablename__ = 'discussions'
     
@@ -238,9 +316,23 @@ class Discussion(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalized counters (reply_count includes nested replies)
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    hot_score = db.Column(db.Float, nullable=False, default=0, server_default='0')  # see ranking.py
+    
     # Foreign Keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_discussions_created_at', 'created_at', 'id'),
+        db.Index('ix_discussions_category_created_at', 'category', 'created_at', 'id'),
+        db.Index('ix_discussions_like_count', 'like_count', 'id'),
+        db.Index('ix_discussions_hot_score', 'hot_score', 'id'),
+        db.Index('ix_discussions_category_like_count', 'category', 'like_count', 'id'),
+        db.Index('ix_discussions_category_hot_score', 'category', 'hot_score', 'id'),
+    )
+    
     # Relationships
     replies = db.relationship('DiscussionReply', backref='discussion', lazy=True, cascade='all, delete-orphan')
     likes = db.relationship('DiscussionLike', backref='discussion', lazy=True, cascade='all, delete-orphan')
@@ -254,11 +346,14 @@ class Discussion(db.Model):
     def is_liked_by_user(self, user_id):
         return DiscussionLike.query.filter_by(discussion_id=self.id, user_id=user_id).first() is not None
     
-    def to_dict(self, current_user_id=None):
+    def to_dict(self, current_user_id=None, liked_ids=None):
         tags_list = [tag.strip() for tag in self.tags.split(',')] if self.tags else []
-        author_data = None
-        if hasattr(self, 'author') and self.author:
-            author_data = self.author.to_dict()
+        author_data = author_summary(self.user_id)
+        
+        # liked_ids is a prefetched set of discussion ids liked by the current user
+        is_liked = False
+        if current_user_id:
+            is_liked = self.id in liked_ids if liked_ids is not None else self.is_liked_by_user(current_user_id)
             
         return {
             'id': self.id,
@@ -272,11 +367,11 @@ class Discussion(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'author': author_data,
-            'like_count': self.get_like_count(),
-            'reply_count': self.get_reply_count(),
-            'is_liked': self.is_liked_by_user(current_user_id) if current_user_id else False,
-            'likes': self.get_like_count(),
-            'replies': self.get_reply_count(),
+            'like_count': self.like_count or 0,
+            'reply_count': self.reply_count or 0,
+            'is_liked': is_liked,
+            'likes': self.like_count or 0,
+            'replies': self.reply_count or 0,
             'can_edit': current_user_id == self.user_id if current_user_id else False
         }
 
@@ -288,33 +383,48 @@ class DiscussionReply(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalized reaction counters
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    heart_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Foreign Keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     discussion_id = db.Column(db.Integer, db.ForeignKey('discussions.id'), nullable=False)
     parent_reply_id = db.Column(db.Integer, db.ForeignKey('discussion_replies.id'), nullable=True)  # For nested replies
     
+    # Serves both the top-level page and the recursive child lookup
+    __table_args__ = (
+        db.Index('ix_discussion_replies_thread', 'discussion_id', 'parent_reply_id', 'created_at'),
+        db.Index('ix_discussion_replies_parent_reply_id', 'parent_reply_id'),
+    )
+    
     # Relationships
     reactions = db.relationship('ReplyReaction', backref='reply', lazy=True, cascade='all, delete-orphan')
     nested_replies = db.relationship('DiscussionReply', backref=db.backref('parent_reply', remote_side=[id]), lazy=True)
     
     def get_reaction_count(self, reaction_type):
-        return ReplyReaction.query.filter_by(reply_id=self.id, reaction_type=reaction_type).count()
+        return (self.like_count if reaction_type == 'like' else self.heart_count) or 0
     
     def is_reacted_by_user(self, user_id, reaction_type):
         return ReplyReaction.query.filter_by(reply_id=self.id, user_id=user_id, reaction_type=reaction_type).first() is not None
     
-    def to_dict(self, current_user_id=None):
-        author_data = None
-        if hasattr(self, 'author') and self.author:
-            author_data = self.author.to_dict()
+    def to_dict(self, current_user_id=None, user_reactions=None):
+        author_data = author_summary(self.user_id)
             
         # Handle nested replies safely
         nested_replies_list = []
         try:
             if hasattr(self, 'nested_replies') and self.nested_replies:
-                nested_replies_list = [nested.to_dict(current_user_id) for nested in self.nested_replies]
+                nested_replies_list = [nested.to_dict(current_user_id, user_reactions) for nested in self.nested_replies]
         except Exception:
             nested_replies_list = []
+        
+        # user_reactions is a prefetched {reply_id: {reaction_type, ...}} map
+        if user_reactions is not None:
+            reacted = user_reactions.get(self.id, set())
+            has_reacted = lambda reaction_type: reaction_type in reacted
+        else:
+            has_reacted = lambda reaction_type: self.is_reacted_by_user(current_user_id, reaction_type)
             
         return {
             'id': self.id,
@@ -322,14 +432,14 @@ class DiscussionReply(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat() if hasattr(self, 'updated_at') and self.updated_at else self.created_at.isoformat(),
             'author': author_data,
-            'likes': self.get_reaction_count('like'),
-            'hearts': self.get_reaction_count('heart'),
+            'likes': self.like_count or 0,
+            'hearts': self.heart_count or 0,
             'parent_reply_id': self.parent_reply_id,
             'nested_replies': nested_replies_list,
             'can_edit': current_user_id == self.user_id if current_user_id else False,
             'user_reactions': {
-                'like': self.is_reacted_by_user(current_user_id, 'like') if current_user_id else False,
-                'heart': self.is_reacted_by_user(current_user_id, 'heart') if current_user_id else False,
+                'like': has_reacted('like'),
+                'heart': has_reacted('heart'),
             } if current_user_id else {}
         }
 
@@ -344,7 +454,10 @@ class DiscussionLike(db.Model):
     discussion_id = db.Column(db.Integer, db.ForeignKey('discussions.id'), nullable=False)
     
     # Ensure one like per user per discussion
-    __table_args__ = (db.UniqueConstraint('user_id', 'discussion_id', name='unique_user_discussion_like'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'discussion_id', name='unique_user_discussion_like'),
+        db.Index('ix_discussion_likes_discussion_id', 'discussion_id'),
+    )
 
 class ReplyReaction(db.Model):
     __tablename__ = 'reply_reactions'
@@ -358,7 +471,10 @@ class ReplyReaction(db.Model):
     reply_id = db.Column(db.Integer, db.ForeignKey('discussion_replies.id'), nullable=False)
     
     # Ensure one reaction per user per reply per type
-    __table_args__ = (db.UniqueConstraint('user_id', 'reply_id', 'reaction_type', name='unique_user_reply_reaction'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'reply_id', 'reaction_type', name='unique_user_reply_reaction'),
+        db.Index('ix_reply_reactions_reply_id', 'reply_id'),
+    )
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
@@ -368,6 +484,7 @@ class Notification(db.Model):
     title = db.Column(db.String(200), nullable=False)
     message = db.Column(db.Text, nullable=False)
     is_read = db.Column(db.Boolean, default=False)
+    count = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # events folded into this one
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Foreign Keys
@@ -375,22 +492,31 @@ class Notification(db.Model):
     related_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # actor (who caused the notification)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=True)
     
+    __table_args__ = (
+        db.Index('ix_notifications_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),
+        db.Index('ix_notifications_user_id_created_at', 'user_id', 'created_at', 'id'),
+    )
+    
     # Relationships
     recipient = db.relationship('User', foreign_keys=[user_id], backref='received_notifications')
     actor = db.relationship('User', foreign_keys=[related_user_id], backref='sent_notifications')
     related_project = db.relationship('Project', backref='notifications')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_project=True):
+        result = {
             'id': self.id,
             'type': self.type,
             'title': self.title,
             'message': self.message,
             'is_read': self.is_read,
+            'count': self.count or 1,
             'created_at': self.created_at.isoformat(),
-            'actor': self.actor.to_dict() if self.actor else None,
-            'project': self.related_project.to_dict() if self.related_project else None
+            'actor': author_summary(self.related_user_id),
+            'project_id': self.project_id
         }
+        if include_project:
+            result['project'] = self.related_project.to_dict() if self.related_project else None
+        return result
 
 class CommentReaction(db.Model):
     __tablename__ = 'comment_reactions'
@@ -408,7 +534,10 @@ class CommentReaction(db.Model):
     comment = db.relationship('Comment', backref='reactions')
     
     # Ensure one reaction per user per comment (they can change reaction type)
-    __table_args__ = (db.UniqueConstraint('user_id', 'comment_id', name='unique_user_comment_reaction'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'comment_id', name='unique_user_comment_reaction'),
+        db.Index('ix_comment_reactions_comment_id', 'comment_id'),
+    )
 
 class CommentReply(db.Model):
     __tablename__ = 'comment_replies'
@@ -421,14 +550,14 @@ class CommentReply(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     comment_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=False)
     
+    __table_args__ = (db.Index('ix_comment_replies_comment_id', 'comment_id'),)
+    
     # Relationships
     author = db.relationship('User', backref='comment_replies')
     comment = db.relationship('Comment', backref='replies')
     
     def to_dict(self):
-        author_data = None
-        if hasattr(self, 'author') and self.author:
-            author_data = self.author.to_dict()
+        author_data = author_summary(self.user_id)
             
         return {
             'id': self.id,
@@ -447,13 +576,16 @@ class ProjectAttachment(db.Model):
     original_filename = db.Column(db.String(255), nullable=False)
     file_size = db.Column(db.Integer, nullable=False)  # Size in bytes
     file_type = db.Column(db.String(100), nullable=False)  # MIME type
-    file_path = db.Column(db.String(500), nullable=False)  # Path to stored file
+    file_path = db.Column(db.String(500), nullable=False)  # Path under static/, or a /blobs/ URL
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the content
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Foreign Keys
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
+    __table_args__ = (db.Index('ix_project_attachments_project_id', 'project_id'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -461,11 +593,42 @@ class ProjectAttachment(db.Model):
             'original_filename': self.original_filename,
             'file_size': self.file_size,
             'file_type': self.file_type,
+            'file_path': self.file_path,
+            'url': self.file_path if self.file_path.startswith('/') else f'/static/{self.file_path}',
             'uploaded_at': self.uploaded_at.isoformat(),
             'user_id': self.user_id
         }
 
 
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+    
+    # Resumable attachment upload in progress (see uploads.py)
+    id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)  # declared total size in bytes
+    received = db.Column(db.BigInteger, nullable=False, default=0)  # bytes written so far
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256, saved before the file moves to the blob store
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Foreign Keys
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'content_type': self.content_type,
+            'size': self.size,
+            'offset': self.received,
+            'complete': self.received == self.size,
+            'project_id': self.project_id
+        }
+
+
 class TeamChat(db.Model):
     __tablename__ = 'team_chats'
     
@@ -477,6 +640,9 @@ class TeamChat(db.Model):
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
+    # Chat is read as a tail or forward from a message id
+    __table_args__ = (db.Index('ix_team_chats_project_id_id', 'project_id', 'id'),)
+    
     # Relationships
     project = db.relationship('Project', backref='chat_messages')
     author = db.relationship('User', backref='chat_messages')
@@ -486,5 +652,5 @@ class TeamChat(db.Model):
             'id': self.id,
             'message': self.message,
             'created_at': self.created_at.isoformat(),
-            'author': self.author.to_dict() if hasattr(self, 'author') and self.author else None
+            'author': author_summary(self.user_id)
         }
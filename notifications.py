@@ -0,0 +1,199 @@
+"""Notification fan-out pipeline.
+
+``notify()`` queues a notification for any number of recipients and
+returns immediately. A background worker drains the queue in batches,
+writes each batch with one multi-row INSERT, pushes the new rows to the
+recipients' event streams and retries failed batches with backoff. A batch
+that keeps failing is written again one job at a time, so a bad job only
+loses its own notifications.
+
+Coalescing notifications (``coalesce=True``, used for team chat) fold into
+the recipient's newest unread notification of the same type and project
+instead of adding a row: its ``count`` goes up and it takes the latest
+message and timestamp.
+
+The queue lives in memory, so jobs still queued when a process dies are
+lost; notifications are best-effort. With ``NOTIFICATIONS_ASYNC`` off, or
+when the app is testing, jobs are delivered inline.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+
+from app import app, db
+from events import publish_event
+from models import Notification, load_author_summaries
+
+app.config.setdefault('NOTIFICATIONS_ASYNC', os.environ.get('NOTIFICATIONS_ASYNC', '1') not in ('0', 'false', 'no'))
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 0.5
+
+Job = namedtuple('Job', 'user_ids type title message related_user_id project_id coalesce')
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def notify(user_ids, type, title, message, related_user_id=None, project_id=None, coalesce=False):
+    """Queue a notification for each of ``user_ids``. Never raises."""
+    user_ids = sorted({user_id for user_id in user_ids if user_id})
+    if not user_ids:
+        return
+    job = Job(user_ids, type, title, message, related_user_id, project_id, coalesce)
+    if app.testing or not app.config['NOTIFICATIONS_ASYNC']:
+        _deliver_with_retry([job])
+        return
+    _ensure_worker()
+    _queue.put(job)
+
+
+def _ensure_worker():
+    # Started lazily so each gunicorn worker gets its own thread after fork
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='notification-worker', daemon=True)
+            _worker.start()
+
+
+def _drain(first):
+    jobs = [first]
+    while len(jobs) < BATCH_SIZE:
+        try:
+            jobs.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return jobs
+
+
+def _run():
+    while True:
+        jobs = _drain(_queue.get())
+        try:
+            _deliver_with_retry(jobs)
+        finally:
+            for _ in jobs:
+                _queue.task_done()
+
+
+@atexit.register
+def flush():
+    """Deliver whatever is still queued (called on interpreter shutdown)"""
+    while True:
+        try:
+            jobs = _drain(_queue.get_nowait())
+        except queue.Empty:
+            return
+        _deliver_with_retry(jobs)
+        for _ in jobs:
+            _queue.task_done()
+
+
+def _deliver_with_retry(jobs):
+    touched = _write_with_retry(jobs)
+    if touched is None and len(jobs) > 1:
+        # One bad job (say, a row that violates a constraint) fails the whole
+        # batch; write the jobs one at a time so only that one is dropped
+        touched = []
+        for job in jobs:
+            with app.app_context():
+                try:
+                    touched.extend(_write([job]))
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Dropping notification job %r for %d recipients', job.type, len(job.user_ids))
+    elif touched is None:
+        logger.error('Dropping notification job %r for %d recipients', jobs[0].type, len(jobs[0].user_ids))
+    # Outside the retries: the rows are committed, so a failure here must not write them again
+    if touched:
+        with app.app_context():
+            try:
+                _publish(touched)
+            except Exception:
+                logger.exception('Publishing %d notifications failed', len(touched))
+
+
+def _write_with_retry(jobs):
+    """Write ``jobs`` in one transaction, retrying with backoff; the touched ids, or None if it kept failing"""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        with app.app_context():
+            try:
+                return _write(jobs)
+            except Exception:
+                db.session.rollback()
+                if attempt == MAX_ATTEMPTS:
+                    logger.warning('Notification batch of %d jobs failed after %d attempts', len(jobs), attempt,
+                                   exc_info=True)
+                    return None
+                logger.warning('Notification batch failed (attempt %d), retrying', attempt, exc_info=True)
+        time.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+
+
+def _write(jobs):
+    """Insert or fold the notifications for ``jobs`` and commit; returns the ids of the rows written"""
+    now = datetime.utcnow()
+    # Collapse jobs within the batch first: the latest coalescing job per
+    # (recipient, type, project) wins and carries how many it replaced
+    pending = {}
+    for job in jobs:
+        for user_id in job.user_ids:
+            key = (user_id, job.type, job.project_id) if job.coalesce else (user_id, id(job))
+            count = pending[key][1] + 1 if key in pending else 1
+            pending[key] = (job, count)
+
+    # Fold coalescing jobs into each recipient's newest matching unread row,
+    # one UPDATE per job and count covering all of its recipients
+    groups = defaultdict(list)
+    for (user_id, *_), (job, count) in pending.items():
+        groups[(id(job), count)].append((user_id, job, count))
+    touched = []
+    merged_users = set()
+    for members in groups.values():
+        _, job, count = members[0]
+        if not job.coalesce:
+            continue
+        newest = select(func.max(Notification.id))\
+            .where(Notification.user_id.in_([user_id for user_id, _, _ in members]),
+                   Notification.type == job.type, Notification.project_id == job.project_id,
+                   Notification.is_read == False)\
+            .group_by(Notification.user_id)
+        merged = db.session.execute(
+            update(Notification)
+            .where(Notification.id.in_(newest))
+            .values(count=Notification.count + count, title=job.title, message=job.message,
+                    related_user_id=job.related_user_id, created_at=now)
+            .returning(Notification.id, Notification.user_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        touched.extend(row.id for row in merged)
+        merged_users.update((row.user_id, id(job)) for row in merged)
+
+    rows = [{
+        'user_id': user_id, 'type': job.type, 'title': job.title, 'message': job.message,
+        'related_user_id': job.related_user_id, 'project_id': job.project_id,
+        'is_read': False, 'count': count, 'created_at': now,
+    } for (user_id, *_), (job, count) in pending.items() if (user_id, id(job)) not in merged_users]
+    if rows:
+        touched.extend(db.session.execute(insert(Notification).values(rows).returning(Notification.id)).scalars())
+    db.session.commit()
+    return touched
+
+
+def _publish(ids):
+    """Push the notifications ``ids`` to their recipients' event streams"""
+    notifications = Notification.query.filter(Notification.id.in_(ids)).all()
+    load_author_summaries({notification.related_user_id for notification in notifications})
+    for notification in notifications:
+        publish_event([notification.user_id], 'notification', notification.to_dict(include_project=False))
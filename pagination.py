@@ -0,0 +1,169 @@
+"""Keyset (cursor) pagination.
+
+Pages are ordered by a sort key plus the primary key as a tie-breaker and
+continue from an opaque cursor holding the last row's key values, so
+fetching page N costs the same as fetching page 1 and no COUNT(*) is
+needed. ``page=N`` requests from older clients are still served with
+LIMIT/OFFSET.
+"""
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from flask import request
+from sqlalchemy import literal, text, tuple_
+from sqlalchemy.sql.elements import Label
+
+from app import db
+from cache import TTLCache
+
+DEFAULT_PER_PAGE = 10
+MAX_PER_PAGE = 100
+
+_counts = TTLCache(maxsize=2048, ttl=60)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError
+        return [_decode_value(value) for value in values]
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def _ordered(query, keys, descending):
+    """Order ``query`` by ``keys``; returns (query, fetch) where fetch(q) runs it.
+
+    Keys may be model columns or labeled expressions (e.g. a search rank).
+    Labeled keys are selected alongside the entity so their values can go
+    into the cursor; fetch() returns (entities, key values per row).
+    """
+    computed = [key for key in keys if isinstance(key, Label)]
+    if computed:
+        query = query.add_columns(*computed)
+    query = query.order_by(*[key.desc() if descending else key.asc() for key in keys])
+
+    def fetch(q):
+        rows = q.all()
+        if not computed:
+            return rows, [[getattr(row, key.key) for key in keys] for row in rows]
+        return [row[0] for row in rows], [
+            [row._mapping[key.name] if isinstance(key, Label) else getattr(row[0], key.key) for key in keys]
+            for row in rows
+        ]
+    return query, fetch
+
+
+def keyset_query(query, keys, cursor=None, limit=DEFAULT_PER_PAGE, descending=True):
+    """The query for the page after ``cursor``; returns (query, fetch) like _ordered().
+
+    One row past ``limit`` is selected to tell whether there is a next page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(keys))
+        position = tuple_(*[key.element if isinstance(key, Label) else key for key in keys])
+        boundary = tuple_(*[literal(value, key.type) for key, value in zip(keys, values)])
+        query = query.filter(position < boundary if descending else position > boundary)
+    query, fetch = _ordered(query, keys, descending)
+    return query.limit(limit + 1), fetch
+
+
+def keyset_paginate(query, keys, cursor=None, limit=DEFAULT_PER_PAGE, descending=True):
+    """Return (rows, next_cursor) for the page after ``cursor``.
+
+    ``keys`` are the ordering columns, most significant first, and must end
+    with a unique column (normally the primary key).
+    """
+    query, fetch = keyset_query(query, keys, cursor, limit, descending)
+    rows, key_values = fetch(query)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(key_values[limit - 1])
+    return rows, next_cursor
+
+
+def estimated_count(query, cache_key, table=None):
+    """Row count for ``query``, cached briefly.
+
+    On PostgreSQL an unfiltered count (``table`` given) is read from the
+    planner statistics instead of scanning the table.
+    """
+    count = _counts.get(cache_key)
+    if count is not None:
+        return count
+    count = None
+    if table is not None and db.engine.dialect.name == 'postgresql':
+        estimate = db.session.execute(
+            text('SELECT reltuples::bigint FROM pg_class WHERE relname = :table'), {'table': table}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            count = estimate
+    if count is None:
+        count = query.order_by(None).count()
+    _counts.set(cache_key, count)
+    return count
+
+
+def paginate_request(query, keys, count_key, table=None, descending=True, default_per_page=DEFAULT_PER_PAGE):
+    """Paginate ``query`` from the current request's arguments.
+
+    Accepts ``cursor``/``per_page`` (plus ``include_total=1`` for an
+    estimated total), or the legacy ``page``/``per_page``. Returns
+    (rows, metadata) where metadata belongs in the JSON response.
+    """
+    per_page = max(1, min(request.args.get('per_page', default_per_page, type=int), MAX_PER_PAGE))
+    cursor = request.args.get('cursor')
+    page = request.args.get('page', type=int)
+
+    if page and not cursor:
+        # Legacy offset paging for older clients
+        page = max(page, 1)
+        ordered, fetch = _ordered(query, keys, descending)
+        rows, key_values = fetch(ordered.offset((page - 1) * per_page).limit(per_page + 1))
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        total = estimated_count(query, count_key, table)
+        return rows, {
+            'total': total,
+            'pages': -(-total // per_page),
+            'current_page': page,
+            'has_more': has_more,
+            'next_cursor': encode_cursor(key_values[per_page - 1]) if has_more else None
+        }
+
+    rows, next_cursor = keyset_paginate(query, keys, cursor, per_page, descending)
+    meta = {'next_cursor': next_cursor, 'has_more': next_cursor is not None}
+    if request.args.get('include_total') in ('1', 'true'):
+        meta['total'] = estimated_count(query, count_key, table)
+    return rows, meta
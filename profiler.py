@@ -0,0 +1,203 @@
+"""Per-request SQL profiling.
+
+With ``QUERY_PROFILER`` on, every request records the statements it sends
+through SQLAlchemy: how many, how long they took in total, and how often
+each statement *shape* repeated. A shape is the SQL with literals and
+``IN (...)`` lists collapsed, so ``SELECT ... WHERE id = 1`` and ``... id = 2``
+count as the same query. Repeating one shape ``N_PLUS_ONE_THRESHOLD`` times
+in a request is reported as a likely N+1.
+
+Results are exposed as:
+
+* ``Server-Timing: db;dur=..;desc="N queries", app;dur=..`` and
+  ``X-Query-Count`` response headers (browser dev tools show the former);
+* a warning log line for each N+1 or blown budget;
+* ``/debug/queries``, the last ``QUERY_PROFILER_HISTORY`` request profiles
+  as JSON, in debug mode only (the SQL text can carry user data).
+
+Views can declare how many statements they are allowed with
+``@query_budget(n)``; exceeding it fires ``budget_exceeded``, which the
+pytest plugin in ``profiler_plugin.py`` turns into a test failure.
+``profile()`` records statements outside a request, e.g. in scripts.
+
+The profiler is off by default: it costs a regex pass per statement and
+the history keeps SQL text in memory.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from blinker import Namespace
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import app
+
+app.config.setdefault('QUERY_PROFILER', os.environ.get('QUERY_PROFILER', '0') in ('1', 'true', 'yes'))
+app.config.setdefault('QUERY_PROFILER_HISTORY', int(os.environ.get('QUERY_PROFILER_HISTORY', 50)))
+app.config.setdefault('N_PLUS_ONE_THRESHOLD', int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5)))
+
+logger = logging.getLogger(__name__)
+
+budget_exceeded = Namespace().signal('query-budget-exceeded')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_LISTS = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+
+# Profiles currently recording in this context; nested ones all see each statement
+_active = contextvars.ContextVar('query_profiles', default=())
+
+_history = deque(maxlen=app.config['QUERY_PROFILER_HISTORY'])
+_history_lock = threading.Lock()
+
+
+def fingerprint(statement):
+    """The statement with literals and placeholder lists collapsed to ``?``"""
+    sql = _LITERALS.sub('?', statement)
+    sql = _LISTS.sub('(?)', sql)
+    return ' '.join(sql.split())
+
+
+class QueryProfile:
+    def __init__(self, label=None):
+        self.label = label
+        self.statements = []  # (fingerprint, sql, seconds)
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.budget = None
+
+    def record(self, statement, seconds):
+        self.statements.append((fingerprint(statement), statement, seconds))
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def db_time(self):
+        return sum(seconds for _, _, seconds in self.statements)
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+    def repeated(self):
+        """Fingerprints issued more than once, most frequent first"""
+        counts = Counter(fp for fp, _, _ in self.statements)
+        return [(fp, n) for fp, n in counts.most_common() if n > 1]
+
+    def n_plus_one(self, threshold=None):
+        threshold = threshold or app.config['N_PLUS_ONE_THRESHOLD']
+        return [(fp, n) for fp, n in self.repeated() if n >= threshold and fp.upper().startswith('SELECT')]
+
+    def server_timing(self):
+        metrics = [f'db;dur={self.db_time * 1000:.1f};desc="{self.count} queries"']
+        if self.elapsed is not None:
+            metrics.append(f'app;dur={self.elapsed * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def to_dict(self):
+        return {
+            'label': self.label,
+            'count': self.count,
+            'db_ms': round(self.db_time * 1000, 2),
+            'total_ms': round(self.elapsed * 1000, 2) if self.elapsed is not None else None,
+            'budget': self.budget,
+            'n_plus_one': [{'fingerprint': fp, 'count': n} for fp, n in self.n_plus_one()],
+            'repeated': [{'fingerprint': fp, 'count': n} for fp, n in self.repeated()],
+            'statements': [{'sql': sql, 'ms': round(seconds * 1000, 2)} for _, sql, seconds in self.statements],
+        }
+
+
+@contextlib.contextmanager
+def profile(label=None):
+    """Record every statement issued inside the block into a ``QueryProfile``"""
+    current = QueryProfile(label)
+    token = _active.set(_active.get() + (current,))
+    try:
+        yield current
+    finally:
+        _active.reset(token)
+        current.finish()
+
+
+def query_budget(limit):
+    """Declare the most statements a view may issue per request"""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def recent_profiles():
+    with _history_lock:
+        return [entry.to_dict() for entry in reversed(_history)]
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active.get():
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profiles = _active.get()
+    started = conn.info.get('query_started')
+    if profiles and started:
+        seconds = time.perf_counter() - started.pop()
+        for current in profiles:
+            current.record(statement, seconds)
+
+
+@app.before_request
+def _start_request_profile():
+    if not app.config['QUERY_PROFILER'] or request.path.startswith('/debug/'):
+        return
+    g.query_profile = QueryProfile(f'{request.method} {request.path}')
+    g.query_profile_token = _active.set(_active.get() + (g.query_profile,))
+
+
+@app.after_request
+def _finish_request_profile(response):
+    current = g.pop('query_profile', None)
+    if current is None:
+        return response
+    _active.reset(g.pop('query_profile_token'))
+    current.finish()
+    view = app.view_functions.get(request.endpoint)
+    # Decorators such as team_required wrap the view; functools.wraps copies the attribute
+    current.budget = getattr(view, 'query_budget', None)
+
+    for fp, n in current.n_plus_one():
+        logger.warning('Possible N+1 in %s: %d x %s', current.label, n, fp)
+    if current.over_budget:
+        logger.warning('%s issued %d queries, over its budget of %d', current.label, current.count, current.budget)
+        budget_exceeded.send(app, profile=current)
+
+    response.headers['Server-Timing'] = current.server_timing()
+    response.headers['X-Query-Count'] = str(current.count)
+    with _history_lock:
+        _history.append(current)
+    return response
+
+
+@app.teardown_request
+def _drop_request_profile(exc):
+    # after_request is skipped when the view raised; don't leave the profile active
+    token = g.pop('query_profile_token', None)
+    if token is not None:
+        g.pop('query_profile', None)
+        _active.reset(token)
+
@@ -0,0 +1,65 @@
+"""pytest plugin enforcing query budgets.
+
+Enable with ``pytest -p profiler_plugin`` or ``pytest_plugins = ['profiler_plugin']``
+in a conftest. While it is active the query profiler is switched on, and a
+test fails if:
+
+* any request it makes exceeds the budget its view declares with
+  ``@query_budget(n)``, or
+* it is marked ``@pytest.mark.query_budget(n)`` and issues more than ``n``
+  statements in total.
+
+The ``query_profile`` fixture yields the ``QueryProfile`` recording the
+current test, for finer-grained assertions.
+"""
+import pytest
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'query_budget(n): fail if the test issues more than n SQL statements')
+
+
+def _describe(profile):
+    lines = [f'{profile.label}: {profile.count} queries, budget {profile.budget}']
+    lines += [f'    {n} x {fp}' for fp, n in profile.repeated()]
+    return '\n'.join(lines)
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    from app import app
+    from profiler import budget_exceeded, profile
+
+    exceeded = []
+
+    def collect(sender, profile):
+        exceeded.append(profile)
+
+    marker = item.get_closest_marker('query_budget')
+    enabled = app.config['QUERY_PROFILER']
+    app.config['QUERY_PROFILER'] = True
+    budget_exceeded.connect(collect)
+    try:
+        with profile(item.nodeid) as current:
+            result = yield
+    finally:
+        budget_exceeded.disconnect(collect)
+        app.config['QUERY_PROFILER'] = enabled
+
+    if marker is not None:
+        current.budget = marker.args[0]
+        if current.over_budget:
+            exceeded.append(current)
+    if exceeded:
+        pytest.fail('Query budget exceeded:\n' + '\n'.join(_describe(profile) for profile in exceeded),
+                    pytrace=False)
+    return result
+
+
+@pytest.fixture
+def query_profile(request):
+    """The statements issued while the test (and fixtures set up after this one) run"""
+    from profiler import profile
+
+    with profile(request.node.nodeid) as current:
+        yield current
@@ -0,0 +1,89 @@
+"""Hot ("trending") scores for projects and discussions.
+
+A row's score is ``log10(engagement) + age / HOT_SCORE_TIMESCALE`` where
+``age`` is the creation time in seconds since a fixed epoch. Engagement is
+a weighted sum of the denormalized counters (votes, comments,
+collaborations, likes, replies) and, for projects, donations. Each
+``HOT_SCORE_TIMESCALE`` seconds of newer creation time is worth ten times
+the engagement, so older rows sink without their stored scores ever
+having to decay: a score only changes when its engagement does.
+
+Scores live in an indexed ``hot_score`` column and are refreshed inside
+the writing transaction (``adjust_counter`` and ``record_donation`` call
+``refresh_scores``), so ``sort=hot`` is an index scan. ``flask
+refresh-scores`` recomputes every row, e.g. after changing the weights or
+from a scheduled job as a reconciliation pass.
+"""
+import math
+import os
+from datetime import datetime
+
+from sqlalchemy import bindparam, event, func, select, update
+
+from app import app, db
+from models import Project, Discussion, Donation
+
+app.config.setdefault('HOT_SCORE_TIMESCALE', int(os.environ.get('HOT_SCORE_TIMESCALE', 45000)))
+
+SCORE_EPOCH = datetime(2024, 1, 1)
+BATCH_SIZE = 1000
+
+
+def _donations(model):
+    return select(func.count(Donation.id)).where(Donation.project_id == model.id).scalar_subquery()
+
+
+# Model -> SQL expression for its weighted engagement
+ENGAGEMENT = {
+    Project: lambda: Project.vote_count + 2 * Project.comment_count + 3 * Project.collaboration_count
+                     + 3 * _donations(Project),
+    Discussion: lambda: Discussion.like_count + 2 * Discussion.reply_count,
+}
+
+
+def hot_score(engagement, created_at):
+    age = ((created_at or SCORE_EPOCH) - SCORE_EPOCH).total_seconds()
+    return math.log10(max(engagement or 0, 1)) + age / app.config['HOT_SCORE_TIMESCALE']
+
+
+def _write_scores(execute, model, rows):
+    table = model.__table__
+    # A new score is not an edit; keep updated_at from being bumped by onupdate
+    statement = update(table).where(table.c.id == bindparam('row_id')).values(updated_at=table.c.updated_at)
+    execute(statement, [
+        {'row_id': row_id, 'hot_score': hot_score(engagement, created_at)}
+        for row_id, created_at, engagement in rows
+    ])
+    return len(rows)
+
+
+def refresh_scores(model, ids=None, connection=None):
+    """Recompute ``hot_score`` for ``ids`` (or every row) inside the caller's transaction"""
+    execute = connection.execute if connection is not None else db.session.execute
+    query = select(model.id, model.created_at, ENGAGEMENT[model]())
+    if ids is not None:
+        rows = execute(query.where(model.id.in_(list(ids)))).all()
+        return _write_scores(execute, model, rows) if rows else 0
+    updated, last_id = 0, 0
+    while True:
+        rows = execute(query.where(model.id > last_id).order_by(model.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            return updated
+        updated += _write_scores(execute, model, rows)
+        last_id = rows[-1][0]
+
+
+@event.listens_for(Project, 'before_insert')
+@event.listens_for(Discussion, 'before_insert')
+def _initial_score(mapper, connection, target):
+    # New rows have no engagement yet; they rank by creation time alone
+    target.hot_score = hot_score(0, target.created_at or datetime.utcnow())
+
+
+@app.cli.command('refresh-scores')
+def refresh_scores_command():
+    """Recompute hot scores for every project and discussion."""
+    for model in ENGAGEMENT:
+        rows = refresh_scores(model)
+        db.session.commit()
+        print(f'{model.__tablename__}: {rows} scores refreshed')
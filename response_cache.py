@@ -0,0 +1,194 @@
+"""Response cache for public read endpoints.
+
+``@cached_response`` stores a view's JSON response keyed by path and
+query string. Each entry is tagged (``project:5``, ``projects``,
+``user:3`` ...) and remembers the version of every tag when it was built;
+``invalidate(*tags)`` bumps those versions, so any entry depending on them
+is treated as a miss from then on and ages out by TTL. Views can add tags
+that depend on the data they loaded with ``tag_response()``.
+
+Backends (``RESPONSE_CACHE_BACKEND``):
+
+* ``memory`` - per-process LRU with TTL (default). Each gunicorn worker
+               has its own copy, so invalidations only reach the worker
+               that handled the write; keep the TTL short.
+* ``redis``  - shared across workers, at ``RESPONSE_CACHE_URL``. Needs the
+               ``redis`` package.
+* ``null``   - caching disabled.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+
+from flask import Response, g, request, session
+
+from app import app
+from cache import TTLCache
+
+try:
+    import redis
+except ImportError:  # optional; only needed for the redis backend
+    redis = None
+
+app.config.setdefault('RESPONSE_CACHE_BACKEND', os.environ.get('RESPONSE_CACHE_BACKEND', 'memory'))
+app.config.setdefault('RESPONSE_CACHE_URL', os.environ.get('RESPONSE_CACHE_URL', 'redis://localhost:6379/0'))
+app.config.setdefault('RESPONSE_CACHE_TTL', int(os.environ.get('RESPONSE_CACHE_TTL', 60)))
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    def __init__(self, maxsize=2048):
+        self._entries = TTLCache(maxsize=maxsize)
+        # Versions must outlive every entry built against them, so they are never evicted
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value, ttl):
+        self._entries.set(key, value, ttl=ttl)
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class RedisBackend:
+    def __init__(self, url, prefix='respcache:'):
+        if redis is None:
+            raise RuntimeError('The redis response cache backend needs the redis package')
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self._prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self._prefix + key, json.dumps(value), ex=ttl)
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        return [int(value or 0) for value in self._client.mget([f'{self._prefix}tag:{tag}' for tag in tags])]
+
+    def bump(self, tags):
+        pipe = self._client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(f'{self._prefix}tag:{tag}')
+        pipe.execute()
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def versions(self, tags):
+        return [0] * len(tags)
+
+    def bump(self, tags):
+        pass
+
+
+BACKENDS = {
+    'memory': lambda: MemoryBackend(),
+    'redis': lambda: RedisBackend(app.config['RESPONSE_CACHE_URL']),
+    'null': lambda: NullBackend(),
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = BACKENDS[app.config['RESPONSE_CACHE_BACKEND']]()
+    return _backend
+
+
+def invalidate(*tags):
+    """Evict every cached response tagged with any of ``tags``. Never raises."""
+    tags = [tag for tag in tags if tag]
+    if not tags:
+        return
+    try:
+        get_backend().bump(tags)
+    except Exception:
+        logger.exception('Failed to invalidate cache tags %s', tags)
+
+
+def tag_response(*tags):
+    """Add tags to the response being built by the current cached view"""
+    if 'cache_tags' in g:
+        g.cache_tags.update(tags)
+
+
+def _cache_key():
+    args = sorted(request.args.items(multi=True))
+    return request.path + '?' + '&'.join(f'{name}={value}' for name, value in args)
+
+
+def _is_fresh(backend, entry):
+    tags = list(entry['tags'])
+    return backend.versions(tags) == [entry['tags'][tag] for tag in tags]
+
+
+def cached_response(*tags, ttl=None, anonymous_only=True):
+    """Cache a JSON view's 200 responses.
+
+    ``tags`` may reference the view's URL arguments, e.g.
+    ``'project:{project_id}'``. With ``anonymous_only`` (the default),
+    signed-in users bypass the cache because the view adds per-user state.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            if request.method != 'GET' or (anonymous_only and session.get('user_id')):
+                return view(**kwargs)
+            try:
+                backend = get_backend()
+                key = _cache_key()
+                entry = backend.get(key)
+                if entry is not None and _is_fresh(backend, entry):
+                    response = Response(entry['body'], status=200, mimetype=entry['mimetype'])
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+                # Read versions before running the view so a write that lands
+                # meanwhile leaves this entry stale instead of current
+                static_tags = sorted({tag.format(**kwargs) for tag in tags})
+                tag_versions = dict(zip(static_tags, backend.versions(static_tags)))
+                g.cache_tags = set(static_tags)
+            except Exception:
+                logger.exception('Response cache lookup failed')
+                return view(**kwargs)
+
+            result = view(**kwargs)
+            response = app.make_response(result)
+            if response.status_code != 200 or response.direct_passthrough:
+                return response
+            try:
+                added = sorted(g.pop('cache_tags') - tag_versions.keys())
+                tag_versions.update(zip(added, backend.versions(added)))
+                backend.set(key, {
+                    'body': response.get_data(as_text=True),
+                    'mimetype': response.mimetype,
+                    'tags': tag_versions,
+                }, app.config['RESPONSE_CACHE_TTL'] if ttl is None else ttl)
+            except Exception:
+                logger.exception('Failed to store cached response')
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -1,95 +1,56 @@
 import os
+import time
 from datetime import datetime
-from flask import request, jsonify, send_from_directory, session
+from flask import request, jsonify, session, abort, Response, send_file
+from werkzeug.utils import safe_join
 from app import app, db
-from models import User, Project, Comment, Vote, Collaboration, Donation, Discussion, DiscussionReply, DiscussionLike, ReplyReaction, Notification, TeamChat, CommentReaction, ProjectAttachment
+from models import User, Project, Comment, Vote, Collaboration, Donation, Discussion, DiscussionReply, Notification, TeamChat, UploadSession, author_summary, invalidate_author_summary, load_author_summaries
+from access import invalidate_team, team_required, team_roster
+from identity import current_user, get_identity, invalidate_identity
+from toggles import ToggleError, apply_toggles, parse_operations, toggle
+from dashboard import dashboard_summary, invalidate_dashboard, recent_activity
+from counters import adjust_counter
+from serializers import serialize_projects, serialize_discussions, serialize_comments, serialize_notifications, load_reply_tree
+from pagination import MAX_PER_PAGE, InvalidCursor, paginate_request
+from search import apply_search
+from response_cache import cached_response, invalidate, tag_response
+from blobstore import BLOB_KEY_RE, BlobError, externalize, get_blob_store, serving_type
+from events import get_broker, publish_event, format_sse
+from notifications import notify
+from assets import serve_asset, send_path
+from profiler import query_budget, recent_profiles
+from uploads import UploadError, open_session, write_chunk, complete as complete_upload, store_file, discard as discard_upload
+from ledger import InvalidAmount, parse_amount, record_donation, remove_project_funding, to_json_amount, platform_total
 from sqlalchemy import desc, func
 
-# Helper function to create notifications
+# Helper function to create notifications (written off the request thread, see notifications.py)
 def create_notification(user_id, type, title, message, related_user_id=None, project_id=None):
-    try:
-        notification = Notification()
-        notification.user_id = user_id
-        notification.type = type
-        notification.title = title
-        notification.message = message
-        notification.related_user_id = related_user_id
-        notification.project_id = project_id
-        db.session.add(notification)
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error creating notification: {e}")
+    notify([user_id], type, title, message, related_user_id=related_user_id, project_id=project_id)
 
-# Serve static HTML files
+def request_active(data=None):
+    """Optional ``active`` flag on toggle endpoints: set that state instead of flipping"""
+    if data is None:
+        data = request.get_json(silent=True) or {}
+    active = data.get('active')
+    return active if isinstance(active, bool) else None
+
+# Serve static HTML files (pages load their CSS and JS by fingerprinted URL, see assets.py)
 @app.route('/')
 def index():
-    return send_from_directory('static', 'index.html')
-
-@app.route('/login.html')
-def login_page():
-    return send_from_directory('static', 'login.html')
-
-@app.route('/register.html')
-def register_page():
-    return send_from_directory('static', 'register.html')
-
-@app.route('/dashboard.html')
-def dashboard_page():
-    return send_from_directory('static', 'dashboard.html')
-
-@app.route('/browse.html')
-def browse_page():
-    return send_from_directory('static', 'browse.html')
-
-@app.route('/discussion.html')
-def discussion_page():
-    return send_from_directory('static', 'discussion.html')
-
-@app.route('/profile.html')
-def profile_page():
-    return send_from_directory('static', 'profile.html')
-
-@app.route('/donate.html')
-def donate_page():
-    return send_from_directory('static', 'donate.html')
-
-# Serve CSS and JS files
-@app.route('/styles.css')
-def styles():
-    return send_from_directory('static', 'styles.css')
-
-@app.route('/login.css')
-def login_css():
-    return send_from_directory('static', 'login.css')
-
-@app.route('/register.css')
-def register_css():
-    return send_from_directory('static', 'register.css')
+    return serve_asset('index.html')
 
-@app.route('/dashboard.css')
-def dashboard_css():
-    return send_from_directory('static', 'dashboard.css')
+@app.route('/<page>.html')
+def html_page(page):
+    return serve_asset(f'{page}.html')
 
-@app.route('/browse.css')
-def browse_css():
-    return send_from_directory('static', 'browse.css')
-
-@app.route('/discussion.css')
-def discussion_css():
-    return send_from_directory('static', 'discussion.css')
-
-@app.route('/profile.css')
-def profile_css():
-    return send_from_directory('static', 'profile.css')
-
-@app.route('/donate.css')
-def donate_css():
-    return send_from_directory('static', 'donate.css')
+# Serve CSS and JS files; fingerprinted names are cached for a year
+@app.route('/<name>.css')
+def css_files(name):
+    return serve_asset(f'{name}.css')
 
 @app.route('/js/<path:filename>')
 def js_files(filename):
-    return send_from_directory('static/js', filename)
+    return serve_asset(f'js/{filename}')
 
 # Authentication APIs
 @app.route('/api/register', methods=['POST'])
@@ -120,6 +81,7 @@ def register():
         
         db.session.add(user)
         db.session.commit()
+        invalidate('users')
         
         # Set session
         session['user_id'] = user.id
@@ -176,14 +138,22 @@ def get_current_user():
     return jsonify({'user': user.to_dict()}), 200
 
 # Project APIs
+PROJECT_SORT_KEYS = {
+    'recent': (Project.created_at, Project.id),
+    'popular': (Project.vote_count, Project.id),
+    'votes': (Project.vote_count, Project.id),
+    'funding': (Project.current_funding, Project.id),
+    'hot': (Project.hot_score, Project.id),
+}
+
 @app.route('/api/projects', methods=['GET'])
+@cached_response('projects')
 def get_projects():
     try:
         # Get query parameters
-        sort_by = request.args.get('sort', 'recent')  # recent, popular, funding
+        sort_by = request.args.get('sort', 'recent')  # recent, popular/votes, funding, hot, relevance
         category = request.args.get('category', '')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
+        search = request.args.get('search', '').strip()
         
         # Build query
         query = Project.query
@@ -191,33 +161,27 @@ def get_projects():
         if category:
             query = query.filter(Project.category == category)
         
-        # Apply sorting
-        if sort_by == 'popular':
-            # Sort by vote count (subquery)
-            vote_counts = db.session.query(
-                Vote.project_id,
-                func.count(Vote.id).label('vote_count')
-            ).filter(Vote.is_upvote == True).group_by(Vote.project_id).subquery()
-            
-            query = query.outerjoin(vote_counts, Project.id == vote_counts.c.project_id)\
-                         .order_by(desc(vote_counts.c.vote_count))
-        elif sort_by == 'funding':
-            query = query.order_by(desc(Project.current_funding))
-        else:  # recent
-            query = query.order_by(desc(Project.created_at))
-        
-        # Paginate
-        paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+        relevance = None
+        if search:
+            query, relevance = apply_search(query, Project, search)
+        
+        # Keyset pagination over (sort key, id)
+        if sort_by == 'relevance' and relevance is not None:
+            sort_keys = (relevance, Project.id)
+        else:
+            sort_keys = PROJECT_SORT_KEYS.get(sort_by, PROJECT_SORT_KEYS['recent'])
+        filtered = bool(category or search)
+        items, page_meta = paginate_request(query, sort_keys, count_key=f'projects:{category}:{search}',
+                                            table=None if filtered else 'projects')
         user_id = session.get('user_id')
-        projects = [project.to_dict(user_id) for project in paginated.items]
+        projects = serialize_projects(items, user_id)
+        # Engagement on a project only evicts the pages showing it; 'projects' is for creates and deletes
+        tag_response(*{f'user:{project.user_id}' for project in items}, *{f'project:{project.id}' for project in items})
         
-        return jsonify({
-            'projects': projects,
-            'total': paginated.total,
-            'pages': paginated.pages,
-            'current_page': page
-        }), 200
+        return jsonify({'projects': projects, **page_meta}), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -247,55 +211,39 @@ def create_project():
         if len(description_words) < 50:
             return jsonify({'error': 'Project description must be at least 50 words. Please provide more details about your project idea.'}), 400
         
+        try:
+            funding_goal = parse_amount(data.get('fundingGoal') or 0, allow_zero=True)
+        except InvalidAmount:
+            return jsonify({'error': 'Invalid funding goal'}), 400
+        
         project = Project()
         project.title = data['title']
         project.description = data['description']
         project.category = data['category']
-        project.funding_goal = float(data.get('fundingGoal', 0))
+        project.funding_goal = funding_goal
         project.user_id = user_id
         
         db.session.add(project)
         db.session.flush()  # Get project ID without committing
         
-        # Handle file uploads
-        if files:
-            import os
-            from werkzeug.utils import secure_filename
-            
-            # Create uploads directory if it doesn't exist
-            upload_dir = os.path.join('static', 'uploads', 'projects', str(project.id))
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            for file in files:
-                if file and file.filename:
-                    # Secure the filename
-                    filename = secure_filename(file.filename)
-                    timestamp = str(int(datetime.now().timestamp()))
-                    unique_filename = f"{timestamp}_{filename}"
-                    
-                    # Save the file
-                    file_path = os.path.join(upload_dir, unique_filename)
-                    file.save(file_path)
-                    
-                    # Create attachment record
-                    attachment = ProjectAttachment()
-                    attachment.filename = unique_filename
-                    attachment.original_filename = file.filename
-                    attachment.file_size = os.path.getsize(file_path)
-                    attachment.file_type = file.content_type or 'application/octet-stream'
-                    attachment.file_path = file_path.replace('static/', '')  # Store relative path
-                    attachment.project_id = project.id
-                    attachment.user_id = user_id
-                    
-                    db.session.add(attachment)
+        # Small files sent with the form are streamed into the blob store;
+        # large ones should use the resumable upload API after creation
+        for file in files:
+            if file and file.filename:
+                store_file(file, project.id, user_id)
         
         db.session.commit()
+        invalidate_dashboard(user_id)
+        invalidate('projects')
         
         return jsonify({
             'message': 'Project created successfully',
             'project': project.to_dict(user_id)
         }), 201
         
+    except UploadError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -321,14 +269,21 @@ def update_project(project_id):
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
         
+        try:
+            funding_goal = parse_amount(data.get('fundingGoal', project.funding_goal) or 0, allow_zero=True)
+        except InvalidAmount:
+            return jsonify({'error': 'Invalid funding goal'}), 400
+        
         # Update project fields
         project.title = data['title']
         project.description = data['description']
         project.category = data['category']
-        project.funding_goal = float(data.get('fundingGoal', project.funding_goal))
+        project.funding_goal = funding_goal
         project.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_dashboard(user_id)
+        invalidate('projects', f'project:{project_id}')
         
         return jsonify({
             'message': 'Project updated successfully',
@@ -359,8 +314,14 @@ def delete_project(project_id):
             import shutil
             shutil.rmtree(upload_dir)
         
+        for upload in UploadSession.query.filter_by(project_id=project_id).all():
+            discard_upload(upload)
+        remove_project_funding(project_id)
         db.session.delete(project)
         db.session.commit()
+        invalidate_dashboard(user_id)
+        invalidate_team(project_id)
+        invalidate('projects', f'project:{project_id}')
         
         return jsonify({'message': 'Project deleted successfully'}), 200
         
@@ -369,10 +330,150 @@ def delete_project(project_id):
         return jsonify({'error': str(e)}), 500
 
 
+# Resumable attachment uploads: open a session, PUT chunks, then complete
+@app.route('/api/projects/<int:project_id>/uploads', methods=['POST'])
+def create_upload(project_id):
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        project = Project.query.get_or_404(project_id)
+        if project.user_id != user_id:
+            return jsonify({'error': 'Permission denied'}), 403
+        
+        data = request.get_json() or {}
+        upload = open_session(project_id, user_id, data.get('filename'), data.get('size'), data.get('content_type'))
+        db.session.commit()
+        
+        return jsonify({
+            'upload': upload.to_dict(),
+            'chunk_size': app.config['UPLOAD_CHUNK_SIZE']
+        }), 201
+        
+    except UploadError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def get_own_upload(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if not upload or upload.user_id != session.get('user_id'):
+        return None
+    return upload
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    if not session.get('user_id'):
+        return jsonify({'error': 'Authentication required'}), 401
+    upload = get_own_upload(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify({'upload': upload.to_dict()}), 200
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    try:
+        if not session.get('user_id'):
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        upload = get_own_upload(upload_id)
+        if not upload:
+            return jsonify({'error': 'Upload not found'}), 404
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({'error': 'offset is required'}), 400
+        
+        new_offset = write_chunk(upload, offset, request.stream, request.content_length)
+        db.session.commit()
+        
+        return jsonify({'offset': new_offset, 'complete': new_offset == upload.size}), 200
+        
+    except UploadError as e:
+        db.session.rollback()
+        # Tell the client where to resume from
+        db.session.refresh(upload)
+        return jsonify({'error': str(e), 'offset': upload.received}), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def finish_upload(upload_id):
+    try:
+        if not session.get('user_id'):
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        upload = get_own_upload(upload_id)
+        if not upload:
+            return jsonify({'error': 'Upload not found'}), 404
+        project_id = upload.project_id
+        attachment, created = complete_upload(upload)
+        db.session.commit()
+        invalidate(f'project:{project_id}')
+        
+        return jsonify({'attachment': attachment.to_dict()}), 201 if created else 200
+        
+    except UploadError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    try:
+        if not session.get('user_id'):
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        upload = get_own_upload(upload_id)
+        if not upload:
+            return jsonify({'error': 'Upload not found'}), 404
+        discard_upload(upload)
+        db.session.commit()
+        
+        return jsonify({'message': 'Upload cancelled'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 # Serve uploaded files
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory('static/uploads', filename)
+    root = os.path.join(app.root_path, 'static', 'uploads')
+    path = safe_join(root, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return send_path(path, 'uploads', max_age=3600)
+
+# Serve content-addressed blobs (profile images, discussion media)
+@app.route('/blobs/<key>')
+def serve_blob(key):
+    store = get_blob_store()
+    if not BLOB_KEY_RE.match(key) or not store.exists(key):
+        abort(404)
+    # Only allowlisted media render inline; anything else (including blobs
+    # stored before the allowlist) is a download the browser must not sniff
+    mimetype, inline = serving_type(key)
+    # The key is the content hash, so the response can be cached forever
+    path = store.path(key)
+    if path is not None:
+        response = send_path(os.path.abspath(path), 'blobs', mimetype=mimetype,
+                             etag=key.split('.')[0], max_age=31536000)
+    else:
+        # Backends without local files stream through the interface
+        response = send_file(store.open(key), mimetype=mimetype, etag=key.split('.')[0],
+                             max_age=31536000, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    if not inline:
+        response.headers.set('Content-Disposition', 'attachment', filename=key)
+    return response
 
 @app.route('/api/projects/<int:project_id>', methods=['GET'])
 def get_project(project_id):
@@ -391,30 +492,21 @@ def vote_project(project_id):
         if not user_id:
             return jsonify({'error': 'Authentication required'}), 401
         
-        project = Project.query.get_or_404(project_id)
+        project = db.session.get(Project, project_id)
+        if not project:
+            return jsonify({'error': 'Project not found'}), 404
         
-        # Check if user already voted
-        existing_vote = Vote.query.filter_by(user_id=user_id, project_id=project_id).first()
-        
-        if existing_vote:
-            # Toggle vote or remove it
-            if existing_vote.is_upvote:
-                db.session.delete(existing_vote)
-                action = 'removed'
-            else:
-                existing_vote.is_upvote = True
-                action = 'updated'
-        else:
-            # Create new upvote
-            vote = Vote()
-            vote.user_id = user_id
-            vote.project_id = project_id
-            vote.is_upvote = True
-            db.session.add(vote)
-            action = 'added'
-            
-            # Create notification for project owner (only for new votes)
-            voter = User.query.get(user_id)
+        # Toggle, or set when the client says which state it wants (idempotent retries)
+        voted, changed = toggle('vote', user_id, project_id, active=request_active())
+        action = 'added' if voted else 'removed'
+        
+        db.session.commit()
+        if changed:
+            invalidate(f'project:{project_id}')
+        
+        if changed and voted:
+            # Notify the project owner of new votes, once the vote is committed
+            voter = current_user()
             if voter and project.user_id != user_id:
                 create_notification(
                     user_id=project.user_id,
@@ -425,11 +517,11 @@ def vote_project(project_id):
                     project_id=project.id
                 )
         
-        db.session.commit()
-        
         return jsonify({
-            'message': f'Vote {action} successfully',
-            'vote_count': project.get_vote_count()
+            'message': f'Vote {action} successfully' if changed else 'Vote unchanged',
+            'voted': voted,
+            'changed': changed,
+            'vote_count': project.vote_count
         }), 200
         
     except Exception as e:
@@ -438,13 +530,15 @@ def vote_project(project_id):
 
 # Comment APIs
 @app.route('/api/projects/<int:project_id>/comments', methods=['GET'])
+@cached_response('project:{project_id}')
 def get_comments(project_id):
     try:
         user_id = session.get('user_id')  # Get current user for reaction info
         comments = Comment.query.filter_by(project_id=project_id)\
                                .order_by(desc(Comment.created_at)).all()
+        tag_response(*{f'user:{comment.user_id}' for comment in comments})
         return jsonify({
-            'comments': [comment.to_dict(user_id) for comment in comments]
+            'comments': serialize_comments(comments, user_id)
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -466,11 +560,13 @@ def add_comment(project_id):
         comment.project_id = project_id
         
         db.session.add(comment)
+        adjust_counter(Project, project_id, comment_count=1)
         db.session.commit()
+        invalidate(f'project:{project_id}')
         
         # Create notification for project owner
         project = Project.query.get(project_id)
-        commenter = User.query.get(user_id)
+        commenter = current_user()
         if project and commenter and project.user_id != user_id:
             create_notification(
                 user_id=project.user_id,
@@ -513,6 +609,7 @@ def update_comment(comment_id):
         comment.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate(f'project:{comment.project_id}')
         
         return jsonify({
             'message': 'Comment updated successfully',
@@ -537,7 +634,9 @@ def delete_comment(comment_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         db.session.delete(comment)
+        adjust_counter(Project, comment.project_id, comment_count=-1)
         db.session.commit()
+        invalidate(f'project:{comment.project_id}')
         
         return jsonify({'message': 'Comment deleted successfully'}), 200
         
@@ -559,39 +658,25 @@ def toggle_comment_reaction(comment_id):
         if reaction_type not in ['like', 'heart']:
             return jsonify({'error': 'Invalid reaction type'}), 400
         
-        comment = Comment.query.get_or_404(comment_id)
+        comment = db.session.get(Comment, comment_id)
+        if not comment:
+            return jsonify({'error': 'Comment not found'}), 404
         
-        # Check if user already has any reaction on this comment
-        existing_reaction = CommentReaction.query.filter_by(user_id=user_id, comment_id=comment_id).first()
-        
-        if existing_reaction:
-            if existing_reaction.reaction_type == reaction_type:
-                # Same reaction - remove it
-                db.session.delete(existing_reaction)
-                user_reacted = False
-                action = 'removed'
-            else:
-                # Different reaction - change it
-                existing_reaction.reaction_type = reaction_type
-                user_reacted = True
-                action = 'changed'
-        else:
-            # No existing reaction - add new one
-            reaction = CommentReaction()
-            reaction.user_id = user_id
-            reaction.comment_id = comment_id
-            reaction.reaction_type = reaction_type
-            db.session.add(reaction)
-            user_reacted = True
-            action = 'added'
+        # One reaction per user and comment; reacting with the other type switches it
+        user_reaction, changed = toggle('comment_reaction', user_id, comment_id, reaction_type,
+                                        active=request_active(data))
+        action = 'added' if user_reaction else 'removed'
         
         db.session.commit()
+        if changed:
+            invalidate(f'project:{comment.project_id}')
         
         return jsonify({
-            'message': f'Reaction {action} successfully',
+            'message': f'Reaction {action} successfully' if changed else 'Reaction unchanged',
+            'changed': changed,
             'like_count': comment.get_reaction_count('like'),
             'heart_count': comment.get_reaction_count('heart'),
-            'user_reaction': comment.get_user_reaction(user_id)
+            'user_reaction': user_reaction
         }), 200
         
     except Exception as e:
@@ -599,6 +684,25 @@ def toggle_comment_reaction(comment_id):
         return jsonify({'error': str(e)}), 500
 
 
+# Many votes, likes and reactions from one user in a single request (see toggles.py)
+@app.route('/api/toggles', methods=['POST'])
+def batch_toggles():
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        data = request.get_json(silent=True) or {}
+        operations = parse_operations(data.get('operations'))
+        
+        return jsonify({'results': apply_toggles(user_id, operations)}), 200
+        
+    except ToggleError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 
 # Collaboration APIs
 @app.route('/api/projects/<int:project_id>/collaborate', methods=['POST'])
@@ -629,10 +733,12 @@ def request_collaboration(project_id):
         collaboration.message = data.get('message', '')
         
         db.session.add(collaboration)
+        adjust_counter(Project, project_id, collaboration_count=1)
         db.session.commit()
+        invalidate(f'project:{project_id}')
         
         # Create notification for project owner
-        requester = User.query.get(user_id)
+        requester = current_user()
         if requester:
             create_notification(
                 user_id=project.user_id,
@@ -663,24 +769,19 @@ def donate_to_project(project_id):
         project = Project.query.get_or_404(project_id)
         data = request.get_json()
         
-        amount = float(data.get('amount', 0))
-        if amount <= 0:
+        try:
+            amount = parse_amount(data.get('amount', 0))
+        except InvalidAmount:
             return jsonify({'error': 'Invalid donation amount'}), 400
         
-        donation = Donation()
-        donation.user_id = user_id
-        donation.project_id = project_id
-        donation.amount = amount
-        donation.message = data.get('message', '')
+        # Ledger row plus atomic increments of the project and global totals
+        donation, new_funding = record_donation(project_id, user_id, amount, data.get('message', ''))
         
-        # Update project funding
-        project.current_funding += amount
-        
-        db.session.add(donation)
         db.session.commit()
+        invalidate('donations', f'project:{project_id}')
         
         # Create notification for project owner
-        donor = User.query.get(user_id)
+        donor = current_user()
         if donor and project.user_id != user_id:
             create_notification(
                 user_id=project.user_id,
@@ -694,7 +795,7 @@ def donate_to_project(project_id):
         return jsonify({
             'message': 'Donation successful',
             'donation': donation.to_dict(),
-            'new_funding': project.current_funding
+            'new_funding': to_json_amount(new_funding)
         }), 201
         
     except Exception as e:
@@ -710,31 +811,50 @@ def get_dashboard_stats():
             return jsonify({'error': 'Authentication required'}), 401
         
         user_projects = Project.query.filter_by(user_id=user_id).all()
-        total_funding = sum(project.current_funding for project in user_projects)
-        total_votes = sum(project.get_vote_count() for project in user_projects)
+        total_funding = sum(project.current_funding or 0 for project in user_projects)
+        total_votes = sum(project.vote_count for project in user_projects)
         total_collaborations = Collaboration.query.filter_by(user_id=user_id).count()
         
         return jsonify({
             'total_projects': len(user_projects),
-            'total_funding': total_funding,
+            'total_funding': to_json_amount(total_funding),
             'total_votes': total_votes,
             'total_collaborations': total_collaborations,
-            'projects': [project.to_dict() for project in user_projects]
+            'projects': serialize_projects(user_projects)
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Totals, recent projects and the activity feed in a constant number of queries
+@app.route('/api/dashboard/summary', methods=['GET'])
+@query_budget(3)
+def get_dashboard_summary():
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        return jsonify(dashboard_summary(user_id)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Discussion APIs
+DISCUSSION_SORT_KEYS = {
+    'recent': (Discussion.created_at, Discussion.id),
+    'popular': (Discussion.like_count, Discussion.id),
+    'likes': (Discussion.like_count, Discussion.id),
+    'hot': (Discussion.hot_score, Discussion.id),
+}
+
 @app.route('/api/discussions', methods=['GET'])
 def get_discussions():
     try:
         # Get query parameters
-        sort_by = request.args.get('sort', 'recent')  # recent, popular
+        sort_by = request.args.get('sort', 'recent')  # recent, popular/likes, hot, relevance
         category = request.args.get('category', '')
-        search = request.args.get('search', '')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
+        search = request.args.get('search', '').strip()
         
         # Build query
         query = Discussion.query
@@ -742,34 +862,25 @@ def get_discussions():
         if category:
             query = query.filter(Discussion.category == category)
         
+        relevance = None
         if search:
-            query = query.filter(Discussion.title.contains(search) | Discussion.content.contains(search))
-        
-        # Apply sorting
-        if sort_by == 'popular':
-            # Sort by like count (subquery)
-            like_counts = db.session.query(
-                DiscussionLike.discussion_id,
-                func.count(DiscussionLike.id).label('like_count')
-            ).group_by(DiscussionLike.discussion_id).subquery()
-            
-            query = query.outerjoin(like_counts, Discussion.id == like_counts.c.discussion_id)\
-                         .order_by(desc(like_counts.c.like_count))
-        else:  # recent
-            query = query.order_by(desc(Discussion.created_at))
+            query, relevance = apply_search(query, Discussion, search)
         
-        # Paginate
-        paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Keyset pagination over (sort key, id)
+        if sort_by == 'relevance' and relevance is not None:
+            sort_keys = (relevance, Discussion.id)
+        else:
+            sort_keys = DISCUSSION_SORT_KEYS.get(sort_by, DISCUSSION_SORT_KEYS['recent'])
+        filtered = bool(category or search)
+        items, page_meta = paginate_request(query, sort_keys, count_key=f'discussions:{category}:{search}',
+                                            table=None if filtered else 'discussions')
         user_id = session.get('user_id')
-        discussions = [discussion.to_dict(user_id) for discussion in paginated.items]
+        discussions = serialize_discussions(items, user_id)
         
-        return jsonify({
-            'discussions': discussions,
-            'total': paginated.total,
-            'pages': paginated.pages,
-            'current_page': page
-        }), 200
+        return jsonify({'discussions': discussions, **page_meta}), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -781,29 +892,17 @@ def toggle_discussion_like(discussion_id):
     try:
         user_id = session['user_id']
         
-        # Check if user already liked this discussion
-        existing_like = DiscussionLike.query.filter_by(
-            discussion_id=discussion_id,
-            user_id=user_id
-        ).first()
+        discussion = db.session.get(Discussion, discussion_id)
+        if not discussion:
+            return jsonify({'error': 'Discussion not found'}), 404
         
-        if existing_like:
-            # Unlike - remove the like
-            db.session.delete(existing_like)
-            liked = False
-        else:
-            # Like - add new like
-            new_like = DiscussionLike(
-                discussion_id=discussion_id,
-                user_id=user_id
-            )
-            db.session.add(new_like)
-            liked = True
-            
-            # Create notification for discussion owner
-            discussion = Discussion.query.get(discussion_id)
-            liker = User.query.get(user_id)
-            if discussion and liker and discussion.user_id != user_id:
+        liked, changed = toggle('discussion_like', user_id, discussion_id, active=request_active())
+        db.session.commit()
+        
+        if changed and liked:
+            # Notify the discussion owner, once the like is committed
+            liker = current_user()
+            if liker and discussion.user_id != user_id:
                 create_notification(
                     user_id=discussion.user_id,
                     type='like',
@@ -813,13 +912,12 @@ def toggle_discussion_like(discussion_id):
                     project_id=None
                 )
         
-        db.session.commit()
-        
         # Get updated like count
-        like_count = DiscussionLike.query.filter_by(discussion_id=discussion_id).count()
+        like_count = db.session.query(Discussion.like_count).filter_by(id=discussion_id).scalar() or 0
         
         return jsonify({
             'liked': liked,
+            'changed': changed,
             'like_count': like_count
         }), 200
         
@@ -852,17 +950,21 @@ def create_discussion():
         # Handle media upload
         if data.get('media_data') and data.get('media_type'):
             discussion.media_type = data['media_type']
-            discussion.media_url = data['media_data']  # Store base64 data
+            discussion.media_url = externalize(data['media_data'])  # Stored in the blob store
             discussion.media_filename = data.get('media_filename', 'uploaded_file')
         
         db.session.add(discussion)
         db.session.commit()
+        invalidate('discussions')
         
         return jsonify({
             'message': 'Discussion created successfully',
             'discussion': discussion.to_dict(user_id)
         }), 201
         
+    except BlobError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -921,6 +1023,7 @@ def delete_discussion(discussion_id):
         
         db.session.delete(discussion)
         db.session.commit()
+        invalidate('discussions')
         
         return jsonify({'message': 'Discussion deleted successfully'}), 200
         
@@ -943,15 +1046,26 @@ def get_discussion(discussion_id):
 
 
 
+def reply_tree_args():
+    """Paging arguments shared by the reply listing endpoints"""
+    return {
+        'parent_id': request.args.get('parent_id', type=int),
+        'cursor': request.args.get('cursor', type=int),
+        'limit': min(request.args.get('limit', 50, type=int), 200)
+    }
+
 @app.route('/api/discussions/<int:discussion_id>/replies', methods=['GET'])
 def get_discussion_replies(discussion_id):
     try:
         user_id = session.get('user_id')
-        # Only get top-level replies (parent_reply_id is None)
-        replies = DiscussionReply.query.filter_by(discussion_id=discussion_id, parent_reply_id=None)\
-                                     .order_by(desc(DiscussionReply.created_at)).all()
+        # Top-level replies (or children of parent_id), newest first, with their nested replies
+        replies, next_cursor, truncated = load_reply_tree(
+            discussion_id, user_id, newest_first=True, **reply_tree_args()
+        )
         return jsonify({
-            'replies': [reply.to_dict(user_id) for reply in replies]
+            'replies': replies,
+            'next_cursor': next_cursor,
+            'truncated': truncated
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -973,11 +1087,13 @@ def add_discussion_reply(discussion_id):
         reply.discussion_id = discussion_id
         
         db.session.add(reply)
+        adjust_counter(Discussion, discussion_id, reply_count=1)
         db.session.commit()
+        invalidate('discussions')
         
         # Create notification for discussion owner
         discussion = Discussion.query.get(discussion_id)
-        replier = User.query.get(user_id)
+        replier = current_user()
         if discussion and replier and discussion.user_id != user_id:
             create_notification(
                 user_id=discussion.user_id,
@@ -1011,34 +1127,18 @@ def toggle_reply_reaction(reply_id):
         if reaction_type not in ['like', 'heart']:
             return jsonify({'error': 'Invalid reaction type'}), 400
         
-        reply = DiscussionReply.query.get_or_404(reply_id)
-        
-        # Check if user already reacted with this type
-        existing_reaction = ReplyReaction.query.filter_by(
-            user_id=user_id, 
-            reply_id=reply_id, 
-            reaction_type=reaction_type
-        ).first()
+        reply = db.session.get(DiscussionReply, reply_id)
+        if not reply:
+            return jsonify({'error': 'Reply not found'}), 404
         
-        if existing_reaction:
-            # Remove reaction
-            db.session.delete(existing_reaction)
-            user_reacted = False
-            action = 'removed'
-        else:
-            # Add reaction
-            reaction = ReplyReaction()
-            reaction.user_id = user_id
-            reaction.reply_id = reply_id
-            reaction.reaction_type = reaction_type
-            db.session.add(reaction)
-            user_reacted = True
-            action = 'added'
+        user_reacted, changed = toggle('reply_reaction', user_id, reply_id, reaction_type, active=request_active(data))
+        action = 'added' if user_reacted else 'removed'
         
         db.session.commit()
         
         return jsonify({
-            'message': f'Reaction {action} successfully',
+            'message': f'Reaction {action} successfully' if changed else 'Reaction unchanged',
+            'changed': changed,
             'count': reply.get_reaction_count(reaction_type),
             'user_reacted': user_reacted
         }), 200
@@ -1095,7 +1195,9 @@ def delete_discussion_reply(reply_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         db.session.delete(reply)
+        adjust_counter(Discussion, reply.discussion_id, reply_count=-1)
         db.session.commit()
+        invalidate('discussions')
         
         return jsonify({'message': 'Reply deleted successfully'}), 200
         
@@ -1124,7 +1226,9 @@ def add_nested_reply(parent_reply_id):
         nested_reply.parent_reply_id = parent_reply_id
         
         db.session.add(nested_reply)
+        adjust_counter(Discussion, parent_reply.discussion_id, reply_count=1)
         db.session.commit()
+        invalidate('discussions')
         
         return jsonify({
             'message': 'Nested reply added successfully',
@@ -1136,6 +1240,7 @@ def add_nested_reply(parent_reply_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/discussions/stats', methods=['GET'])
+@cached_response('discussions', anonymous_only=False)
 def get_discussion_stats():
     try:
         # Ideas shared count = number of discussion posts (total discussions)
@@ -1160,11 +1265,12 @@ def get_discussion_stats():
 def get_discussion_comments(discussion_id):
     try:
         user_id = session.get('user_id')
-        # Get top-level replies (comments) for this discussion
-        comments = DiscussionReply.query.filter_by(discussion_id=discussion_id, parent_reply_id=None)\
-                                      .order_by(DiscussionReply.created_at).all()
+        # Get top-level replies (comments) for this discussion, or children of parent_id
+        comments, next_cursor, truncated = load_reply_tree(discussion_id, user_id, **reply_tree_args())
         return jsonify({
-            'comments': [comment.to_dict(user_id) for comment in comments]
+            'comments': comments,
+            'next_cursor': next_cursor,
+            'truncated': truncated
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1187,7 +1293,9 @@ def add_discussion_comment(discussion_id):
         # No parent_reply_id means it's a top-level comment
         
         db.session.add(comment)
+        adjust_counter(Discussion, discussion_id, reply_count=1)
         db.session.commit()
+        invalidate('discussions')
         
         return jsonify({
             'message': 'Comment added successfully',
@@ -1245,7 +1353,9 @@ def delete_discussion_comment(comment_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         db.session.delete(comment)
+        adjust_counter(Discussion, comment.discussion_id, reply_count=-1)
         db.session.commit()
+        invalidate('discussions')
         
         return jsonify({'message': 'Comment deleted successfully'}), 200
         
@@ -1263,32 +1373,21 @@ def toggle_discussion_comment_reaction(comment_id):
         data = request.get_json()
         reaction_type = data.get('reaction_type', 'like')
         
-        comment = DiscussionReply.query.get_or_404(comment_id)
+        if reaction_type not in ['like', 'heart']:
+            return jsonify({'error': 'Invalid reaction type'}), 400
         
-        # Check if user already reacted with this type
-        existing_reaction = ReplyReaction.query.filter_by(
-            user_id=user_id, 
-            reply_id=comment_id, 
-            reaction_type=reaction_type
-        ).first()
+        comment = db.session.get(DiscussionReply, comment_id)
+        if not comment:
+            return jsonify({'error': 'Comment not found'}), 404
         
-        if existing_reaction:
-            # Remove reaction
-            db.session.delete(existing_reaction)
-            user_reacted = False
-        else:
-            # Add reaction
-            reaction = ReplyReaction()
-            reaction.user_id = user_id
-            reaction.reply_id = comment_id
-            reaction.reaction_type = reaction_type
-            db.session.add(reaction)
-            user_reacted = True
+        user_reacted, changed = toggle('reply_reaction', user_id, comment_id, reaction_type,
+                                       active=request_active(data))
         
         db.session.commit()
         
         return jsonify({
             'reacted': user_reacted,
+            'changed': changed,
             'reaction_count': comment.get_reaction_count(reaction_type)
         }), 200
         
@@ -1316,7 +1415,9 @@ def add_discussion_comment_reply(comment_id):
         reply.parent_reply_id = comment_id
         
         db.session.add(reply)
+        adjust_counter(Discussion, parent_comment.discussion_id, reply_count=1)
         db.session.commit()
+        invalidate('discussions')
         
         return jsonify({
             'message': 'Reply added successfully',
@@ -1357,7 +1458,7 @@ def update_profile():
         if 'skills' in data:
             user.skills = data['skills']
         if 'profile_image' in data:
-            user.profile_image = data['profile_image']
+            user.profile_image = externalize(data['profile_image'])
         if 'phone' in data:
             user.phone = data['phone']
         if 'location' in data:
@@ -1372,12 +1473,18 @@ def update_profile():
             user.github = data['github']
         
         db.session.commit()
+        invalidate(f'user:{user_id}')
+        invalidate_author_summary(user_id)
+        invalidate_identity(user_id)
         
         return jsonify({
             'message': 'Profile updated successfully',
             'user': user.to_dict()
         }), 200
         
+    except BlobError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -1393,17 +1500,17 @@ def get_user_profile(user_id):
         user_projects = Project.query.filter_by(user_id=user_id).order_by(desc(Project.created_at)).all()
         
         # Get user stats
-        total_funding = sum(project.current_funding for project in user_projects)
-        total_votes = sum(project.get_vote_count() for project in user_projects)
+        total_funding = sum(project.current_funding or 0 for project in user_projects)
+        total_votes = sum(project.vote_count for project in user_projects)
         total_collaborations = Collaboration.query.filter_by(user_id=user_id).count()
         
         profile_data = user.to_dict()
         profile_data.update({
             'total_projects': len(user_projects),
-            'total_funding': total_funding,
+            'total_funding': to_json_amount(total_funding),
             'total_votes': total_votes,
             'total_collaborations': total_collaborations,
-            'projects': [project.to_dict() for project in user_projects]
+            'projects': serialize_projects(user_projects)
         })
         
         return jsonify({'profile': profile_data}), 200
@@ -1414,30 +1521,28 @@ def get_user_profile(user_id):
 @app.route('/api/users', methods=['GET'])
 def get_users():
     try:
-        search = request.args.get('search', '')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
+        search = request.args.get('search', '').strip()
         
         query = User.query
         
+        relevance = None
         if search:
-            query = query.filter(
-                User.full_name.contains(search) |
-                User.username.contains(search) |
-                User.college.contains(search)
-            )
+            query, relevance = apply_search(query, User, search)
         
-        # Paginate results
-        paginated = query.paginate(page=page, per_page=per_page, error_out=False)
-        users = [user.to_dict() for user in paginated.items]
+        # Best matches first when searching, otherwise signup order
+        if relevance is not None:
+            items, page_meta = paginate_request(query, (relevance, User.id), count_key=f'users:{search}',
+                                                default_per_page=20)
+        else:
+            items, page_meta = paginate_request(query, (User.id,), count_key=f'users:{search}',
+                                                table=None if search else 'users',
+                                                descending=False, default_per_page=20)
+        users = [user.to_dict() for user in items]
         
-        return jsonify({
-            'users': users,
-            'total': paginated.total,
-            'pages': paginated.pages,
-            'current_page': page
-        }), 200
+        return jsonify({'users': users, **page_meta}), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1504,7 +1609,7 @@ def get_user_donations():
         for donation, project_title, owner_name in donations:
             donation_dict = {
                 'id': donation.id,
-                'amount': donation.amount,
+                'amount': to_json_amount(donation.amount),
                 'message': donation.message,
                 'created_at': donation.created_at.isoformat(),
                 'project_title': project_title,
@@ -1526,93 +1631,9 @@ def get_user_activity():
         if not user_id:
             return jsonify({'error': 'Authentication required'}), 401
         
-        activities = []
-        
-        # Recent projects created
-        recent_projects = Project.query.filter_by(user_id=user_id)\
-            .order_by(desc(Project.created_at)).limit(5).all()
-        
-        for project in recent_projects:
-            activities.append({
-                'type': 'project_created',
-                'text': f'Created new project "{project.title}"',
-                'time': project.created_at.isoformat(),
-                'project_id': project.id
-            })
-        
-        # Recent collaborations
-        recent_collabs = db.session.query(
-            Collaboration, Project.title
-        ).join(
-            Project, Collaboration.project_id == Project.id
-        ).filter(
-            Collaboration.user_id == user_id
-        ).order_by(desc(Collaboration.created_at)).limit(5).all()
-        
-        for collab, project_title in recent_collabs:
-            activities.append({
-                'type': 'collaboration',
-                'text': f'Requested collaboration on "{project_title}"',
-                'time': collab.created_at.isoformat(),
-                'status': collab.status
-            })
-        
-        # Recent donations
-        recent_donations = db.session.query(
-            Donation, Project.title
-        ).join(
-            Project, Donation.project_id == Project.id
-        ).filter(
-            Donation.user_id == user_id
-        ).order_by(desc(Donation.created_at)).limit(5).all()
-        
-        for donation, project_title in recent_donations:
-            activities.append({
-                'type': 'donation',
-                'text': f'Donated ${donation.amount:.2f} to "{project_title}"',
-                'time': donation.created_at.isoformat(),
-                'amount': donation.amount
-            })
-        
-        # Recent votes
-        recent_votes = db.session.query(
-            Vote, Project.title
-        ).join(
-            Project, Vote.project_id == Project.id
-        ).filter(
-            Vote.user_id == user_id,
-            Vote.is_upvote == True
-        ).order_by(desc(Vote.created_at)).limit(5).all()
-        
-        for vote, project_title in recent_votes:
-            activities.append({
-                'type': 'vote',
-                'text': f'Voted for "{project_title}"',
-                'time': vote.created_at.isoformat()
-            })
-        
-        # Recent comments
-        recent_comments = db.session.query(
-            Comment, Project.title
-        ).join(
-            Project, Comment.project_id == Project.id
-        ).filter(
-            Comment.user_id == user_id
-        ).order_by(desc(Comment.created_at)).limit(5).all()
-        
-        for comment, project_title in recent_comments:
-            activities.append({
-                'type': 'comment',
-                'text': f'Commented on "{project_title}"',
-                'time': comment.created_at.isoformat()
-            })
-        
-        # Sort all activities by time (newest first)
-        activities.sort(key=lambda x: x['time'], reverse=True)
-        
-        # Return only the 10 most recent activities
+        # Latest actions across projects, collaborations, donations, votes and comments
         return jsonify({
-            'activities': activities[:10]
+            'activities': recent_activity(user_id)
         }), 200
         
     except Exception as e:
@@ -1681,9 +1702,11 @@ def accept_collaboration(collab_id):
         
         collaboration.status = 'accepted'
         db.session.commit()
+        invalidate_team(collaboration.project_id)
+        invalidate('collaborations')
         
         # Create notification for the collaborator
-        requester = User.query.get(collaboration.user_id)
+        requester = get_identity(collaboration.user_id)
         project = Project.query.get(collaboration.project_id)
         if requester and project:
             create_notification(
@@ -1719,6 +1742,8 @@ def reject_collaboration(collab_id):
         
         collaboration.status = 'rejected'
         db.session.commit()
+        invalidate_team(collaboration.project_id)
+        invalidate('collaborations')
         
         return jsonify({
             'message': 'Collaboration request rejected',
@@ -1729,6 +1754,38 @@ def reject_collaboration(collab_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Server-Sent Events stream of notifications and team chat messages
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_DURATION_SECONDS = 300
+
+@app.route('/api/events', methods=['GET'])
+def event_stream():
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    subscription = get_broker().subscribe(user_id)
+    
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            # Streams are closed periodically so the client reconnects and
+            # long-lived connections are spread across workers
+            deadline = time.monotonic() + SSE_MAX_DURATION_SECONDS
+            while (remaining := deadline - time.monotonic()) > 0:
+                event = subscription.get(timeout=min(SSE_KEEPALIVE_SECONDS, remaining))
+                if event is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield format_sse(*event)
+        finally:
+            subscription.close()
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 # Notification APIs for dashboard
 @app.route('/api/notifications', methods=['GET'])
 def get_notifications():
@@ -1737,19 +1794,25 @@ def get_notifications():
         if not user_id:
             return jsonify({'error': 'Authentication required'}), 401
         
-        # Get notifications from database
-        notifications = Notification.query.filter_by(user_id=user_id)\
-            .order_by(desc(Notification.created_at))\
-            .limit(50).all()
+        # Get notifications from database, newest first, paged by cursor
+        notifications, page_meta = paginate_request(
+            Notification.query.filter_by(user_id=user_id),
+            (Notification.created_at, Notification.id),
+            count_key=f'notifications:{user_id}',
+            default_per_page=50
+        )
         
         # Count unread notifications
         unread_count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
         
         return jsonify({
-            'notifications': [n.to_dict() for n in notifications],
-            'unread_count': unread_count
+            'notifications': serialize_notifications(notifications),
+            'unread_count': unread_count,
+            **page_meta
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1823,6 +1886,7 @@ def clear_all_notifications():
 
 # Homepage stats API with accurate donation totals
 @app.route('/api/homepage/stats', methods=['GET'])
+@cached_response('projects', 'users', anonymous_only=False)
 def get_homepage_stats():
     try:
         total_projects = Project.query.count()
@@ -1833,115 +1897,105 @@ def get_homepage_stats():
         return jsonify({
             'totalProjects': total_projects,
             'totalUsers': total_users,
-            'totalFunding': total_funding
+            'totalFunding': to_json_amount(total_funding)
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# Get user's team members (accepted collaborations)
+# Get user's team members (accepted collaborations), one page of distinct members
 @app.route('/api/user/team', methods=['GET'])
+@query_budget(1)
 def get_user_team():
     try:
         user_id = session.get('user_id')
         if not user_id:
             return jsonify({'error': 'Authentication required'}), 401
         
-        # Get all projects owned by the user
-        owned_projects = Project.query.filter_by(user_id=user_id).all()
+        per_page = max(1, min(request.args.get('per_page', 50, type=int), MAX_PER_PAGE))
+        members, next_cursor = team_roster(user_id, request.args.get('cursor'), per_page)
         
-        # Get all accepted collaborations for these projects
-        team_members = []
-        for project in owned_projects:
-            collaborations = Collaboration.query.filter_by(
-                project_id=project.id,
-                status='accepted'
-            ).all()
-            
-            for collab in collaborations:
-                team_member = {
-                    'project_id': project.id,
-                    'project_title': project.title,
-                    'user': collab.collaborator.to_dict(),
-                    'collaboration_date': collab.created_at.isoformat()
-                }
-                team_members.append(team_member)
-        
-        # Also get projects where current user is a collaborator
-        user_collaborations = Collaboration.query.filter_by(
-            user_id=user_id,
-            status='accepted'
-        ).all()
-        
-        for collab in user_collaborations:
-            team_member = {
-                'project_id': collab.project.id,
-                'project_title': collab.project.title,
-                'user': collab.project.owner.to_dict(),
-                'collaboration_date': collab.created_at.isoformat(),
-                'is_owner': True
-            }
-            team_members.append(team_member)
-        
-        return jsonify({'team_members': team_members}), 200
+        return jsonify({
+            'members': members,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Team Chat APIs
+CHAT_PAGE_SIZE = 50
+CHAT_MAX_PAGE_SIZE = 200
+CHAT_MAX_WAIT_SECONDS = 25
+
+def chat_window(project_id, since_id=None, before_id=None, limit=CHAT_PAGE_SIZE):
+    """Messages in ascending order and whether more exist beyond the window.
+
+    ``since_id`` reads forward from a message; otherwise the newest
+    ``limit`` messages are returned, optionally older than ``before_id``.
+    """
+    query = TeamChat.query.filter(TeamChat.project_id == project_id)
+    if since_id is not None:
+        messages = query.filter(TeamChat.id > since_id).order_by(TeamChat.id.asc()).limit(limit + 1).all()
+        return messages[:limit], len(messages) > limit
+    if before_id is not None:
+        query = query.filter(TeamChat.id < before_id)
+    messages = query.order_by(TeamChat.id.desc()).limit(limit + 1).all()
+    return messages[:limit][::-1], len(messages) > limit
+
 @app.route('/api/projects/<int:project_id>/chat', methods=['GET'])
-def get_project_chat(project_id):
+@team_required
+def get_project_chat(project_id, team):
+    subscription = None
     try:
         user_id = session.get('user_id')
-        if not user_id:
-            return jsonify({'error': 'Authentication required'}), 401
-        
-        # Check if user has access to this project (owner or collaborator)
-        project = Project.query.get_or_404(project_id)
-        is_owner = project.user_id == user_id
-        is_collaborator = Collaboration.query.filter_by(
-            project_id=project_id,
-            user_id=user_id,
-            status='accepted'
-        ).first() is not None
-        
-        if not (is_owner or is_collaborator):
-            return jsonify({'error': 'Access denied'}), 403
-        
-        # Get chat messages for this project
-        messages = TeamChat.query.filter_by(project_id=project_id)\
-            .order_by(TeamChat.created_at.asc()).all()
-        
+        since_id = request.args.get('since_id', type=int)
+        before_id = request.args.get('before_id', type=int)
+        limit = min(max(request.args.get('limit', CHAT_PAGE_SIZE, type=int), 1), CHAT_MAX_PAGE_SIZE)
+        wait = min(max(request.args.get('wait', 0, type=float), 0), CHAT_MAX_WAIT_SECONDS)
+        
+        # Long-poll: with since_id and wait, hold the request until a new
+        # message arrives. Subscribe before reading so none slip through.
+        if wait and since_id is not None:
+            subscription = get_broker().subscribe(user_id)
+        
+        messages, has_more = chat_window(project_id, since_id, before_id, limit)
+        deadline = time.monotonic() + wait
+        while subscription is not None and not messages:
+            remaining = deadline - time.monotonic()
+            # Don't hold a pooled connection while waiting
+            db.session.close()
+            event = subscription.get(timeout=remaining) if remaining > 0 else None
+            if event is None:
+                break
+            name, data = event
+            if name == 'chat' and (data.get('project_id') == project_id or data.get('truncated')):
+                messages, has_more = chat_window(project_id, since_id, before_id, limit)
+        
+        load_author_summaries({message.user_id for message in messages})
         return jsonify({
             'messages': [msg.to_dict() for msg in messages],
-            'project': project.to_dict()
+            'has_more': has_more,
+            'last_id': messages[-1].id if messages else (since_id or 0)
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    finally:
+        if subscription is not None:
+            subscription.close()
 
 @app.route('/api/projects/<int:project_id>/chat', methods=['POST'])
-def send_chat_message(project_id):
+@team_required
+def send_chat_message(project_id, team):
     try:
         user_id = session.get('user_id')
-        if not user_id:
-            return jsonify({'error': 'Authentication required'}), 401
-        
         data = request.get_json()
         if not data.get('message'):
             return jsonify({'error': 'Message is required'}), 400
         
-        # Check if user has access to this project (owner or collaborator)
-        project = Project.query.get_or_404(project_id)
-        is_owner = project.user_id == user_id
-        is_collaborator = Collaboration.query.filter_by(
-            project_id=project_id,
-            user_id=user_id,
-            status='accepted'
-        ).first() is not None
-        
-        if not (is_owner or is_collaborator):
-            return jsonify({'error': 'Access denied'}), 403
-        
         # Create new chat message
         chat_message = TeamChat()
         chat_message.project_id = project_id
@@ -1951,35 +2005,27 @@ def send_chat_message(project_id):
         db.session.add(chat_message)
         db.session.commit()
         
-        # Get current user for notification
-        sender = User.query.get(user_id)
-        
-        # Get all team members (owner + collaborators) except the sender
-        team_members = []
+        # Everyone else on the team (owner + accepted collaborators)
+        team_members = sorted(team.member_ids - {user_id})
         
-        # Add project owner if not the sender
-        if project.user_id != user_id:
-            team_members.append(project.user_id)
+        # Push the message to every open team chat, including the sender's other tabs
+        publish_event(team_members + [user_id], 'chat', {
+            'project_id': project_id,
+            'message': chat_message.to_dict()
+        })
         
-        # Add accepted collaborators who aren't the sender
-        collaborators = Collaboration.query.filter_by(
+        # Notify all team members; bursts fold into one unread notification per member
+        sender = author_summary(user_id)
+        project_title = db.session.query(Project.title).filter_by(id=project_id).scalar()
+        notify(
+            team_members,
+            type='team_chat',
+            title='New Team Message',
+            message=f"{sender['username']} sent a message in {project_title}",
+            related_user_id=user_id,
             project_id=project_id,
-            status='accepted'
-        ).filter(Collaboration.user_id != user_id).all()
-        
-        for collab in collaborators:
-            team_members.append(collab.user_id)
-        
-        # Create notifications for all team members
-        for member_id in team_members:
-            create_notification(
-                user_id=member_id,
-                type='team_chat',
-                title='New Team Message',
-                message=f'{sender.username} sent a message in {project.title}',
-                related_user_id=user_id,
-                project_id=project_id
-            )
+            coalesce=True
+        )
         
         return jsonify({
             'message': 'Message sent successfully',
@@ -1991,89 +2037,28 @@ def send_chat_message(project_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/projects/<int:project_id>/participants', methods=['GET'])
-def get_project_participants(project_id):
+@team_required
+def get_project_participants(project_id, team):
     try:
-        user_id = session.get('user_id')
-        if not user_id:
-            return jsonify({'error': 'Authentication required'}), 401
-        
-        # Check if user has access to this project (owner or collaborator)
-        project = Project.query.get_or_404(project_id)
-        is_owner = project.user_id == user_id
-        is_collaborator = Collaboration.query.filter_by(
-            project_id=project_id,
-            user_id=user_id,
-            status='accepted'
-        ).first() is not None
-        
-        if not (is_owner or is_collaborator):
-            return jsonify({'error': 'Access denied'}), 403
-        
-        # Get all participants (owner + accepted collaborators)
+        # Owner first, then collaborators in the order they joined
+        users = {user.id: user for user in User.query.filter(User.id.in_(team.member_ids)).all()}
         participants = []
-        
-        # Add project owner
-        owner = User.query.get(project.user_id)
-        if owner:
+        if team.owner_id in users:
             participants.append({
-                'user': owner.to_dict(),
+                'user': users[team.owner_id].to_dict(),
                 'is_owner': True,
-                'joined_at': project.created_at.isoformat() if project.created_at else None
+                'joined_at': team.created_at.isoformat() if team.created_at else None
             })
+        for collaborator_id, joined_at in team.collaborators.items():
+            if collaborator_id in users:
+                participants.append({
+                    'user': users[collaborator_id].to_dict(),
+                    'is_owner': False,
+                    'joined_at': joined_at.isoformat() if joined_at else None
+                })
         
-        # Add accepted collaborators
-        collaborators = Collaboration.query.filter_by(
-            project_id=project_id,
-            status='accepted'
-        ).join(User).all()
+        return jsonify({'participants': participants}), 200
         
-        for collab in collaborators:
-            participants.append({
-                'user': collab.user.to_dict(),
-                'is_owner': False,
-                'joined_at': collab.created_at.isoformat() if collab.created_at else None
-            })
-        
-        return jsonify({
-            'participants': participants,
-            'project': project.to_dict()
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-        
-        user_id = session['user_id']
-        
-        # Get accepted collaborations where user is either requester or project owner
-        accepted_collabs = db.session.query(Collaboration).join(Project).join(User, User.id == Project.owner_id).filter(
-            ((Collaboration.user_id == user_id) | (Project.owner_id == user_id)) &
-            (Collaboration.status == 'accepted')
-        ).all()
-        
-        team_members = set()
-        
-        for collab in accepted_collabs:
-            if collab.user_id == user_id:
-                # User is the collaborator, add project owner to team
-                owner = User.query.get(collab.project.owner_id)
-                if owner:
-                    team_members.add(owner)
-            else:
-                # User is the project owner, add collaborator to team
-                collaborator = User.query.get(collab.user_id)
-                if collaborator:
-                    team_members.add(collaborator)
-        
-        team_data = [{
-            'id': member.id,
-            'username': member.username,
-            'full_name': member.full_name,
-            'email': member.email,
-            'college': member.college
-        } for member in team_members]
-        
-        return jsonify({'team_members': team_data}), 200
-    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2098,7 +2083,6 @@ def get_project_details(project_id):
         vote_count = Vote.query.filter_by(project_id=project_id, is_upvote=True).count()
         comment_count = Comment.query.filter_by(project_id=project_id).count()
         collaboration_count = Collaboration.query.filter_by(project_id=project_id, status='accepted').count()
-        current_funding = db.session.query(func.sum(Donation.amount)).filter_by(project_id=project_id).scalar() or 0
         
         project_data = {
             'id': project.id,
@@ -2106,8 +2090,8 @@ def get_project_details(project_id):
             'description': project.description,
             'category': project.category,
             'status': project.status,
-            'funding_goal': project.funding_goal,
-            'current_funding': current_funding,
+            'funding_goal': to_json_amount(project.funding_goal),
+            'current_funding': to_json_amount(project.current_funding),
             'created_at': project.created_at.isoformat(),
             'vote_count': vote_count,
             'comment_count': comment_count,
@@ -2121,13 +2105,14 @@ def get_project_details(project_id):
 
 # Browse page statistics API
 @app.route('/api/stats', methods=['GET'])
+@cached_response('projects', 'donations', 'collaborations', anonymous_only=False)
 def get_browse_stats():
     try:
         # Get total number of projects
         total_projects = Project.query.count()
         
-        # Get total funding raised (sum of all donations)
-        total_funding = db.session.query(func.sum(Donation.amount)).scalar() or 0
+        # Total funding raised, from the ledger's running total
+        total_funding = to_json_amount(platform_total())
         
         # Get total number of unique collaborators (users who have accepted collaborations)
         total_collaborators = db.session.query(Collaboration.user_id).filter_by(status='accepted').distinct().count()
@@ -2142,3 +2127,11 @@ def get_browse_stats():
         return jsonify({'error': str(e)}), 500
 
 
+# Recent request profiles, SQL included; only served in debug mode with the
+# query profiler on. Behind the proxy every client looks local, so there is
+# no address check to fall back on.
+@app.route('/debug/queries', methods=['GET'])
+def debug_queries():
+    if not app.config['QUERY_PROFILER'] or not (app.debug or app.testing):
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify({'profiles': recent_profiles()}), 200
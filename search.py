@@ -0,0 +1,137 @@
+"""Full-text search over projects, discussions and users.
+
+* PostgreSQL - each searchable table has a weighted ``search_vector``
+  tsvector column, generated by the database on every write, with a GIN
+  index. Queries use prefix terms and are ranked with ``ts_rank``.
+* SQLite     - an FTS5 external-content table per model, kept in sync by
+  triggers and ranked with bm25. Meant for local development.
+* Anything else falls back to unranked case-insensitive LIKE matching.
+
+The columns and indexes are created by a migration (see migrations.py).
+"""
+import re
+
+from sqlalchemy import Float, and_, cast, column, false, func, literal_column, or_, table, text
+
+from app import db
+
+# Searchable columns per table with their weight, A (highest) to C
+SEARCH_FIELDS = {
+    'projects': (('title', 'A'), ('description', 'B'), ('category', 'C')),
+    'discussions': (('title', 'A'), ('content', 'B'), ('tags', 'C')),
+    'users': (('username', 'A'), ('full_name', 'A'), ('college', 'B')),
+}
+
+# Names and colleges are not English prose, so skip stemming and stop words
+TEXT_SEARCH_CONFIG = {'projects': 'english', 'discussions': 'english', 'users': 'simple'}
+
+# bm25 column weights matching the tsvector weight classes
+BM25_WEIGHTS = {'A': 10.0, 'B': 4.0, 'C': 1.0}
+
+MAX_TERMS = 8
+
+
+def search_terms(value):
+    """Split user input into lowercase word tokens, dropping query syntax"""
+    return re.findall(r'\w+', (value or '').lower())[:MAX_TERMS]
+
+
+def _pg_install(connection, table_name, fields):
+    config = TEXT_SEARCH_CONFIG[table_name]
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{config}', coalesce({name}, '')), '{weight}')" for name, weight in fields
+    )
+    connection.execute(text(
+        f'ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS search_vector tsvector '
+        f'GENERATED ALWAYS AS ({vector}) STORED'
+    ))
+    connection.execute(text(
+        f'CREATE INDEX IF NOT EXISTS ix_{table_name}_search_vector ON {table_name} USING gin (search_vector)'
+    ))
+
+
+def _sqlite_install(connection, table_name, fields):
+    fts = f'{table_name}_fts'
+    names = [name for name, _ in fields]
+    cols = ', '.join(names)
+    new_values = ', '.join(f'new.{name}' for name in names)
+    old_values = ', '.join(f'old.{name}' for name in names)
+    weights = ', '.join(str(BM25_WEIGHTS[weight]) for _, weight in fields)
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table_name}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table_name} BEGIN '
+        f'INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table_name} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table_name} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f'INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END',
+        # Persist the column weights as the default rank function
+        f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25({weights})')",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def install(connection):
+    """Create the search columns/tables and indexes for the current dialect"""
+    dialect = connection.dialect.name
+    for table_name, fields in SEARCH_FIELDS.items():
+        if dialect == 'postgresql':
+            _pg_install(connection, table_name, fields)
+        elif dialect == 'sqlite' and _sqlite_has_fts5(connection):
+            _sqlite_install(connection, table_name, fields)
+
+
+def _sqlite_has_fts5(connection):
+    return bool(connection.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+
+_fts_tables = None
+
+
+def _sqlite_fts_ready(table_name):
+    global _fts_tables
+    if _fts_tables is None:
+        _fts_tables = set(db.session.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%\\_fts' ESCAPE '\\'"
+        )).scalars())
+    return f'{table_name}_fts' in _fts_tables
+
+
+def apply_search(query, model, value):
+    """Filter ``query`` to rows of ``model`` matching the search ``value``.
+
+    Returns (query, relevance). ``relevance`` is a labeled SQL expression,
+    higher is better, usable as a pagination sort key; it is None when the
+    backend cannot rank. A ``value`` with no searchable words matches
+    nothing.
+    """
+    terms = search_terms(value)
+    if not terms:
+        return query.filter(false()), None
+    table_name = model.__tablename__
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        vector = literal_column(f'{table_name}.search_vector')
+        tsquery = func.to_tsquery(TEXT_SEARCH_CONFIG[table_name], ' & '.join(f'{term}:*' for term in terms))
+        # ts_rank is float4; as float8 the value survives the round trip through a
+        # page cursor exactly, so the boundary row is not matched again
+        rank = cast(func.ts_rank(vector, tsquery), Float(53))
+        return query.filter(vector.op('@@')(tsquery)), rank.label('relevance')
+
+    if dialect == 'sqlite' and _sqlite_fts_ready(table_name):
+        fts_name = f'{table_name}_fts'
+        fts = table(fts_name, column('rowid'), column('rank', Float), column(fts_name))
+        match = ' '.join(f'"{term}"*' for term in terms)
+        query = query.join(fts, fts.c.rowid == model.id).filter(fts.c[fts_name].op('MATCH')(match))
+        # bm25 scores are negative with lower meaning more relevant
+        return query, (-fts.c.rank).label('relevance')
+
+    columns = [getattr(model, name) for name, _ in SEARCH_FIELDS[table_name]]
+    return query.filter(and_(*[
+        or_(*[col.icontains(term, autoescape=True) for col in columns]) for term in terms
+    ])), None
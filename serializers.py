@@ -0,0 +1,192 @@
+"""Bulk serialization helpers.
+
+Each ``serialize_*`` function takes a list of already-loaded rows and
+resolves their related data with one IN-query per relation before calling
+``to_dict()``, so serializing a page costs a constant number of queries
+instead of several per row.
+"""
+from collections import defaultdict
+
+from sqlalchemy import literal, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import db
+from models import Project, ProjectAttachment, DiscussionLike, CommentReaction, DiscussionReply, ReplyReaction, load_author_summaries
+
+
+def _prime_authors(rows):
+    # Warms the author summary cache so to_dict() finds every owner/author
+    load_author_summaries({row.user_id for row in rows})
+
+
+def _prime_attachments(projects):
+    grouped = defaultdict(list)
+    ids = [project.id for project in projects]
+    if ids:
+        for attachment in ProjectAttachment.query.filter(ProjectAttachment.project_id.in_(ids)).all():
+            grouped[attachment.project_id].append(attachment)
+    for project in projects:
+        set_committed_value(project, 'attachments', grouped[project.id])
+
+
+def serialize_projects(projects, current_user_id=None):
+    if not projects:
+        return []
+    _prime_authors(projects)
+    _prime_attachments(projects)
+    return [project.to_dict(current_user_id) for project in projects]
+
+
+def serialize_discussions(discussions, current_user_id=None):
+    if not discussions:
+        return []
+    _prime_authors(discussions)
+    liked_ids = None
+    if current_user_id:
+        liked_ids = {row.discussion_id for row in db.session.query(DiscussionLike.discussion_id).filter(
+            DiscussionLike.user_id == current_user_id,
+            DiscussionLike.discussion_id.in_([discussion.id for discussion in discussions])
+        )}
+    return [discussion.to_dict(current_user_id, liked_ids=liked_ids) for discussion in discussions]
+
+
+def serialize_comments(comments, user_id=None):
+    if not comments:
+        return []
+    _prime_authors(comments)
+    user_reactions = None
+    if user_id:
+        user_reactions = dict(db.session.query(CommentReaction.comment_id, CommentReaction.reaction_type).filter(
+            CommentReaction.user_id == user_id,
+            CommentReaction.comment_id.in_([comment.id for comment in comments])
+        ).all())
+    return [comment.to_dict(user_id, user_reactions=user_reactions) for comment in comments]
+
+
+# Caps for a single reply tree response; deeper or larger threads are
+# expanded on demand with parent_id / cursor.
+REPLY_TREE_MAX_DEPTH = 6
+REPLY_TREE_MAX_NODES = 500
+
+
+def reply_tree_query(discussion_id, parent_id=None, cursor=None, limit=50, newest_first=False,
+                     max_depth=REPLY_TREE_MAX_DEPTH, max_nodes=REPLY_TREE_MAX_NODES):
+    """The recursive query behind load_reply_tree(): (reply, depth) rows, level by level"""
+    newest_first = newest_first and parent_id is None
+    roots = select(DiscussionReply.id).where(DiscussionReply.discussion_id == discussion_id)
+    if parent_id is None:
+        roots = roots.where(DiscussionReply.parent_reply_id.is_(None))
+    else:
+        roots = roots.where(DiscussionReply.parent_reply_id == parent_id)
+    if cursor is not None:
+        roots = roots.where(DiscussionReply.id < cursor if newest_first else DiscussionReply.id > cursor)
+    # One extra root tells us whether there is a next page
+    roots = roots.order_by(DiscussionReply.id.desc() if newest_first else DiscussionReply.id).limit(limit + 1)
+
+    tree = select(DiscussionReply.id, literal(0).label('depth'))\
+        .where(DiscussionReply.id.in_(roots))\
+        .cte('reply_tree', recursive=True)
+    child = aliased(DiscussionReply)
+    # Recurse one level past max_depth so capped nodes know they have children
+    tree = tree.union_all(
+        select(child.id, tree.c.depth + 1).where(child.parent_reply_id == tree.c.id, tree.c.depth <= max_depth)
+    )
+    # Level by level in id order, so the children of a node cut off by
+    # max_nodes always come after the ones loaded and a cursor can resume them
+    return db.session.query(DiscussionReply, tree.c.depth)\
+        .join(tree, DiscussionReply.id == tree.c.id)\
+        .order_by(tree.c.depth, DiscussionReply.id)\
+        .limit(max_nodes + 1)
+
+
+def load_reply_tree(discussion_id, current_user_id=None, parent_id=None, cursor=None, limit=50,
+                    newest_first=False, max_depth=REPLY_TREE_MAX_DEPTH, max_nodes=REPLY_TREE_MAX_NODES):
+    """Load a page of replies and their nested replies with one recursive query.
+
+    The page roots are the top-level replies of the discussion, or the
+    direct children of ``parent_id`` when expanding a subtree. Roots are
+    ordered by id (i.e. creation order) and paged with ``cursor``, the id of
+    the last root already shown. ``newest_first`` only applies to top-level
+    replies; nested replies and expanded subtrees are always oldest first.
+
+    Returns (replies, next_cursor, truncated). Nodes whose children were cut
+    off by ``max_depth`` or ``max_nodes`` carry ``has_more_replies`` and a
+    ``replies_cursor``: expanding with ``parent_id`` set to the node and
+    that cursor loads only the children not already shown.
+    """
+    newest_first = newest_first and parent_id is None
+    rows = reply_tree_query(discussion_id, parent_id, cursor, limit, newest_first, max_depth, max_nodes).all()
+
+    truncated = len(rows) > max_nodes
+    rows = rows[:max_nodes]
+
+    top = sorted((reply for reply, depth in rows if depth == 0), key=lambda reply: reply.id, reverse=newest_first)
+    next_cursor = None
+    if len(top) > limit:
+        top = top[:limit]
+        next_cursor = top[-1].id
+
+    # Assemble the tree in memory, dropping the extra root's subtree and
+    # the look-ahead level beyond max_depth
+    kept = {reply.id for reply in top}
+    children = defaultdict(list)
+    has_more = set()
+    for reply, depth in rows:
+        if depth == 0 or reply.parent_reply_id not in kept:
+            continue
+        if depth > max_depth:
+            has_more.add(reply.parent_reply_id)
+            continue
+        children[reply.parent_reply_id].append(reply)
+        kept.add(reply.id)
+    loaded = [reply for reply, depth in rows if reply.id in kept]
+    if truncated and kept:
+        # The cut can fall anywhere in a level; ask which kept nodes have children that were not loaded
+        has_more.update(db.session.scalars(
+            select(DiscussionReply.parent_reply_id).distinct()
+            .where(DiscussionReply.parent_reply_id.in_(kept), DiscussionReply.id.not_in(kept))
+        ))
+    for reply in loaded:
+        set_committed_value(reply, 'nested_replies', children[reply.id])
+
+    _prime_authors(loaded)
+    user_reactions = None
+    if current_user_id:
+        user_reactions = defaultdict(set)
+        if kept:
+            for reply_id, reaction_type in db.session.query(ReplyReaction.reply_id, ReplyReaction.reaction_type).filter(
+                ReplyReaction.user_id == current_user_id,
+                ReplyReaction.reply_id.in_(kept)
+            ):
+                user_reactions[reply_id].add(reaction_type)
+
+    result = [reply.to_dict(current_user_id, user_reactions=user_reactions) for reply in top]
+    _mark_has_more(result, has_more)
+    return result, next_cursor, truncated
+
+
+def _mark_has_more(nodes, has_more):
+    for node in nodes:
+        node['has_more_replies'] = node['id'] in has_more
+        # Loaded children have the lowest ids, so the rest start after the last one
+        shown = node['nested_replies']
+        node['replies_cursor'] = shown[-1]['id'] if node['has_more_replies'] and shown else None
+        _mark_has_more(shown, has_more)
+
+
+def serialize_notifications(notifications):
+    if not notifications:
+        return []
+    load_author_summaries({notification.related_user_id for notification in notifications})
+    project_ids = {notification.project_id for notification in notifications if notification.project_id}
+    projects = {}
+    if project_ids:
+        rows = Project.query.filter(Project.id.in_(project_ids)).all()
+        projects = {project['id']: project for project in serialize_projects(rows)}
+    result = []
+    for notification in notifications:
+        data = notification.to_dict(include_project=False)
+        data['project'] = projects.get(notification.project_id)
+        result.append(data)
+    return result
@@ -2,6 +2,7 @@
 
 let currentUser = null;
 let currentPage = 1;
+let nextCursor = null;
 let currentFilters = {
     search: '',
     category: '',
@@ -116,17 +117,25 @@ async function loadProjects() {
     
     try {
         const params = new URLSearchParams({
-            page: currentPage,
             per_page: 9,
             sort: currentFilters.sort
         });
         
+        // Later pages continue from the cursor returned with the previous page
+        if (currentPage > 1 && nextCursor) {
+            params.append('cursor', nextCursor);
+        }
+        
         if (currentFilters.category) {
             params.append('category', currentFilters.category);
         }
         
         if (currentFilters.search) {
             params.append('search', currentFilters.search);
+            // Rank matches by relevance unless another order was picked
+            if (currentFilters.sort === 'recent') {
+                params.set('sort', 'relevance');
+            }
         }
         
         const response = await fetch(`/api/projects?${params}`);
@@ -134,10 +143,11 @@ async function loadProjects() {
         if (response.ok) {
             const data = await response.json();
             displayProjects(data.projects, currentPage === 1);
+            nextCursor = data.next_cursor;
             
             // Show/hide load more button
             if (loadMoreContainer) {
-                if (currentPage < data.pages) {
+                if (data.has_more) {
                     loadMoreContainer.style.display = 'block';
                 } else {
                     loadMoreContainer.style.display = 'none';
@@ -323,7 +333,7 @@ function getProjectImageHTML(project) {
             att.file_type && att.file_type.startsWith('image/')
         );
         if (imageAttachment) {
-            return `<img src="/static/${imageAttachment.file_path}" alt="${escapeHtml(project.title)}" />`;
+            return `<img src="${imageAttachment.url}" alt="${escapeHtml(project.title)}" />`;
         }
     }
     // Default gradient background if no image - no placeholder div
@@ -426,7 +436,7 @@ function displayProjectAttachments(project) {
                         <span class="attachment-meta">${fileSize} • ${attachment.file_type}</span>
                     </div>
                 </div>
-                <a href="/static/${attachment.file_path}" target="_blank" class="attachment-download">
+                <a href="${attachment.url}" target="_blank" class="attachment-download">
                     <i class="fas fa-download"></i>
                 </a>
             </div>
@@ -498,27 +508,18 @@ async function handleVote() {
     voteBtn.disabled = true;
     
     try {
-        const response = await fetch(`/api/projects/${currentProject.id}/vote`, {
-            method: 'POST'
-        });
+        const result = await queueToggle({ type: 'vote', id: currentProject.id });
+        showMessage('Vote updated successfully!', 'success');
         
-        const data = await response.json();
+        // Update vote count in modal
+        document.getElementById('modal-votes').textContent = result.counts.vote_count;
+        currentProject.vote_count = result.counts.vote_count;
         
-        if (response.ok) {
-            showMessage('Vote updated successfully!', 'success');
-            
-            // Update vote count in modal
-            document.getElementById('modal-votes').textContent = data.vote_count;
-            currentProject.vote_count = data.vote_count;
-            
-            // Update vote button appearance
-            voteBtn.classList.add('voted');
-        } else {
-            showMessage(data.error || 'Error voting', 'error');
-        }
+        // Update vote button appearance
+        voteBtn.classList.toggle('voted', result.active);
     } catch (error) {
         console.error('Vote error:', error);
-        showMessage('Error voting', 'error');
+        showMessage(error.message || 'Error voting', 'error');
     } finally {
         voteBtn.disabled = false;
     }
@@ -780,42 +781,29 @@ async function toggleCommentReaction(commentId, reactionType) {
     }
 
     try {
-        const response = await fetch(`/api/comment/${commentId}/reaction`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                reaction_type: reactionType
-            })
-        });
+        const result = await queueToggle({ type: 'comment_reaction', id: commentId, reaction: reactionType });
+        const userReaction = result.reactions[0] || null;
 
-        const data = await response.json();
-        
-        if (response.ok) {
-            const commentElement = document.querySelector(`[data-comment-id="${commentId}"]`);
-            if (commentElement) {
-                // Update both like and heart buttons based on server response
-                const likeBtn = commentElement.querySelector(`[onclick*="'like'"]`);
-                const heartBtn = commentElement.querySelector(`[onclick*="'heart'"]`);
-                const likeCount = likeBtn.querySelector('.reaction-count');
-                const heartCount = heartBtn.querySelector('.reaction-count');
-                
-                // Update counts
-                likeCount.textContent = data.like_count || 0;
-                heartCount.textContent = data.heart_count || 0;
-                
-                // Update active states - only one can be active at a time
-                likeBtn.classList.toggle('active', data.user_reaction === 'like');
-                heartBtn.classList.toggle('active', data.user_reaction === 'heart');
-            }
-            showMessage('Reaction updated!', 'success');
-        } else {
-            showMessage(data.error || 'Error updating reaction', 'error');
+        const commentElement = document.querySelector(`[data-comment-id="${commentId}"]`);
+        if (commentElement) {
+            // Update both like and heart buttons based on server response
+            const likeBtn = commentElement.querySelector(`[onclick*="'like'"]`);
+            const heartBtn = commentElement.querySelector(`[onclick*="'heart'"]`);
+            const likeCount = likeBtn.querySelector('.reaction-count');
+            const heartCount = heartBtn.querySelector('.reaction-count');
+            
+            // Update counts
+            likeCount.textContent = result.counts.like_count || 0;
+            heartCount.textContent = result.counts.heart_count || 0;
+            
+            // Update active states - only one can be active at a time
+            likeBtn.classList.toggle('active', userReaction === 'like');
+            heartBtn.classList.toggle('active', userReaction === 'heart');
         }
+        showMessage('Reaction updated!', 'success');
     } catch (error) {
         console.error('Error toggling reaction:', error);
-        showMessage('Error updating reaction', 'error');
+        showMessage(error.message || 'Error updating reaction', 'error');
     }
 }
 
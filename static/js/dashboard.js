@@ -22,8 +22,8 @@ document.addEventListener('DOMContentLoaded', function() {
     // Setup notifications
     setupNotifications();
     
-    // Start notification polling
-    startNotificationPolling();
+    // Subscribe to pushed notifications and chat (falls back to polling)
+    startEventStream();
     
     // Start real-time clock updates
     startRealTimeUpdates();
@@ -143,11 +143,11 @@ async function loadDashboardData() {
 
 async function loadDashboardStats() {
     try {
-        const response = await fetch('/api/dashboard/stats');
+        const response = await fetch('/api/dashboard/summary');
         if (response.ok) {
             const data = await response.json();
             updateDashboardStats(data);
-            displayRecentProjects(data.projects);
+            displayRecentProjects(data.recent_projects);
         } else {
             console.error('Failed to load dashboard stats');
         }
@@ -819,7 +819,7 @@ function displayFilteredNotifications() {
                 ${getNotificationIcon(notification.type)}
             </div>
             <div class="notification-content">
-                <div class="notification-title">${escapeHtml(notification.title)}</div>
+                <div class="notification-title">${escapeHtml(notification.title)}${notification.count > 1 ? ` (${notification.count})` : ''}</div>
                 <div class="notification-message">${escapeHtml(notification.message)}</div>
                 <div class="notification-time" data-timestamp="${notification.created_at}">${formatNotificationTime(notification.created_at)}</div>
                 ${!notification.is_read ? `
@@ -956,29 +956,86 @@ async function clearAllNotifications() {
     }
 }
 
+let notificationPollTimer = null;
+
+function startEventStream() {
+    if (!window.EventSource) {
+        startNotificationPolling();
+        return;
+    }
+    
+    const source = new EventSource('/api/events');
+    let failures = 0;
+    let connected = false;
+    
+    source.addEventListener('open', () => {
+        failures = 0;
+        // Pick up chat messages and notifications sent while the stream was reconnecting
+        catchUpChat();
+        if (connected) {
+            refreshNotificationCount();
+        }
+        connected = true;
+    });
+    
+    source.addEventListener('notification', () => {
+        if (currentSection === 'notifications') {
+            loadNotifications();
+        } else {
+            unreadCount += 1;
+            updateNotificationCount();
+        }
+    });
+    
+    source.addEventListener('chat', (event) => {
+        const data = JSON.parse(event.data);
+        if (!data.message) {
+            // Payload was too large to push; fetch it instead
+            catchUpChat();
+        } else if (currentChatProject && currentChatProject.id === data.project_id) {
+            appendSidebarChatMessage(data.message);
+        }
+    });
+    
+    source.addEventListener('error', () => {
+        // The browser reconnects on its own; give up on repeated failures
+        failures += 1;
+        if (failures >= 5) {
+            source.close();
+            startNotificationPolling();
+            chatLongPolling = true;
+            pollChat();
+        }
+    });
+}
+
 function startNotificationPolling() {
+    if (notificationPollTimer) return;
+    
     // Poll for new notifications every 30 seconds
-    setInterval(async () => {
-        try {
-            const response = await fetch('/api/notifications/count');
-            if (response.ok) {
-                const data = await response.json();
-                const newUnreadCount = data.unread_count || 0;
-                
-                if (newUnreadCount > unreadCount) {
-                    // New notifications arrived
-                    if (currentSection === 'notifications') {
-                        loadNotifications();
-                    } else {
-                        unreadCount = newUnreadCount;
-                        updateNotificationCount();
-                    }
+    notificationPollTimer = setInterval(refreshNotificationCount, 30000);
+}
+
+async function refreshNotificationCount() {
+    try {
+        const response = await fetch('/api/notifications/count');
+        if (response.ok) {
+            const data = await response.json();
+            const newUnreadCount = data.unread_count || 0;
+            
+            if (newUnreadCount > unreadCount) {
+                // New notifications arrived
+                if (currentSection === 'notifications') {
+                    loadNotifications();
+                } else {
+                    unreadCount = newUnreadCount;
+                    updateNotificationCount();
                 }
             }
-        } catch (error) {
-            console.log('Notification polling error:', error);
         }
-    }, 30000);
+    } catch (error) {
+        console.log('Notification polling error:', error);
+    }
 }
 
 // Real-time updates for timestamps
@@ -1116,14 +1173,32 @@ window.addEventListener('click', function(e) {
 // Load team members
 async function loadTeam() {
     try {
-        const response = await fetch('/api/user/team');
-        if (response.ok) {
+        // The roster is paged by member; each member lists the projects shared with them
+        const teamMembers = [];
+        let cursor = null;
+        do {
+            const params = new URLSearchParams({ per_page: 100 });
+            if (cursor) params.set('cursor', cursor);
+            const response = await fetch(`/api/user/team?${params}`);
+            if (!response.ok) {
+                console.error('Error loading team members');
+                displayEmptyTeam();
+                return;
+            }
             const data = await response.json();
-            displayTeamMembers(data.team_members || []);
-        } else {
-            console.error('Error loading team members');
-            displayEmptyTeam();
-        }
+            (data.members || []).forEach(member => {
+                member.projects.forEach(project => {
+                    teamMembers.push({
+                        project_id: project.id,
+                        project_title: project.title,
+                        is_owner: project.is_owner,
+                        user: member.user
+                    });
+                });
+            });
+            cursor = data.next_cursor;
+        } while (cursor);
+        displayTeamMembers(teamMembers);
     } catch (error) {
         console.error('Error loading team members:', error);
         displayEmptyTeam();
@@ -1199,6 +1274,10 @@ function displayEmptyTeam() {
 
 // Chat sidebar functionality
 let currentChatProject = null;
+let lastChatMessageId = null;
+// Set when the event stream is unavailable; chat then long-polls instead
+let chatLongPolling = !window.EventSource;
+let chatPollRunning = false;
 
 async function openProjectChatSidebar(projectId, projectTitle) {
     currentChatProject = { id: projectId, title: projectTitle };
@@ -1214,6 +1293,7 @@ async function openProjectChatSidebar(projectId, projectTitle) {
     
     await loadChatParticipants(projectId);
     await loadSidebarChatMessages(projectId);
+    pollChat();
 }
 
 function closeChatSidebar() {
@@ -1224,6 +1304,7 @@ function closeChatSidebar() {
     container.classList.remove('chat-open');
     
     currentChatProject = null;
+    lastChatMessageId = null;
 }
 
 async function loadChatParticipants(projectId) {
@@ -1252,9 +1333,11 @@ function displayChatParticipants(participants) {
 
 async function loadSidebarChatMessages(projectId) {
     try {
+        // Only the latest page of messages; older ones are fetched with before_id
         const response = await fetch(`/api/projects/${projectId}/chat`);
         if (response.ok) {
             const data = await response.json();
+            lastChatMessageId = data.last_id;
             displaySidebarChatMessages(data.messages || []);
         }
     } catch (error) {
@@ -1262,6 +1345,42 @@ async function loadSidebarChatMessages(projectId) {
     }
 }
 
+async function fetchNewChatMessages(wait) {
+    const project = currentChatProject;
+    if (!project || lastChatMessageId == null) return false;
+    
+    const params = new URLSearchParams({ since_id: lastChatMessageId });
+    if (wait) params.set('wait', wait);
+    const response = await fetch(`/api/projects/${project.id}/chat?${params}`);
+    if (!response.ok || currentChatProject !== project) return false;
+    
+    const data = await response.json();
+    (data.messages || []).forEach(appendSidebarChatMessage);
+    return true;
+}
+
+function catchUpChat() {
+    fetchNewChatMessages(0).catch(error => console.error('Error loading chat messages:', error));
+}
+
+async function pollChat() {
+    if (!chatLongPolling || chatPollRunning) return;
+    
+    chatPollRunning = true;
+    try {
+        // Each request is held open until a message arrives or 25s pass
+        while (currentChatProject) {
+            if (!(await fetchNewChatMessages(25))) {
+                await new Promise(resolve => setTimeout(resolve, 5000));
+            }
+        }
+    } catch (error) {
+        console.error('Error polling chat:', error);
+    } finally {
+        chatPollRunning = false;
+    }
+}
+
 function displaySidebarChatMessages(messages) {
     const container = document.getElementById('sidebar-chat-messages');
     if (!container) return;
@@ -1276,16 +1395,33 @@ function displaySidebarChatMessages(messages) {
         return;
     }
     
-    container.innerHTML = messages.map(message => `
-        <div class="chat-message">
+    container.innerHTML = messages.map(renderChatMessage).join('');
+    
+    container.scrollTop = container.scrollHeight;
+}
+
+function renderChatMessage(message) {
+    return `
+        <div class="chat-message" data-message-id="${message.id}">
             <div class="message-header">
                 <span class="message-sender">${escapeHtml(message.author.full_name)}</span>
                 <span class="message-time">${formatChatMessageTime(message.created_at)}</span>
             </div>
             <div class="message-text">${escapeHtml(message.message)}</div>
         </div>
-    `).join('');
+    `;
+}
+
+function appendSidebarChatMessage(message) {
+    const container = document.getElementById('sidebar-chat-messages');
+    if (!container || container.querySelector(`[data-message-id="${message.id}"]`)) return;
+    lastChatMessageId = Math.max(lastChatMessageId || 0, message.id);
     
+    // Replace the empty-state placeholder on the first message
+    if (!container.querySelector('.chat-message')) {
+        container.innerHTML = '';
+    }
+    container.insertAdjacentHTML('beforeend', renderChatMessage(message));
     container.scrollTop = container.scrollHeight;
 }
 
@@ -1311,20 +1447,9 @@ async function sendSidebarMessage() {
         
         if (response.ok) {
             input.value = '';
-            await loadSidebarChatMessages(currentChatProject.id);
-            
-            // Refresh notification count after sending chat message
-            // This ensures any new notifications are reflected in the badge
-            try {
-                const notificationResponse = await fetch('/api/notifications/count');
-                if (notificationResponse.ok) {
-                    const notificationData = await notificationResponse.json();
-                    unreadCount = notificationData.unread_count || 0;
-                    updateNotificationCount();
-                }
-            } catch (e) {
-                console.log('Error refreshing notification count:', e);
-            }
+            // Other members receive the message through the event stream
+            const data = await response.json();
+            appendSidebarChatMessage(data.chat_message);
         } else {
             const data = await response.json();
             showMessage(data.error || 'Error sending message', 'error');
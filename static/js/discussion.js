@@ -2,6 +2,7 @@
 
 let currentUser = null;
 let currentPage = 1;
+let nextCursor = null;
 let currentFilters = {
     search: '',
     category: '',
@@ -278,12 +279,20 @@ async function loadDiscussions() {
 
     try {
         const params = new URLSearchParams({
-            page: currentPage,
             search: currentFilters.search,
             category: currentFilters.category,
-            sort: currentFilters.sort,
-            has_more: true
+            sort: currentFilters.sort
         });
+        
+        // Rank matches by relevance unless another order was picked
+        if (currentFilters.search && currentFilters.sort === 'recent') {
+            params.set('sort', 'relevance');
+        }
+        
+        // Later pages continue from the cursor returned with the previous page
+        if (currentPage > 1 && nextCursor) {
+            params.append('cursor', nextCursor);
+        }
 
         const response = await fetch(`/api/discussions?${params}`);
         const data = await response.json();
@@ -293,6 +302,8 @@ async function loadDiscussions() {
                 discussionsList.innerHTML = '';
             }
             
+            nextCursor = data.next_cursor;
+            
             if (data.discussions.length === 0 && currentPage === 1) {
                 showEmptyState();
             } else {
@@ -483,15 +494,23 @@ function renderDiscussionDetail(discussion) {
     `;
 }
 
-async function loadComments(discussionId) {
+async function loadComments(discussionId, cursor = null) {
     const commentsList = document.getElementById('comments-list');
     
     try {
-        const response = await fetch(`/api/discussions/${discussionId}/comments`);
+        const query = cursor ? `?cursor=${cursor}` : '';
+        const response = await fetch(`/api/discussions/${discussionId}/comments${query}`);
         const data = await response.json();
 
         if (response.ok) {
-            if (data.comments.length === 0) {
+            const loadMoreBtn = document.getElementById('load-more-comments');
+            if (loadMoreBtn) loadMoreBtn.remove();
+
+            if (cursor) {
+                data.comments.forEach(comment => {
+                    commentsList.appendChild(createCommentCard(comment));
+                });
+            } else if (data.comments.length === 0) {
                 commentsList.innerHTML = `
                     <div class="empty-state">
                         <i class="fas fa-comments"></i>
@@ -506,6 +525,16 @@ async function loadComments(discussionId) {
                     commentsList.appendChild(commentCard);
                 });
             }
+
+            // Older threads are paged; offer the next page if there is one
+            if (data.next_cursor) {
+                const button = document.createElement('button');
+                button.id = 'load-more-comments';
+                button.className = 'comment-action-btn';
+                button.textContent = 'Load more comments';
+                button.onclick = () => loadComments(discussionId, data.next_cursor);
+                commentsList.appendChild(button);
+            }
         } else {
             throw new Error(data.error || 'Failed to load comments');
         }
@@ -636,28 +665,14 @@ async function toggleDiscussionLike(discussionId) {
     }
 
     try {
-        const response = await fetch(`/api/discussions/${discussionId}/like`, {
-            method: 'POST'
-        });
-
-        const result = await response.json();
+        const result = await queueToggle({ type: 'discussion_like', id: discussionId });
 
-        if (response.ok) {
-            // Update UI
-            const actionBtns = document.querySelectorAll(`[onclick*="toggleDiscussionLike(${discussionId})"]`);
-            actionBtns.forEach(btn => {
-                const icon = btn.querySelector('i');
-                if (result.liked) {
-                    btn.classList.add('liked');
-                    btn.innerHTML = `<i class="fas fa-heart"></i> ${result.like_count}`;
-                } else {
-                    btn.classList.remove('liked');
-                    btn.innerHTML = `<i class="fas fa-heart"></i> ${result.like_count}`;
-                }
-            });
-        } else {
-            throw new Error(result.error || 'Failed to toggle like');
-        }
+        // Update UI
+        const actionBtns = document.querySelectorAll(`[onclick*="toggleDiscussionLike(${discussionId})"]`);
+        actionBtns.forEach(btn => {
+            btn.classList.toggle('liked', result.active);
+            btn.innerHTML = `<i class="fas fa-heart"></i> ${result.counts.like_count}`;
+        });
     } catch (error) {
         console.error('Error toggling like:', error);
         showNotification(error.message, 'error');
@@ -671,29 +686,13 @@ async function toggleCommentReaction(commentId, reactionType) {
     }
 
     try {
-        const response = await fetch(`/api/discussion-comments/${commentId}/react`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ reaction_type: reactionType })
-        });
-
-        const result = await response.json();
+        const result = await queueToggle({ type: 'reply_reaction', id: commentId, reaction: reactionType });
 
-        if (response.ok) {
-            // Update UI
-            const actionBtn = document.querySelector(`[onclick*="toggleCommentReaction(${commentId}, '${reactionType}')"]`);
-            if (actionBtn) {
-                if (result.reacted) {
-                    actionBtn.classList.add('liked');
-                } else {
-                    actionBtn.classList.remove('liked');
-                }
-                actionBtn.innerHTML = `<i class="fas fa-heart"></i> ${result.reaction_count}`;
-            }
-        } else {
-            throw new Error(result.error || 'Failed to toggle reaction');
+        // Update UI
+        const actionBtn = document.querySelector(`[onclick*="toggleCommentReaction(${commentId}, '${reactionType}')"]`);
+        if (actionBtn) {
+            actionBtn.classList.toggle('liked', result.reactions.includes(reactionType));
+            actionBtn.innerHTML = `<i class="fas fa-heart"></i> ${result.counts[`${reactionType}_count`]}`;
         }
     } catch (error) {
         console.error('Error toggling reaction:', error);
@@ -439,7 +439,7 @@ function getProjectImage(project, sampleProject) {
             att.file_type && att.file_type.startsWith('image/')
         );
         if (imageAttachment) {
-            return `url('/static/${imageAttachment.file_path}') center/cover`;
+            return `url('${imageAttachment.url}') center/cover`;
         }
     }
     return sampleProject.gradient;
@@ -452,7 +452,7 @@ function getProjectImageElement(project, sampleProject) {
             att.file_type && att.file_type.startsWith('image/')
         );
         if (imageAttachment) {
-            return `<img src="/static/${imageAttachment.file_path}" alt="${escapeHtml(project.title || sampleProject.title)}" style="width: 100%; height: 100%; object-fit: cover;">`;
+            return `<img src="${imageAttachment.url}" alt="${escapeHtml(project.title || sampleProject.title)}" style="width: 100%; height: 100%; object-fit: cover;">`;
         }
     }
     return sampleProject.image ? `<img src="${sampleProject.image}" alt="${escapeHtml(project.title || sampleProject.title)}">` : '';
@@ -0,0 +1,46 @@
+// Vote, like and reaction toggles fired in quick succession go to the server as one batch
+
+const TOGGLE_BATCH_DELAY = 150;
+let pendingToggles = [];
+let toggleTimer = null;
+
+// Resolves with the server's result for this target: its new state and counts
+function queueToggle(operation) {
+    return new Promise((resolve, reject) => {
+        pendingToggles.push({ operation, resolve, reject });
+        if (!toggleTimer) {
+            toggleTimer = setTimeout(flushToggles, TOGGLE_BATCH_DELAY);
+        }
+    });
+}
+
+async function flushToggles() {
+    const batch = pendingToggles;
+    pendingToggles = [];
+    toggleTimer = null;
+
+    try {
+        const response = await fetch('/api/toggles', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ operations: batch.map(item => item.operation) })
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || 'Error applying toggles');
+        }
+
+        batch.forEach(({ operation, resolve, reject }) => {
+            const result = data.results.find(r => r.type === operation.type && r.id === operation.id);
+            if (!result || result.error) {
+                reject(new Error(result ? result.error : 'No result returned'));
+            } else {
+                resolve(result);
+            }
+        });
+    } catch (error) {
+        batch.forEach(item => item.reject(error));
+    }
+}
@@ -0,0 +1,389 @@
+"""Batched votes, likes and reactions.
+
+``apply_toggles`` takes a list of operations from one user, e.g.
+
+    {"type": "vote", "id": 12}
+    {"type": "comment_reaction", "id": 40, "reaction": "heart", "active": true}
+
+and applies them with a fixed number of statements per type, however many
+operations there are: one SELECT that loads the targets together with the
+user's current state, at most one INSERT ... ON CONFLICT and one DELETE ...
+RETURNING relying on the tables' unique constraints, then one recount of
+the touched rows' counters. An operation without ``active`` toggles;
+several operations on the same target within a batch are folded in order,
+so only the net change is written.
+
+``toggle`` is the single-target version behind the per-item endpoints. It
+never reads before writing: a toggle is a DELETE ... RETURNING and, if
+nothing was deleted, an INSERT ... ON CONFLICT. On PostgreSQL both run as
+one statement (the DELETE in a writable CTE); on SQLite they are two
+statements in the same write transaction. Concurrent double-clicks
+therefore can't trip the unique constraints, and the caller learns
+whether the state actually changed. Databases without RETURNING (SQLite
+before 3.35) fall back to checking the DELETE's rowcount and inserting
+inside a savepoint.
+
+Each ``KINDS`` entry describes a type: its table, the target model whose
+counters it feeds, and whether it carries a reaction. Comment reactions
+are exclusive (one per user and comment, switching type replaces it);
+reply reactions are independent per type.
+"""
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import and_, delete, exists, func, literal, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+from counters import COUNTER_SOURCES, adjust_counter, recount
+from identity import current_user
+from models import Project, Vote, Comment, CommentReaction, Discussion, DiscussionLike, DiscussionReply, ReplyReaction
+from notifications import notify
+from ranking import ENGAGEMENT, refresh_scores
+from response_cache import invalidate
+
+app.config.setdefault('TOGGLE_BATCH_LIMIT', 100)
+
+REACTIONS = ('like', 'heart')
+
+# Dialects whose INSERT supports ON CONFLICT ... RETURNING
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+class ToggleError(ValueError):
+    """An operation in the batch is malformed"""
+
+
+Kind = namedtuple('Kind', 'model target_column target_model reaction exclusive counter')
+
+KINDS = {
+    'vote': Kind(Vote, 'project_id', Project, False, False, 'vote_count'),
+    'discussion_like': Kind(DiscussionLike, 'discussion_id', Discussion, False, False, 'like_count'),
+    'comment_reaction': Kind(CommentReaction, 'comment_id', Comment, True, True, '{reaction}_count'),
+    'reply_reaction': Kind(ReplyReaction, 'reply_id', DiscussionReply, True, False, '{reaction}_count'),
+}
+
+
+def write_strategy():
+    """How toggles write on the current database: 'cte', 'returning' or 'fallback'"""
+    dialect = db.session.get_bind().dialect
+    if dialect.name == 'postgresql':
+        return 'cte'
+    if dialect.name in UPSERT_INSERTS and dialect.insert_returning and dialect.delete_returning:
+        return 'returning'
+    return 'fallback'
+
+
+def parse_operations(operations):
+    """Validate the request body; returns [(type, target id, reaction, active or None)]"""
+    if not isinstance(operations, list) or not operations:
+        raise ToggleError('operations must be a non-empty list')
+    if len(operations) > app.config['TOGGLE_BATCH_LIMIT']:
+        raise ToggleError(f"At most {app.config['TOGGLE_BATCH_LIMIT']} operations per batch")
+    parsed = []
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise ToggleError('Each operation must be an object')
+        kind = KINDS.get(operation.get('type'))
+        if kind is None:
+            raise ToggleError(f"Unknown toggle type: {operation.get('type')!r}")
+        target_id = operation.get('id')
+        if not isinstance(target_id, int) or isinstance(target_id, bool):
+            raise ToggleError('id must be an integer')
+        reaction = operation.get('reaction') if kind.reaction else None
+        if kind.reaction and reaction not in REACTIONS:
+            raise ToggleError('reaction must be one of ' + ', '.join(REACTIONS))
+        active = operation.get('active')
+        if active is not None and not isinstance(active, bool):
+            raise ToggleError('active must be true or false')
+        parsed.append((operation['type'], target_id, reaction, active))
+    return parsed
+
+
+def _load(kind, user_id, target_ids):
+    """{target id: (target row, current state)}; state is a set of active reactions"""
+    model, target = kind.model, kind.target_model
+    columns = [target.id, target.user_id]
+    if target is Project or target is Discussion:
+        columns.append(target.title)
+    if target is Comment:
+        columns.append(Comment.project_id)
+    criteria = [getattr(model, kind.target_column) == target.id, model.user_id == user_id]
+    if model is Vote:
+        criteria.append(Vote.is_upvote == True)
+    state_column = model.reaction_type if kind.reaction else model.id
+    rows = db.session.execute(
+        select(*columns, state_column.label('state'))
+        .outerjoin(model, and_(*criteria))
+        .where(target.id.in_(target_ids))
+    ).all()
+
+    loaded = {}
+    for row in rows:
+        _, state = loaded.setdefault(row.id, (row, set()))
+        if row.state is not None:
+            state.add(row.state if kind.reaction else True)
+    return loaded
+
+
+def _fold(kind, state, reaction, active):
+    """The state after one operation"""
+    key = reaction if kind.reaction else True
+    if active is None:
+        active = key not in state
+    if not active:
+        return state - {key}
+    return {key} if kind.exclusive else state | {key}
+
+
+def _values(kind, user_id, target_id, reaction):
+    values = {'user_id': user_id, kind.target_column: target_id, 'created_at': datetime.utcnow()}
+    if kind.reaction:
+        values['reaction_type'] = reaction
+    if kind.model is Vote:
+        values['is_upvote'] = True
+    return values
+
+
+def _matching(kind, user_id, target_id, reaction):
+    """WHERE criteria for the user's active row on one target"""
+    table = kind.model.__table__
+    criteria = [table.c.user_id == user_id, table.c[kind.target_column] == target_id]
+    if kind.reaction:
+        criteria.append(table.c.reaction_type == reaction)
+    if kind.model is Vote:
+        criteria.append(table.c.is_upvote == True)
+    return criteria
+
+
+def _on_conflict(kind, statement):
+    table = kind.model.__table__
+    target = table.c[kind.target_column]
+    if kind.model is Vote:
+        # A leftover downvote is turned into the upvote
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, target], set_={'is_upvote': True}, where=table.c.is_upvote == False)
+    elif kind.exclusive:
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, target], set_={'reaction_type': statement.excluded.reaction_type},
+            where=table.c.reaction_type != statement.excluded.reaction_type)
+    else:
+        statement = statement.on_conflict_do_nothing()
+    return statement
+
+
+def _insert(kind, user_id, pairs):
+    """Insert (target id, reaction) pairs; returns the pairs actually written"""
+    if write_strategy() == 'fallback':
+        return {(target_id, reaction) for target_id, reaction in pairs
+                if _write_one(kind, user_id, target_id, reaction, True)[1]}
+    table = kind.model.__table__
+    target = table.c[kind.target_column]
+    build = UPSERT_INSERTS[db.session.get_bind().dialect.name]
+    statement = _on_conflict(kind, build(table).values(
+        [_values(kind, user_id, target_id, reaction) for target_id, reaction in pairs]))
+    returning = [target, table.c.reaction_type] if kind.reaction else [target]
+    return {(row[0], row[1] if kind.reaction else None)
+            for row in db.session.execute(statement.returning(*returning))}
+
+
+def _delete(kind, user_id, pairs):
+    """Delete (target id, reaction) pairs; returns the pairs actually removed"""
+    if write_strategy() == 'fallback':
+        return {(target_id, reaction) for target_id, reaction in pairs
+                if _write_one(kind, user_id, target_id, reaction, False)[0]}
+    table = kind.model.__table__
+    target = table.c[kind.target_column]
+    statement = delete(table).where(table.c.user_id == user_id)
+    if kind.reaction:
+        statement = statement.where(tuple_(target, table.c.reaction_type).in_(list(pairs)))
+        returning = [target, table.c.reaction_type]
+    else:
+        statement = statement.where(target.in_([target_id for target_id, _ in pairs]))
+        if kind.model is Vote:
+            statement = statement.where(table.c.is_upvote == True)
+        returning = [target]
+    return {(row[0], row[1] if kind.reaction else None)
+            for row in db.session.execute(statement.returning(*returning))}
+
+
+def _write_one(kind, user_id, target_id, reaction, active):
+    """Set (``active``) or flip (None) one row; returns (removed, added)"""
+    table = kind.model.__table__
+    criteria = _matching(kind, user_id, target_id, reaction)
+    strategy = write_strategy()
+
+    if strategy == 'cte':
+        values = _values(kind, user_id, target_id, reaction)
+        removed = delete(table).where(*criteria).returning(table.c.id).cte('removed') if active is not True else None
+        added = None
+        if active is not False:
+            rows = select(*[literal(value, table.c[name].type) for name, value in values.items()])
+            if removed is not None:
+                rows = rows.where(~exists(select(removed.c.id)))
+            added = _on_conflict(kind, postgresql.insert(table).from_select(list(values), rows))\
+                .returning(table.c.id).cte('added')
+        counts = [select(func.count()).select_from(cte).scalar_subquery() if cte is not None else literal(0)
+                  for cte in (removed, added)]
+        removed_count, added_count = db.session.execute(select(*counts)).one()
+        return bool(removed_count), bool(added_count)
+
+    removed = False
+    if active is not True:
+        statement = delete(table).where(*criteria)
+        if strategy == 'returning':
+            removed = db.session.execute(statement.returning(table.c.id)).first() is not None
+        else:
+            removed = db.session.execute(statement).rowcount > 0
+    if removed or active is False:
+        return removed, False
+
+    values = _values(kind, user_id, target_id, reaction)
+    if strategy == 'returning':
+        statement = _on_conflict(kind, UPSERT_INSERTS[db.session.get_bind().dialect.name](table).values(values))
+        return False, db.session.execute(statement.returning(table.c.id)).first() is not None
+
+    # No ON CONFLICT/RETURNING: update what an upsert would, else insert and treat a duplicate as no change
+    if kind.model is Vote or kind.exclusive:
+        table_target = table.c[kind.target_column]
+        replace = {'is_upvote': True} if kind.model is Vote else {'reaction_type': reaction}
+        stale = table.c.is_upvote == False if kind.model is Vote else table.c.reaction_type != reaction
+        updated = db.session.execute(
+            table.update().where(table.c.user_id == user_id, table_target == target_id, stale).values(replace)
+        ).rowcount
+        if updated:
+            return False, True
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert().values(values))
+        return False, True
+    except IntegrityError:
+        return False, False
+
+
+def toggle(type_, user_id, target_id, reaction=None, active=None):
+    """Flip (or, given ``active``, set) one vote, like or reaction without reading first.
+
+    Keeps the target's counters and hot score in step and returns
+    ``(state, changed)``. ``state`` is whether the row is now active; for
+    comment reactions it is the user's reaction type or None. The caller
+    commits.
+    """
+    kind = KINDS[type_]
+    removed, added = _write_one(kind, user_id, target_id, reaction, active)
+    changed = removed or added
+    if kind.exclusive:
+        # A switch from the other reaction changes two counters; recount rather than guess the old type
+        if changed:
+            recount(kind.target_model, [target_id])
+            if kind.target_model in ENGAGEMENT:
+                refresh_scores(kind.target_model, [target_id])
+        return (None if removed else reaction if (added or active is not False) else None), changed
+    if changed:
+        counter = kind.counter.format(reaction=reaction)
+        adjust_counter(kind.target_model, target_id, **{counter: 1 if added else -1})
+    return (not removed if active is None else active), changed
+
+
+def _counts(kind, target_ids):
+    model = kind.target_model
+    names = list(COUNTER_SOURCES[model])
+    rows = db.session.execute(
+        select(model.id, *[getattr(model, name) for name in names]).where(model.id.in_(target_ids))
+    ).all()
+    return {row[0]: dict(zip(names, row[1:])) for row in rows}
+
+
+def _notify_new(kind, user_id, loaded, target_ids):
+    if kind.model not in (Vote, DiscussionLike):
+        return
+    actor = current_user()
+    if actor is None:
+        return
+    for target_id in target_ids:
+        row, _ = loaded[target_id]
+        if row.user_id == user_id:
+            continue
+        if kind.model is Vote:
+            notify([row.user_id], 'vote', 'Project Liked', f'{actor.full_name} liked your project "{row.title}"',
+                   related_user_id=user_id, project_id=target_id)
+        else:
+            notify([row.user_id], 'like', 'Discussion Liked',
+                   f'{actor.full_name} liked your discussion "{row.title}"', related_user_id=user_id)
+
+
+def apply_toggles(user_id, operations):
+    """Apply ``operations`` (already parsed) for ``user_id`` and commit.
+
+    Returns one result per distinct target, in the order targets first
+    appear: its final state, whether this batch changed it, and the
+    target's counters afterwards.
+    """
+    by_kind = {}
+    for type_, target_id, reaction, active in operations:
+        by_kind.setdefault(type_, []).append((target_id, reaction, active))
+
+    results, after_commit = [], []
+    for type_, kind_operations in by_kind.items():
+        kind = KINDS[type_]
+        loaded = _load(kind, user_id, {target_id for target_id, _, _ in kind_operations})
+
+        states, order = {}, []
+        for target_id, reaction, active in kind_operations:
+            if target_id not in loaded:
+                if target_id not in states:
+                    states[target_id] = None
+                    order.append(target_id)
+                continue
+            if target_id not in states:
+                states[target_id] = loaded[target_id][1]
+                order.append(target_id)
+            states[target_id] = _fold(kind, states[target_id], reaction, active)
+
+        before = {target_id: loaded[target_id][1] for target_id in loaded}
+        add = {(target_id, reaction if kind.reaction else None)
+               for target_id, state in states.items() if state is not None
+               for reaction in state - before[target_id]}
+        remove = {(target_id, reaction if kind.reaction else None)
+                  for target_id, state in states.items() if state is not None
+                  for reaction in before[target_id] - state}
+        # An exclusive reaction switching type is written by the upsert alone
+        if kind.exclusive:
+            remove = {pair for pair in remove if states[pair[0]] == set()}
+
+        added = _insert(kind, user_id, add) if add else set()
+        removed = _delete(kind, user_id, remove) if remove else set()
+        changed = {target_id for target_id, _ in added | removed}
+        if changed:
+            recount(kind.target_model, changed)
+            if kind.target_model in ENGAGEMENT:
+                refresh_scores(kind.target_model, changed)
+
+        counts = _counts(kind, list(loaded))
+        for target_id in order:
+            if states[target_id] is None:
+                results.append({'type': type_, 'id': target_id, 'error': 'Not found'})
+                continue
+            result = {'type': type_, 'id': target_id, 'changed': target_id in changed, 'counts': counts[target_id]}
+            if kind.reaction:
+                result['reactions'] = sorted(states[target_id])
+            else:
+                result['active'] = bool(states[target_id])
+            results.append(result)
+
+        newly_active = {target_id for target_id, _ in added if not before[target_id]}
+        after_commit.append((kind, loaded, changed, newly_active))
+
+    db.session.commit()
+
+    for kind, loaded, changed, newly_active in after_commit:
+        if kind.model is Vote and changed:
+            invalidate(*[f'project:{target_id}' for target_id in changed])
+        elif kind.model is CommentReaction and changed:
+            invalidate(*{f'project:{loaded[target_id][0].project_id}' for target_id in changed})
+        _notify_new(kind, user_id, loaded, newly_active)
+    return results
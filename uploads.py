@@ -0,0 +1,271 @@
+"""Resumable, chunked uploads for project attachments.
+
+A client opens an upload session with the file's name, type and size,
+PUTs the bytes in chunks at increasing offsets (resuming from the
+session's ``offset`` after a failure) and then completes the session,
+which turns it into a ``ProjectAttachment``. The project itself is created
+first and never waits on its files.
+
+Chunks are streamed from the request to a part file in fixed-size pieces,
+so memory stays bounded whatever the file size, and the SHA-256 is
+computed as the bytes arrive. Finished files go into the content-addressed
+blob store, so identical attachments are stored once. Size limits are
+enforced when the session is opened and again while each chunk streams.
+
+Part files live under ``UPLOAD_TMP_PATH``, which must be shared by every
+worker that can receive a chunk.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, update
+from werkzeug.utils import secure_filename
+
+from app import app, db
+from blobstore import get_blob_store, key_for_digest
+from models import ProjectAttachment, UploadSession
+
+app.config.setdefault('UPLOAD_TMP_PATH', os.environ.get(
+    'UPLOAD_TMP_PATH', os.path.join(tempfile.gettempdir(), 'project-uploads')))
+app.config.setdefault('UPLOAD_MAX_SIZE', int(os.environ.get('UPLOAD_MAX_SIZE', 50 * 1024 * 1024)))
+app.config.setdefault('UPLOAD_CHUNK_SIZE', int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)))
+app.config.setdefault('UPLOAD_SESSION_TTL', int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 3600)))
+
+# Bytes read from the request per write
+COPY_BUFFER = 64 * 1024
+
+
+class UploadError(ValueError):
+    status_code = 400
+
+
+class UploadTooLarge(UploadError):
+    status_code = 413
+
+
+class OffsetMismatch(UploadError):
+    status_code = 409
+
+
+class UploadConflict(UploadError):
+    status_code = 409
+
+
+# Running SHA-256 per session for chunks received by this process, keyed
+# by session id as (offset hashed up to, hash). Sessions whose chunks went
+# to another worker are re-hashed from the part file on completion.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def part_path(upload):
+    return os.path.join(app.config['UPLOAD_TMP_PATH'], f'{upload.id}.part')
+
+
+def _check_size(size):
+    if size <= 0:
+        raise UploadError('File is empty')
+    if size > app.config['UPLOAD_MAX_SIZE']:
+        raise UploadTooLarge(f"File exceeds the {app.config['UPLOAD_MAX_SIZE']} byte limit")
+
+
+def open_session(project_id, user_id, filename, size, content_type=None):
+    """Start an upload; the caller commits"""
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('size is required')
+    _check_size(size)
+    if not filename:
+        raise UploadError('filename is required')
+    upload = UploadSession()
+    upload.id = uuid.uuid4().hex
+    upload.project_id = project_id
+    upload.user_id = user_id
+    upload.filename = filename[:255]
+    upload.content_type = (content_type or 'application/octet-stream')[:100]
+    upload.size = size
+    upload.received = 0
+    db.session.add(upload)
+    os.makedirs(app.config['UPLOAD_TMP_PATH'], exist_ok=True)
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length=None):
+    """Stream one chunk from ``stream`` into the part file at ``offset``.
+
+    Returns the new offset. The session row is advanced with a conditional
+    UPDATE, so two requests racing on the same offset cannot both count.
+    """
+    if offset != upload.received:
+        raise OffsetMismatch(f'Expected offset {upload.received}')
+    limit = min(app.config['UPLOAD_CHUNK_SIZE'], upload.size - offset)
+    if length is not None and length > limit:
+        raise UploadTooLarge(f'Chunk may be at most {limit} bytes')
+
+    with _hashers_lock:
+        state = _hashers.get(upload.id)
+    hasher = None
+    if offset == 0:
+        hasher = hashlib.sha256()
+    elif state and state[0] == offset:
+        # Hash a copy: a chunk that fails partway must leave the stored state untouched
+        hasher = state[1].copy()
+
+    written = 0
+    with open(part_path(upload), 'r+b') as part:
+        part.seek(offset)
+        while True:
+            piece = stream.read(min(COPY_BUFFER, limit - written + 1))
+            if not piece:
+                break
+            written += len(piece)
+            if written > limit:
+                raise UploadTooLarge(f'Chunk may be at most {limit} bytes')
+            part.write(piece)
+            if hasher is not None:
+                hasher.update(piece)
+    if not written:
+        raise UploadError('Empty chunk')
+
+    advanced = db.session.execute(
+        update(UploadSession)
+        .where(UploadSession.id == upload.id, UploadSession.received == offset)
+        .values(received=offset + written, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not advanced:
+        raise OffsetMismatch('Chunk was already received')
+    with _hashers_lock:
+        if hasher is not None:
+            _hashers[upload.id] = (offset + written, hasher)
+        else:
+            _hashers.pop(upload.id, None)
+    return offset + written
+
+
+def _digest(upload):
+    with _hashers_lock:
+        state = _hashers.pop(upload.id, None)
+    if state and state[0] == upload.size:
+        return state[1].hexdigest()
+    hasher = hashlib.sha256()
+    with open(part_path(upload), 'rb') as part:
+        for piece in iter(lambda: part.read(COPY_BUFFER), b''):
+            hasher.update(piece)
+    return hasher.hexdigest()
+
+
+def _attach(project_id, user_id, key, digest, filename, content_type, size):
+    store = get_blob_store()
+    # The same file attached to the same project again reuses the first row
+    existing = ProjectAttachment.query.filter_by(project_id=project_id, content_hash=digest).first()
+    if existing:
+        return existing, False
+    attachment = ProjectAttachment()
+    attachment.filename = key
+    attachment.original_filename = filename
+    attachment.file_size = size
+    attachment.file_type = content_type
+    attachment.file_path = store.url(key)
+    attachment.content_hash = digest
+    attachment.project_id = project_id
+    attachment.user_id = user_id
+    db.session.add(attachment)
+    return attachment, True
+
+
+def complete(upload):
+    """Move a fully received upload into the blob store and attach it.
+
+    The digest is committed on the session before the part file moves, so
+    a retry after the caller's commit failed finds the file in the blob
+    store by key. Returns (attachment, created). The caller commits.
+    """
+    if upload.received != upload.size:
+        raise UploadError(f'Upload incomplete: {upload.received} of {upload.size} bytes received')
+    # Read before the commit below expires the session, whose row a racing completion may delete
+    upload_id, path, digest = upload.id, part_path(upload), upload.content_hash
+    project_id, user_id = upload.project_id, upload.user_id
+    filename, content_type, size = upload.filename, upload.content_type, upload.size
+    if digest is None:
+        if not os.path.exists(path):
+            raise UploadConflict('Upload data is gone; start a new upload')
+        digest = _digest(upload)
+        db.session.execute(
+            update(UploadSession)
+            .where(UploadSession.id == upload_id, UploadSession.content_hash.is_(None))
+            .values(content_hash=digest)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    # Claim the session: a second completion racing this one waits on the
+    # row and then finds it gone
+    claimed = db.session.execute(
+        delete(UploadSession).where(UploadSession.id == upload_id).execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        raise UploadConflict('Upload was already completed')
+    db.session.expunge(upload)
+
+    store = get_blob_store()
+    key = key_for_digest(digest, content_type)
+    try:
+        store.put_file(path, key)
+    except FileNotFoundError:
+        # Moved by an earlier attempt whose commit failed
+        if not store.exists(key):
+            raise UploadConflict('Upload data is gone; start a new upload')
+    return _attach(project_id, user_id, key, digest, filename, content_type, size)
+
+
+def store_file(file, project_id, user_id):
+    """Stream a multipart ``FileStorage`` into the blob store and attach it"""
+    os.makedirs(app.config['UPLOAD_TMP_PATH'], exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=app.config['UPLOAD_TMP_PATH'], suffix='.part')
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as part:
+            for piece in iter(lambda: file.stream.read(COPY_BUFFER), b''):
+                size += len(piece)
+                if size > app.config['UPLOAD_MAX_SIZE']:
+                    raise UploadTooLarge(f"File exceeds the {app.config['UPLOAD_MAX_SIZE']} byte limit")
+                part.write(piece)
+                hasher.update(piece)
+        _check_size(size)
+        content_type = file.content_type or 'application/octet-stream'
+        digest = hasher.hexdigest()
+        key = key_for_digest(digest, content_type)
+        get_blob_store().put_file(tmp_path, key)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    filename = secure_filename(file.filename) or 'file'
+    return _attach(project_id, user_id, key, digest, filename, content_type, size)[0]
+
+
+def discard(upload):
+    """Drop an unfinished upload and its part file; the caller commits"""
+    with _hashers_lock:
+        _hashers.pop(upload.id, None)
+    if os.path.exists(part_path(upload)):
+        os.remove(part_path(upload))
+    db.session.delete(upload)
+
+
+@app.cli.command('purge-uploads')
+def purge_uploads_command():
+    """Remove upload sessions idle for longer than UPLOAD_SESSION_TTL."""
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['UPLOAD_SESSION_TTL'])
+    stale = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+    for upload in stale:
+        discard(upload)
+    db.session.commit()
+    print(f'{len(stale)} stale uploads removed')